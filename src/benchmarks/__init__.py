@@ -0,0 +1 @@
+""" Benchmarks for the Forky server, run from `src/` with `python -m benchmarks.<name>`. """
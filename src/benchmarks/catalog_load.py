@@ -0,0 +1,96 @@
+""" Compare load time and resident memory of the JSON and binary paper catalogs.
+
+Each loader runs in a fresh interpreter so that measurements do not leak into each other.
+Resident memory is split into anonymous pages, which are private to every worker, and
+file-backed pages, which the page cache shares between all workers mapping the catalog.
+
+Usage:
+    python -m benchmarks.catalog_load data/cache/cvpr2025_papers.json [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from server.ai.binary_catalog import BinaryCatalog, convert_catalog
+from server.ai.paper_catalog import load_catalog
+
+
+def _memory_kb() -> dict[str, int]:
+    """Read resident memory counters for the current process from /proc."""
+    counters = {"VmRSS": 0, "RssAnon": 0, "RssFile": 0}
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in counters:
+                    counters[key] = int(value.split()[0])
+    except OSError:
+        import resource
+
+        counters["VmRSS"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return counters
+
+
+def _measure(kind: str, path: str) -> dict[str, float]:
+    """Load a catalog, touch every abstract and report timings and memory growth."""
+    before = _memory_kb()
+
+    start = time.perf_counter()
+    if kind == "json":
+        papers = load_catalog(Path(path))
+    else:
+        papers = BinaryCatalog(Path(path))
+    loaded = time.perf_counter()
+
+    abstract_chars = sum(len(paper["abstract"] or "") for paper in papers.values())
+    scanned = time.perf_counter()
+
+    after = _memory_kb()
+    return {
+        "load_ms": (loaded - start) * 1000,
+        "scan_ms": (scanned - loaded) * 1000,
+        "rss_kb": after["VmRSS"] - before["VmRSS"],
+        "anon_kb": after["RssAnon"] - before["RssAnon"],
+        "file_kb": after["RssFile"] - before["RssFile"],
+        "papers": len(papers),
+        "abstract_chars": abstract_chars,
+    }
+
+
+def run(json_path: Path, catalog_path: Path, workers: int) -> None:
+    """Run the benchmark and print a comparison table."""
+    catalog_path.parent.mkdir(parents=True, exist_ok=True)
+    convert_catalog(json_path, catalog_path)
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'format':<8}{'size MB':>10}{'load ms':>10}{'scan ms':>10}"
+          f"{'rss MB':>10}{'anon MB':>10}{'file MB':>10}")
+    for kind, path in (("json", json_path), ("binary", catalog_path)):
+        with ctx.Pool(workers) as pool:
+            results = pool.starmap(_measure, [(kind, str(path))] * workers)
+
+        size_mb = path.stat().st_size / 2**20
+        avg = {key: sum(r[key] for r in results) / workers for key in results[0]}
+        print(f"{kind:<8}{size_mb:>10.1f}{avg['load_ms']:>10.1f}{avg['scan_ms']:>10.1f}"
+              f"{avg['rss_kb'] / 1024:>10.1f}{avg['anon_kb'] / 1024:>10.1f}{avg['file_kb'] / 1024:>10.1f}")
+
+    print(f"\nAveraged over {workers} worker process(es). File-backed pages of the binary "
+          "catalog are shared through the page cache; anonymous pages are per worker.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("json_path", type=Path, help="JSON or JSONL catalog to compare against")
+    parser.add_argument("--catalog", type=Path, default=None, help="where to write the binary catalog")
+    parser.add_argument("--workers", type=int, default=1, help="number of concurrent reader processes")
+    args = parser.parse_args()
+
+    catalog = args.catalog or Path(tempfile.gettempdir()) / "forky-bench" / "catalog.fkc"
+    run(args.json_path, catalog, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+""" Compare the local embedding backends with the Gemini embedding model on the paper catalog.
+
+Every backend embeds the whole catalog, then a set of queries is searched by exact cosine
+similarity. For each backend the benchmark reports the time to fit and embed the corpus,
+the latency of embedding one query, how often a paper is found in the top k when its own
+title is the query, and, when the Gemini reference is enabled, the recall at k of the
+Gemini top k (the share of Gemini's hits that the backend also returns).
+
+The reference needs GEMINI_API_KEY and embeds the full catalog remotely; without it only
+the offline measurements are reported.
+
+Usage:
+    python -m benchmarks.embedding_recall data/cache/cvpr2025_papers.json [--reference] [-k 10]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from server.ai.binary_catalog import BinaryCatalog
+from server.ai.embedders import GeminiEmbedder, HashingEmbedder, TfidfSvdEmbedder, paper_text
+from server.ai.paper_catalog import load_catalog
+from server.server_config import EMBEDDING_DIMENSIONS, WARMUP_QUERIES
+
+
+def _load_papers(path: Path) -> dict:
+    if path.suffix == ".fkc":
+        return dict(BinaryCatalog(path).items())
+    return dict(load_catalog(path))
+
+
+def _gemini_embedder() -> GeminiEmbedder:
+    import google.generativeai as genai
+
+    from server.ai.gemini_client import EMBEDDING_MODEL
+
+    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    return GeminiEmbedder(lambda texts: genai.embed_content(model=EMBEDDING_MODEL, content=texts)["embedding"])
+
+
+def _top_k(vectors: np.ndarray, query: np.ndarray, k: int) -> list[int]:
+    scores = vectors @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])].tolist()
+
+
+def evaluate(
+    name: str,
+    embedder,
+    texts: list[str],
+    queries: list[str],
+    targets: list[Optional[int]],
+    k: int,
+    reference: Optional[list[list[int]]] = None,
+) -> tuple[dict, list[list[int]]]:
+    """
+    Embed the corpus and the queries with one backend and measure it.
+
+    Parameters
+    ----------
+    name : str
+        Label of the backend in the report.
+    embedder : Embedder
+        The backend; a `TfidfSvdEmbedder` is fitted on `texts` first.
+    texts : list[str]
+        The corpus.
+    queries : list[str]
+        The search queries.
+    targets : list[Optional[int]]
+        The paper each query should find, or None for queries without a known answer.
+    k : int
+        Number of hits per query.
+    reference : Optional[list[list[int]]]
+        Top k of every query according to the reference backend.
+
+    Returns
+    -------
+    tuple[dict, list[list[int]]]
+        The measurements, and the top k of every query.
+    """
+    start = time.perf_counter()
+    if isinstance(embedder, TfidfSvdEmbedder):
+        embedder.fit(texts)
+    fitted = time.perf_counter()
+    vectors = embedder.embed_documents(texts)
+    embedded = time.perf_counter()
+
+    latencies, hits = [], []
+    for query in queries:
+        query_start = time.perf_counter()
+        vector = embedder.embed_query(query)
+        latencies.append((time.perf_counter() - query_start) * 1e6)
+        hits.append(_top_k(vectors, vector, k))
+
+    latencies.sort()
+    found = [target in top for target, top in zip(targets, hits) if target is not None]
+    result = {
+        "backend": name,
+        "fit_s": fitted - start,
+        "embed_s": embedded - fitted,
+        "p50_us": statistics.median(latencies),
+        "p99_us": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        "hit_at_k": sum(found) / len(found) if found else float("nan"),
+        "recall_at_k": float("nan"),
+    }
+    if reference is not None:
+        overlaps = [len(set(top) & set(ref)) / len(ref) for top, ref in zip(hits, reference) if ref]
+        result["recall_at_k"] = sum(overlaps) / len(overlaps)
+    return result, hits
+
+
+def run(catalog: Path, k: int, sample: int, with_reference: bool, queries_file: Optional[Path], seed: int) -> None:
+    """Run the benchmark and print a comparison table."""
+    papers = _load_papers(catalog)
+    titles = list(papers)
+    texts = [paper_text(title, papers[title]) for title in titles]
+
+    # Titles of sampled papers have a known answer; free-form queries only count against the reference
+    rows = random.Random(seed).sample(range(len(titles)), min(sample, len(titles)))
+    free_form = queries_file.read_text(encoding="utf-8").splitlines() if queries_file else WARMUP_QUERIES
+    queries = [titles[row] for row in rows] + [query for query in free_form if query.strip()]
+    targets: list[Optional[int]] = rows + [None] * (len(queries) - len(rows))
+    print(f"{len(titles)} papers, {len(queries)} queries, k={k}\n")
+
+    backends = [
+        ("hashing", HashingEmbedder(EMBEDDING_DIMENSIONS)),
+        ("tfidf", TfidfSvdEmbedder(EMBEDDING_DIMENSIONS)),
+    ]
+    results, reference = [], None
+    if with_reference:
+        result, reference = evaluate("gemini", _gemini_embedder(), texts, queries, targets, k)
+        results.append(result)
+    for name, embedder in backends:
+        results.append(evaluate(name, embedder, texts, queries, targets, k, reference)[0])
+
+    print(f"{'backend':<10}{'fit s':>9}{'embed s':>9}{'p50 us':>10}{'p99 us':>10}{'hit@k':>8}{'recall@k':>10}")
+    for r in results:
+        print(f"{r['backend']:<10}{r['fit_s']:>9.2f}{r['embed_s']:>9.2f}{r['p50_us']:>10.1f}{r['p99_us']:>10.1f}"
+              f"{r['hit_at_k']:>8.3f}{r['recall_at_k']:>10.3f}")
+    print("\nhit@k: a paper is in the top k for its own title. "
+          "recall@k: share of the Gemini top k also returned (nan without --reference).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("catalog", type=Path, help="JSON, JSONL or binary paper catalog")
+    parser.add_argument("-k", type=int, default=10, help="number of hits compared per query")
+    parser.add_argument("--sample", type=int, default=200, help="number of paper titles used as queries")
+    parser.add_argument("--queries", type=Path, default=None, help="file with one free-form query per line")
+    parser.add_argument("--reference", action="store_true", help="compare with the Gemini embedding model")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.catalog, args.k, args.sample, args.reference, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+""" Measure the import time of the server and fail when it exceeds a budget.
+
+The application module is imported in a fresh interpreter with `-X importtime`, the
+report is parsed and the slowest top-level imports are printed. The run fails if the
+total import time is over budget or if a module that must be loaded lazily (the
+Gemini and Mongo SDKs, NumPy, BeautifulSoup) is imported during startup.
+
+Usage:
+    python -m benchmarks.import_time [--module server.main] [--budget-ms 1500] [--repeat 5]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+
+# Modules only needed by specific requests, which must not slow down a cold start
+LAZY_MODULES = ("google.genai", "google.generativeai", "pymongo", "bs4", "numpy")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+@dataclass
+class ImportRecord:
+    """One line of the `-X importtime` report."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(report: str) -> list[ImportRecord]:
+    """
+    Parse the report printed to stderr by `python -X importtime`.
+
+    Parameters
+    ----------
+    report : str
+        The stderr output.
+
+    Returns
+    -------
+    list[ImportRecord]
+        One record per imported module, in report order.
+    """
+    records = []
+    for line in report.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append(ImportRecord(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return records
+
+
+def measure(module: str) -> list[ImportRecord]:
+    """Import a module in a fresh interpreter and return its import-time records."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def run(module: str, budget_ms: float, repeat: int, top: int) -> bool:
+    """Run the benchmark, print a report and return whether it passed."""
+    runs = [measure(module) for _ in range(repeat)]
+    totals = [sum(r.cumulative_us for r in records if r.depth == 0) / 1000 for records in runs]
+    best = runs[totals.index(min(totals))]
+
+    print(f"Import time of {module}: best {min(totals):.0f} ms, "
+          f"median {sorted(totals)[len(totals) // 2]:.0f} ms over {repeat} run(s), budget {budget_ms:.0f} ms\n")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for record in sorted((r for r in best if r.depth == 0), key=lambda r: r.cumulative_us, reverse=True)[:top]:
+        print(f"{record.cumulative_us / 1000:>14.1f}{record.self_us / 1000:>10.1f}  {record.module}")
+
+    imported = {record.module for record in best}
+    eager = [name for name in LAZY_MODULES if name in imported]
+
+    passed = True
+    if min(totals) > budget_ms:
+        print(f"\nFAIL: import time {min(totals):.0f} ms exceeds the budget of {budget_ms:.0f} ms")
+        passed = False
+    if eager:
+        print(f"\nFAIL: imported during startup but expected to load lazily: {', '.join(eager)}")
+        passed = False
+    if passed:
+        print("\nOK")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="server.main", help="module to import")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="maximum total import time")
+    parser.add_argument("--repeat", type=int, default=5, help="number of fresh interpreters to measure")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to list")
+    args = parser.parse_args()
+
+    sys.exit(0 if run(args.module, args.budget_ms, args.repeat, args.top) else 1)
+
+
+if __name__ == "__main__":
+    main()
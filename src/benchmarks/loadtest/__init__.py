@@ -0,0 +1 @@
+""" Load tests of the search, download and chat endpoints against local service stubs. """
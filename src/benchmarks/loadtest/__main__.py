@@ -0,0 +1,312 @@
+""" Load test the server against local stubs of Gemini, MongoDB Atlas and GitHub.
+
+`run` starts the stubs and the server (in its own temporary directory, so caches and
+digests do not mix with a development instance), drives `/search_cvpr_papers`,
+`/papers/match_reason`, `/download/{digest_id}` and `/chat` with the chosen arrival
+pattern, and prints throughput, latency percentiles and error and 429 rates per endpoint. With `--target`
+an already running deployment is tested instead. The run exits with status 1 when a
+threshold such as `--max-p95-ms` or `--max-probe-p99-ms` is exceeded, so it can guard
+against regressions like a blocked event loop.
+
+`stubs` only runs the stubs, e.g. to profile a server started by hand.
+
+Usage:
+    python -m benchmarks.loadtest run [--pattern steady|burst|ramp] [--rate 20] [--peak-rate 80]
+        [--duration 60] [--concurrency 64] [--mix search=6,download=3,chat=1,match_reason=2] [--workers 1]
+        [--gemini-latency-ms 600] [--gemini-error-rate 0.01] [--json report.json]
+    python -m benchmarks.loadtest stubs [--gemini-port 8101] [--mongo-port 8102] [--github-port 8103]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from benchmarks.loadtest.driver import (
+    ArrivalPattern,
+    check_thresholds,
+    parse_mix,
+    print_report,
+    run_load,
+    summarize,
+    write_report,
+)
+from benchmarks.loadtest.mongo_stub import CATALOG_SIZE, synthetic_paper
+from benchmarks.loadtest.stubs import ServiceProfile, serve_stubs
+
+SRC_DIR = Path(__file__).resolve().parents[2]
+HOST = "127.0.0.1"
+STARTUP_TIMEOUT = 120.0  # In seconds, for the stubs and the server to come up
+
+# Default latency and jitter per stubbed service, in milliseconds
+SERVICE_DEFAULTS = {"gemini": (600.0, 300.0), "mongo": (40.0, 20.0), "github": (100.0, 50.0)}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, process: subprocess.Popen, timeout: float = STARTUP_TIMEOUT) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with status {process.returncode} before listening on {port}")
+        try:
+            with socket.create_connection((HOST, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout:.0f}s")
+
+
+def _wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = STARTUP_TIMEOUT) -> float:
+    """Poll `/ready` until the server has warmed up and return the time it took."""
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=2).status_code == 200:
+                return time.monotonic() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server not ready after {timeout:.0f}s")
+
+
+def prepare_workdir(workdir: Path, digests: int, digest_kb: int) -> list[str]:
+    """
+    Create the paper catalog and the digests served by the server under test.
+
+    Parameters
+    ----------
+    workdir : Path
+        Used as the server's temporary directory, so digests go to `workdir/forky`.
+    digests : int
+        Number of digests.
+    digest_kb : int
+        Size of each digest, in KiB.
+
+    Returns
+    -------
+    list[str]
+        The digest ids.
+    """
+    papers_dir = workdir / "papers"
+    papers_dir.mkdir(parents=True, exist_ok=True)
+    papers = (synthetic_paper(index) for index in range(CATALOG_SIZE))
+    (papers_dir / "cvpr2025_papers.json").write_text(json.dumps({paper["title"]: paper for paper in papers}))
+
+    content = synthetic_digest(digest_kb)
+    digest_ids = []
+    for index in range(digests):
+        digest_id = uuid.uuid4().hex
+        folder = workdir / "forky" / digest_id
+        folder.mkdir(parents=True)
+        (folder / f"loadtest-repo{index}.txt").write_text(content)
+        digest_ids.append(digest_id)
+    return digest_ids
+
+
+def synthetic_digest(size_kb: int) -> str:
+    """Text shaped like a repository digest, about `size_kb` KiB long."""
+    lines = ["Directory structure:", "└── loadtest-repo/", "    └── module.py", "", "=" * 48, "File: module.py", "=" * 48]
+    size = sum(len(line) + 1 for line in lines)
+    index = 0
+    while size < size_kb * 1024:
+        block = [f"def function_{index}(value):", f'    """Return value plus {index}."""', f"    return value + {index}", ""]
+        lines += block
+        size += sum(len(line) + 1 for line in block)
+        index += 1
+    return "\n".join(lines)
+
+
+def _profile(args: argparse.Namespace, service: str) -> ServiceProfile:
+    return ServiceProfile(
+        latency_ms=getattr(args, f"{service}_latency_ms"),
+        jitter_ms=getattr(args, f"{service}_jitter_ms"),
+        error_rate=getattr(args, f"{service}_error_rate"),
+        throttle_rate=getattr(args, f"{service}_throttle_rate"),
+    )
+
+
+def _profile_arguments(args: argparse.Namespace) -> list[str]:
+    """The stub settings as command-line arguments of the `stubs` subcommand."""
+    arguments = []
+    for service in SERVICE_DEFAULTS:
+        for setting in ("latency_ms", "jitter_ms", "error_rate", "throttle_rate"):
+            arguments += [f"--{service}-{setting.replace('_', '-')}", str(getattr(args, f"{service}_{setting}"))]
+    return arguments
+
+
+def _terminate(process: Optional[subprocess.Popen]) -> None:
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def command_run(args: argparse.Namespace) -> int:
+    """Run a load test and return the exit status."""
+    mix = parse_mix(args.mix)
+    pattern = ArrivalPattern(args.pattern, args.rate, args.peak_rate or args.rate * 4, args.duration,
+                             args.burst_every, args.burst_length)
+    stubs = server = log = None
+    workdir_context = tempfile.TemporaryDirectory(prefix="forky-loadtest-") if not args.workdir else None
+    workdir = Path(args.workdir or workdir_context.name).resolve()
+
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+            digest_ids = [digest_id for digest_id in args.digest_ids.split(",") if digest_id]
+        else:
+            digest_ids = prepare_workdir(workdir, args.digests, args.digest_kb)
+            ports = {service: _free_port() for service in SERVICE_DEFAULTS}
+            log = open(workdir / "loadtest.log", "ab")
+            print(f"Logs of the stubs and the server: {workdir / 'loadtest.log'}")
+
+            stubs = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.loadtest", "stubs",
+                 "--gemini-port", str(ports["gemini"]), "--mongo-port", str(ports["mongo"]),
+                 "--github-port", str(ports["github"]), *_profile_arguments(args)],
+                cwd=SRC_DIR, stdout=log, stderr=subprocess.STDOUT,
+            )
+            for port in ports.values():
+                _wait_for_port(port, stubs)
+
+            server_port = args.port or _free_port()
+            env = {
+                **os.environ,
+                # The server keeps digests and caches under the temporary directory
+                "TMPDIR": str(workdir),
+                "GEMINI_API_KEY": "loadtest",
+                "GEMINI_API_BASE_URL": f"http://{HOST}:{ports['gemini']}",
+                "MONGODB_URI": f"mongodb://{HOST}:{ports['mongo']}/?directConnection=true",
+                "GITHUB_API_URL": f"http://{HOST}:{ports['github']}",
+                "CVPR_PAPERS_CACHE_DIR": str(workdir / "papers"),
+                "RATE_LIMITS_ENABLED": "true" if args.rate_limits else "false",
+                "WEB_CONCURRENCY": str(args.workers),
+            }
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "server.main:app", "--host", HOST, "--port", str(server_port),
+                 "--workers", str(args.workers), "--log-level", "warning"],
+                cwd=SRC_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+            )
+            base_url = f"http://{HOST}:{server_port}"
+            print(f"Server ready after {_wait_until_ready(base_url, server):.1f}s")
+
+        print(f"Driving {base_url}: {args.pattern} pattern, {args.rate} req/s base, "
+              f"{pattern.peak_rate} req/s peak, {args.duration:.0f}s, concurrency {args.concurrency}")
+        samples, elapsed = asyncio.run(run_load(
+            base_url,
+            pattern,
+            mix,
+            args.concurrency,
+            digest_ids,
+            chat_sessions=args.chat_sessions,
+            unique_queries=args.unique_queries,
+            timeout=args.timeout,
+            seed=args.seed,
+        ))
+    finally:
+        _terminate(server)
+        _terminate(stubs)
+        if log is not None:
+            log.close()
+        if workdir_context is not None:
+            workdir_context.cleanup()
+
+    summary = summarize(samples, elapsed)
+    print_report(summary, elapsed)
+    if args.json:
+        write_report(Path(args.json), summary, elapsed, {key: value for key, value in vars(args).items() if key != "func"})
+
+    failures = check_thresholds(summary, args.max_p95_ms, args.max_error_rate, args.max_probe_p99_ms)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+def command_stubs(args: argparse.Namespace) -> int:
+    """Run the stubs until interrupted."""
+    print(f"Gemini on http://{HOST}:{args.gemini_port}, MongoDB on {HOST}:{args.mongo_port}, "
+          f"GitHub on http://{HOST}:{args.github_port}", flush=True)
+    try:
+        asyncio.run(serve_stubs(
+            HOST, args.gemini_port, args.mongo_port, args.github_port,
+            _profile(args, "gemini"), _profile(args, "mongo"), _profile(args, "github"),
+        ))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _add_profile_arguments(parser: argparse.ArgumentParser) -> None:
+    for service, (latency, jitter) in SERVICE_DEFAULTS.items():
+        group = parser.add_argument_group(f"{service} stub")
+        group.add_argument(f"--{service}-latency-ms", type=float, default=latency, help="base latency")
+        group.add_argument(f"--{service}-jitter-ms", type=float, default=jitter, help="mean extra latency")
+        group.add_argument(f"--{service}-error-rate", type=float, default=0.0, help="fraction of 5xx answers")
+        group.add_argument(f"--{service}-throttle-rate", type=float, default=0.0, help="fraction of 429 answers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="run a load test")
+    run.add_argument("--target", help="test this running server instead of starting one with stubs")
+    run.add_argument("--digest-ids", default="", help="comma-separated digests to download from --target")
+    run.add_argument("--pattern", choices=["steady", "burst", "ramp"], default="steady")
+    run.add_argument("--rate", type=float, default=20.0, help="base arrival rate, in requests per second")
+    run.add_argument("--peak-rate", type=float, help="rate of bursts and at the end of a ramp (default 4x --rate)")
+    run.add_argument("--burst-every", type=float, default=10.0, help="seconds between burst starts")
+    run.add_argument("--burst-length", type=float, default=2.0, help="seconds each burst lasts")
+    run.add_argument("--duration", type=float, default=60.0, help="seconds of load")
+    run.add_argument("--concurrency", type=int, default=64, help="maximum requests in flight")
+    run.add_argument("--mix", default="search=6,download=3,chat=1,match_reason=2", help="relative weight of each scenario")
+    run.add_argument("--unique-queries", type=int, default=200, help="distinct search queries, Zipf distributed")
+    run.add_argument("--digests", type=int, default=20, help="number of digests to create")
+    run.add_argument("--digest-kb", type=int, default=512, help="size of each digest")
+    run.add_argument("--chat-sessions", type=int, default=8, help="chat sessions created before the run")
+    run.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    run.add_argument("--port", type=int, help="port of the server (default: a free port)")
+    run.add_argument("--rate-limits", action="store_true", help="keep the server's rate limits enabled")
+    run.add_argument("--workdir", help="directory for the server's data and logs (default: a temporary one)")
+    run.add_argument("--timeout", type=float, default=60.0, help="per-request timeout, in seconds")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--json", help="also write the report to this file")
+    run.add_argument("--max-p95-ms", type=float, help="fail if any endpoint's p95 latency exceeds this")
+    run.add_argument("--max-error-rate", type=float, help="fail if any endpoint's error rate exceeds this")
+    run.add_argument("--max-probe-p99-ms", type=float, help="fail if the /health probe's p99 exceeds this")
+    _add_profile_arguments(run)
+    run.set_defaults(func=command_run)
+
+    stubs = subparsers.add_parser("stubs", help="only run the service stubs")
+    stubs.add_argument("--gemini-port", type=int, default=8101)
+    stubs.add_argument("--mongo-port", type=int, default=8102)
+    stubs.add_argument("--github-port", type=int, default=8103)
+    _add_profile_arguments(stubs)
+    stubs.set_defaults(func=command_stubs)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
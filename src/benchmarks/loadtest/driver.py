@@ -0,0 +1,420 @@
+""" Open-loop load generator and latency report for the Forky server.
+
+Requests are issued at arrival times drawn from a Poisson process whose rate follows the
+chosen pattern, independently of how fast the server answers, so a slow server builds a
+queue instead of silently lowering the load. Latency is measured from the scheduled
+arrival, which includes time spent waiting for a free connection.
+
+A probe requests `/health` ten times per second during the run. The handler does no
+work, so its latency is a direct measure of how long the event loop is blocked by other
+requests.
+"""
+
+import asyncio
+import json
+import math
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator, Optional
+
+import httpx
+
+PROBE_INTERVAL = 0.1  # In seconds
+PROBE_ENDPOINT = "health"
+PERCENTILES = (50, 90, 95, 99)
+
+_TOPICS = [
+    "gaussian splatting", "diffusion models", "vision language models", "video understanding",
+    "object detection", "monocular depth estimation", "neural radiance fields", "autonomous driving",
+    "human pose estimation", "semantic segmentation", "3d reconstruction", "image super resolution",
+    "self-supervised learning", "open vocabulary detection", "visual question answering", "point clouds",
+]
+_MODIFIERS = ["", "efficient", "real-time", "few-shot", "robust", "for robotics", "with transformers", "benchmark"]
+_ENCODINGS = ["gzip, deflate, br, zstd", "gzip, deflate", "identity"]
+
+
+@dataclass
+class ArrivalPattern:
+    """
+    Request rate over the course of a run.
+
+    Parameters
+    ----------
+    kind : str
+        "steady" keeps `rate`; "burst" switches to `peak_rate` for `burst_length` seconds
+        every `burst_every` seconds; "ramp" grows linearly from `rate` to `peak_rate`.
+    rate : float
+        Base rate, in requests per second.
+    peak_rate : float
+        Rate during bursts and at the end of a ramp.
+    duration : float
+        Length of the run, in seconds.
+    """
+
+    kind: str
+    rate: float
+    peak_rate: float
+    duration: float
+    burst_every: float = 10.0
+    burst_length: float = 2.0
+
+    def rate_at(self, t: float) -> float:
+        """The request rate `t` seconds into the run."""
+        if self.kind == "burst":
+            return self.peak_rate if t % self.burst_every < self.burst_length else self.rate
+        if self.kind == "ramp":
+            return self.rate + (self.peak_rate - self.rate) * min(t / self.duration, 1.0)
+        return self.rate
+
+    def arrivals(self, rng: random.Random) -> Iterator[float]:
+        """Arrival offsets of a non-homogeneous Poisson process, generated by thinning."""
+        max_rate = max(self.rate, self.peak_rate if self.kind != "steady" else 0.0)
+        if max_rate <= 0:
+            return
+        t = 0.0
+        while True:
+            t += rng.expovariate(max_rate)
+            if t >= self.duration:
+                return
+            if rng.random() * max_rate <= self.rate_at(t):
+                yield t
+
+
+@dataclass
+class Sample:
+    """Outcome of one request."""
+
+    endpoint: str
+    status: int
+    latency: float
+    ttfb: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class LoadContext:
+    """State shared by the scenarios of a run."""
+
+    client: httpx.AsyncClient
+    rng: random.Random
+    queries: list[str]
+    query_weights: list[float]
+    digest_ids: list[str]
+    chat_sessions: list[str] = field(default_factory=list)
+    # (query, paper_id) of search results, whose match reasons are requested later
+    results: list[tuple[str, str]] = field(default_factory=list)
+
+
+def query_pool(size: int, zipf_exponent: float = 1.1) -> tuple[list[str], list[float]]:
+    """
+    Distinct search queries and Zipf weights, so a few queries are very frequent as in real traffic.
+
+    Parameters
+    ----------
+    size : int
+        Number of distinct queries.
+    zipf_exponent : float
+        Skew of the popularity distribution.
+
+    Returns
+    -------
+    tuple[list[str], list[float]]
+        The queries, most popular first, and their weights.
+    """
+    base = [f"{modifier} {topic}".strip() for modifier in _MODIFIERS for topic in _TOPICS]
+    # Beyond the base combinations, queries get a numeric suffix to stay distinct
+    queries = [base[i % len(base)] + (f" {i // len(base)}" if i >= len(base) else "") for i in range(size)]
+    return queries, [1 / (rank + 1) ** zipf_exponent for rank in range(len(queries))]
+
+
+async def _search(ctx: LoadContext) -> Sample:
+    query = ctx.rng.choices(ctx.queries, weights=ctx.query_weights)[0]
+    venues = "cvpr2025,cvpr2024" if ctx.rng.random() < 0.2 else ""
+    start = time.perf_counter()
+    response = await ctx.client.post("/search_cvpr_papers", data={"query": query, "venues": venues})
+    latency = time.perf_counter() - start
+    error = None
+    if response.status_code == 200:
+        payload = response.json()
+        if "error" in payload:
+            error = "search_error"
+        elif not payload.get("papers"):
+            error = "empty_results"
+        ctx.results.extend((query, paper["paper_id"]) for paper in payload.get("papers", [])[:2] if paper.get("paper_id"))
+        del ctx.results[:-1000]
+    return Sample("search", response.status_code, latency, error=error)
+
+
+async def _match_reason(ctx: LoadContext) -> Sample:
+    if not ctx.results:
+        return await _search(ctx)
+    query, paper_id = ctx.rng.choice(ctx.results)
+    start = time.perf_counter()
+    response = await ctx.client.get("/papers/match_reason", params={"query": query, "paper_id": paper_id})
+    return Sample("match_reason", response.status_code, time.perf_counter() - start)
+
+
+async def _download(ctx: LoadContext) -> Sample:
+    headers = {"Accept-Encoding": ctx.rng.choice(_ENCODINGS)}
+    if ctx.rng.random() < 0.2:
+        headers = {"Accept-Encoding": "identity", "Range": "bytes=0-65535"}
+    digest_id = ctx.rng.choice(ctx.digest_ids)
+    start = time.perf_counter()
+    ttfb = None
+    async with ctx.client.stream("GET", f"/download/{digest_id}", headers=headers) as response:
+        # Raw bytes, so the load generator does not spend its time decompressing
+        async for _ in response.aiter_raw():
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+    return Sample("download", response.status_code, time.perf_counter() - start, ttfb)
+
+
+async def create_chat_session(ctx: LoadContext) -> Sample:
+    """Start a chat session on one of the digests and add it to the pool."""
+    start = time.perf_counter()
+    response = await ctx.client.post(
+        "/chat/session",
+        data={"digest_id": ctx.rng.choice(ctx.digest_ids), "repo_summary": "A repository under load test."},
+    )
+    if response.status_code == 200:
+        ctx.chat_sessions.append(response.json()["session_id"])
+    return Sample("chat_session", response.status_code, time.perf_counter() - start)
+
+
+async def _chat(ctx: LoadContext) -> Sample:
+    if not ctx.chat_sessions:
+        return await create_chat_session(ctx)
+    session_id = ctx.rng.choice(ctx.chat_sessions)
+    start = time.perf_counter()
+    ttfb = None
+    error = None
+    async with ctx.client.stream(
+        "POST",
+        "/chat",
+        data={"message": "How do I run the tests?", "session_id": session_id},
+        headers={"Accept": "text/event-stream"},
+    ) as response:
+        async for line in response.aiter_lines():
+            if ttfb is None and line.startswith("data:"):
+                ttfb = time.perf_counter() - start
+            if line.startswith("event: error"):
+                error = "stream_error"
+    if response.status_code == 404 and session_id in ctx.chat_sessions:
+        # The session expired or lives in another worker's memory; start a new one
+        ctx.chat_sessions.remove(session_id)
+        error = "session_expired"
+    return Sample("chat", response.status_code, time.perf_counter() - start, ttfb, error)
+
+
+SCENARIOS: dict[str, Callable[[LoadContext], Awaitable[Sample]]] = {
+    "search": _search,
+    "download": _download,
+    "chat": _chat,
+    "match_reason": _match_reason,
+}
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """Parse request mix weights such as "search=6,download=3,chat=1,match_reason=2"."""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+async def _probe(client: httpx.AsyncClient, samples: list[Sample], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = await client.get("/health")
+            samples.append(Sample(PROBE_ENDPOINT, response.status_code, time.perf_counter() - start))
+        except httpx.HTTPError as e:
+            samples.append(Sample(PROBE_ENDPOINT, 0, time.perf_counter() - start, error=type(e).__name__))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=PROBE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load(
+    base_url: str,
+    pattern: ArrivalPattern,
+    mix: dict[str, float],
+    concurrency: int,
+    digest_ids: list[str],
+    chat_sessions: int = 8,
+    unique_queries: int = 200,
+    timeout: float = 60.0,
+    seed: int = 0,
+) -> tuple[list[Sample], float]:
+    """
+    Drive the server with the given arrival pattern and request mix.
+
+    Parameters
+    ----------
+    base_url : str
+        Address of the server under test.
+    pattern : ArrivalPattern
+        When requests are issued.
+    mix : dict[str, float]
+        Relative weight of each scenario.
+    concurrency : int
+        Maximum number of requests in flight; later arrivals wait for a free slot.
+    digest_ids : list[str]
+        Digests that `/download/{digest_id}` can serve and chat sessions are started on.
+    chat_sessions : int
+        Number of chat sessions created before the run.
+    unique_queries : int
+        Number of distinct search queries.
+    timeout : float
+        Per-request timeout, in seconds.
+    seed : int
+        Seed of the arrival times and request choices.
+
+    Returns
+    -------
+    tuple[list[Sample], float]
+        The samples, including the `/health` probe, and the elapsed time in seconds.
+    """
+    rng = random.Random(seed)
+    queries, weights = query_pool(unique_queries)
+    if ("download" in mix or "chat" in mix) and not digest_ids:
+        raise ValueError("The download and chat scenarios need at least one digest id")
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client, \
+            httpx.AsyncClient(base_url=base_url, timeout=timeout) as probe_client:
+        ctx = LoadContext(client, rng, queries, weights, digest_ids)
+        samples: list[Sample] = []
+        if "chat" in mix:
+            samples += await asyncio.gather(*(create_chat_session(ctx) for _ in range(chat_sessions)))
+
+        semaphore = asyncio.Semaphore(concurrency)
+        names, scenario_weights = list(mix), list(mix.values())
+
+        async def issue(name: str, scheduled: float) -> None:
+            async with semaphore:
+                queued = time.perf_counter() - scheduled
+                try:
+                    sample = await SCENARIOS[name](ctx)
+                except httpx.HTTPError as e:
+                    sample = Sample(name, 0, time.perf_counter() - scheduled - queued, error=type(e).__name__)
+                sample.latency += queued
+                samples.append(sample)
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(probe_client, samples, stop))
+        tasks = []
+        started = time.perf_counter()
+        for offset in pattern.arrivals(rng):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = rng.choices(names, weights=scenario_weights)[0]
+            tasks.append(asyncio.create_task(issue(name, started + offset)))
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    return samples, elapsed
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples: list[Sample], elapsed: float) -> dict[str, dict]:
+    """
+    Aggregate the samples per endpoint.
+
+    Returns
+    -------
+    dict[str, dict]
+        For each endpoint: count, throughput, error and 429 rates, and latency percentiles
+        in milliseconds.
+    """
+    by_endpoint: dict[str, list[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample.endpoint].append(sample)
+
+    summary = {}
+    for endpoint, group in sorted(by_endpoint.items()):
+        latencies = [sample.latency * 1000 for sample in group]
+        ttfbs = [sample.ttfb * 1000 for sample in group if sample.ttfb is not None]
+        throttled = sum(sample.status == 429 for sample in group)
+        failed = sum(sample.status != 429 and (sample.status == 0 or sample.status >= 400 or bool(sample.error))
+                     for sample in group)
+        errors: dict[str, int] = defaultdict(int)
+        for sample in group:
+            if sample.error or sample.status >= 400 or sample.status == 0:
+                errors[sample.error or str(sample.status)] += 1
+        stats = {
+            "count": len(group),
+            "rps": round(len(group) / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round(failed / len(group), 4),
+            "throttle_rate": round(throttled / len(group), 4),
+            "errors": dict(errors),
+            "max_ms": round(max(latencies), 1),
+        }
+        stats.update({f"p{pct}_ms": round(percentile(latencies, pct), 1) for pct in PERCENTILES})
+        if ttfbs:
+            stats.update({"ttfb_p50_ms": round(percentile(ttfbs, 50), 1), "ttfb_p95_ms": round(percentile(ttfbs, 95), 1)})
+        summary[endpoint] = stats
+    return summary
+
+
+def print_report(summary: dict[str, dict], elapsed: float) -> None:
+    """Print the summary as a table."""
+    print(f"\nDuration {elapsed:.1f}s")
+    columns = ["count", "rps", "error_rate", "throttle_rate"] + [f"p{pct}_ms" for pct in PERCENTILES] + ["max_ms"]
+    print(f"{'endpoint':<14}" + "".join(f"{column:>14}" for column in columns))
+    for endpoint, stats in summary.items():
+        print(f"{endpoint:<14}" + "".join(f"{stats[column]:>14}" for column in columns))
+    for endpoint, stats in summary.items():
+        if "ttfb_p50_ms" in stats:
+            print(f"{endpoint}: time to first byte p50 {stats['ttfb_p50_ms']} ms, p95 {stats['ttfb_p95_ms']} ms")
+        if stats["errors"]:
+            print(f"{endpoint}: errors {stats['errors']}")
+
+
+def check_thresholds(
+    summary: dict[str, dict],
+    max_p95_ms: Optional[float] = None,
+    max_error_rate: Optional[float] = None,
+    max_probe_p99_ms: Optional[float] = None,
+) -> list[str]:
+    """
+    Compare the summary with regression thresholds.
+
+    Returns
+    -------
+    list[str]
+        One message per violated threshold; empty if the run passed.
+    """
+    failures = []
+    for endpoint, stats in summary.items():
+        if endpoint == PROBE_ENDPOINT:
+            if max_probe_p99_ms is not None and stats["p99_ms"] > max_probe_p99_ms:
+                failures.append(f"/health p99 {stats['p99_ms']} ms > {max_probe_p99_ms} ms: the event loop is blocked")
+            continue
+        if max_p95_ms is not None and stats["p95_ms"] > max_p95_ms:
+            failures.append(f"{endpoint} p95 {stats['p95_ms']} ms > {max_p95_ms} ms")
+        if max_error_rate is not None and stats["error_rate"] > max_error_rate:
+            failures.append(f"{endpoint} error rate {stats['error_rate']:.2%} > {max_error_rate:.2%}")
+    return failures
+
+
+def write_report(path: Path, summary: dict[str, dict], elapsed: float, settings: dict) -> None:
+    """Write the summary and the run settings as JSON, e.g. to compare runs in CI."""
+    path.write_text(json.dumps({"settings": settings, "elapsed": elapsed, "endpoints": summary}, indent=2))
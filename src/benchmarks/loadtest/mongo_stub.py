@@ -0,0 +1,202 @@
+""" Minimal MongoDB wire-protocol server answering Atlas `$vectorSearch` aggregations.
+
+Only what the server's `ShardedPaperIndex` and the driver's connection management need is
+implemented: the handshake (legacy OP_QUERY and OP_MSG `hello`), `ping`, `endSessions`,
+`aggregate` and `find` by `_id`. Aggregations return synthetic papers chosen
+deterministically from the query vector, so repeated searches get identical results like
+against a real index.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import random
+import struct
+from typing import Optional
+
+import bson
+from bson import ObjectId
+from bson.int64 import Int64
+
+from benchmarks.loadtest.stubs import ServiceProfile
+
+OP_REPLY = 1
+OP_QUERY = 2004
+OP_MSG = 2013
+
+_MORE_TO_COME = 1 << 1
+_HEADER = struct.Struct("<iiii")
+
+# Number of distinct synthetic papers in each collection
+CATALOG_SIZE = 2000
+
+_TOPICS = [
+    "gaussian splatting", "diffusion", "vision-language models", "video understanding", "object detection",
+    "depth estimation", "radiance fields", "autonomous driving", "pose estimation", "segmentation",
+]
+
+
+def synthetic_paper(index: int) -> dict:
+    """
+    A deterministic fake paper with the fields the server reads from the catalog.
+
+    Parameters
+    ----------
+    index : int
+        Position of the paper in the synthetic catalog.
+
+    Returns
+    -------
+    dict
+        The paper record.
+    """
+    topic = _TOPICS[index % len(_TOPICS)]
+    return {
+        "title": f"Synthetic paper {index}: efficient {topic}",
+        "authors": [f"Author {index}", f"Author {index + 1}"],
+        "abstract": f"We study {topic}. " + "This sentence pads the abstract to a realistic size. " * 20,
+        "pdf": f"https://example.org/papers/{index}.pdf",
+        "arxiv": f"https://arxiv.org/abs/2501.{index:05d}",
+        "poster_session": f"Session {index % 6 + 1}",
+    }
+
+
+def _object_id(index: int) -> ObjectId:
+    return ObjectId(f"{index:024x}")
+
+
+def _search(stage: dict) -> list[dict]:
+    """Synthetic hits of a `$vectorSearch` stage, seeded by its query vector."""
+    vector = stage.get("queryVector") or []
+    seed = hashlib.sha256(struct.pack(f"<{min(len(vector), 16)}d", *vector[:16])).digest()
+    rng = random.Random(seed)
+    limit = int(stage.get("limit", 10))
+    hits = []
+    for rank, index in enumerate(rng.sample(range(CATALOG_SIZE), min(limit, CATALOG_SIZE))):
+        hits.append(dict(synthetic_paper(index), _id=_object_id(index), score=1.0 - rank / (limit + 1)))
+    return hits
+
+
+class MongoStub:
+    """
+    Answer MongoDB commands over TCP with configurable latency and errors.
+
+    Parameters
+    ----------
+    profile : ServiceProfile
+        Latency and failure rates applied to `aggregate` commands; `find` only gets the latency.
+    """
+
+    def __init__(self, profile: ServiceProfile):
+        self.profile = profile
+        self._request_id = 0
+        self._connections = 0
+
+    async def serve(self, host: str, port: int) -> None:
+        """Accept connections until cancelled."""
+        server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections += 1
+        connection_id = self._connections
+        try:
+            while True:
+                header = await reader.readexactly(_HEADER.size)
+                length, request_id, _, op_code = _HEADER.unpack(header)
+                body = await reader.readexactly(length - _HEADER.size)
+                reply = await self._dispatch(op_code, request_id, body, connection_id)
+                if reply is not None:
+                    writer.write(reply)
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, op_code: int, request_id: int, body: bytes, connection_id: int) -> Optional[bytes]:
+        if op_code == OP_QUERY:
+            # flags, then the namespace as a C string, then skip and limit
+            end = body.index(b"\x00", 4)
+            command = bson.decode(body[end + 9:end + 9 + struct.unpack_from("<i", body, end + 9)[0]])
+            return self._op_reply(request_id, await self._run(command, connection_id))
+        if op_code == OP_MSG:
+            flags = struct.unpack_from("<I", body)[0]
+            command = self._parse_msg(body)
+            response = await self._run(command, connection_id)
+            if flags & _MORE_TO_COME:
+                return None
+            return self._op_msg(request_id, response)
+        return None
+
+    @staticmethod
+    def _parse_msg(body: bytes) -> dict:
+        """The command of an OP_MSG, with document sequences merged in as lists."""
+        command: dict = {}
+        sequences: dict[str, list] = {}
+        offset = 4
+        while offset < len(body):
+            kind = body[offset]
+            offset += 1
+            size = struct.unpack_from("<i", body, offset)[0]
+            if kind == 0:
+                command = bson.decode(body[offset:offset + size])
+            else:
+                end = body.index(b"\x00", offset + 4)
+                identifier = body[offset + 4:end].decode()
+                sequences[identifier] = bson.decode_all(body[end + 1:offset + size])
+            offset += size
+        command.update(sequences)
+        return command
+
+    async def _run(self, command: dict, connection_id: int) -> dict:
+        name = next(iter(command), "").lower()
+        if name in ("hello", "ismaster"):
+            return {
+                "helloOk": True,
+                "ismaster": True,
+                "isWritablePrimary": True,
+                "maxBsonObjectSize": 16 * 1024 * 1024,
+                "maxMessageSizeBytes": 48_000_000,
+                "maxWriteBatchSize": 100_000,
+                "localTime": datetime.datetime.now(datetime.timezone.utc),
+                "logicalSessionTimeoutMinutes": 30,
+                "connectionId": connection_id,
+                "minWireVersion": 0,
+                "maxWireVersion": 17,
+                "readOnly": False,
+                "ok": 1.0,
+            }
+        if name == "aggregate":
+            await asyncio.sleep(self.profile.delay())
+            if self.profile.fault() is not None:
+                return {"ok": 0.0, "errmsg": "stub failure", "code": 1, "codeName": "InternalError"}
+            pipeline = command.get("pipeline", [])
+            hits = []
+            for stage in pipeline:
+                if "$vectorSearch" in stage:
+                    hits = _search(stage["$vectorSearch"])
+            namespace = f"{command.get('$db', 'test')}.{command['aggregate']}"
+            return {"cursor": {"id": Int64(0), "ns": namespace, "firstBatch": hits}, "ok": 1.0}
+        if name == "find":
+            await asyncio.sleep(self.profile.delay())
+            document_id = (command.get("filter") or {}).get("_id")
+            index = int(str(document_id), 16) if isinstance(document_id, ObjectId) else -1
+            found = [dict(synthetic_paper(index), _id=document_id)] if 0 <= index < CATALOG_SIZE else []
+            namespace = f"{command.get('$db', 'test')}.{command['find']}"
+            return {"cursor": {"id": Int64(0), "ns": namespace, "firstBatch": found}, "ok": 1.0}
+        # ping, endSessions and anything else the driver sends in the background
+        return {"ok": 1.0}
+
+    def _next_id(self) -> int:
+        self._request_id += 1
+        return self._request_id
+
+    def _op_reply(self, response_to: int, document: dict) -> bytes:
+        payload = struct.pack("<iqii", 0, 0, 0, 1) + bson.encode(document)
+        return _HEADER.pack(_HEADER.size + len(payload), self._next_id(), response_to, OP_REPLY) + payload
+
+    def _op_msg(self, response_to: int, document: dict) -> bytes:
+        payload = struct.pack("<I", 0) + b"\x00" + bson.encode(document)
+        return _HEADER.pack(_HEADER.size + len(payload), self._next_id(), response_to, OP_MSG) + payload
@@ -0,0 +1,269 @@
+""" Local stand-ins for the Gemini and GitHub APIs with tunable latency and failure rates.
+
+The Gemini stub speaks the REST protocol of both SDKs used by the server:
+`:generateContent` and `:streamGenerateContent?alt=sse` for `google-genai`, and
+`:embedContent` / `:batchEmbedContents` for `google-generativeai`. Re-rank prompts are
+answered with a JSON array of `paper_N` ids found in the prompt, so the server's parsing
+runs as in production. The GitHub stub answers the repository, README and issue
+endpoints with rate-limit headers.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBEDDING_DIMENSIONS = 768
+_PAPER_ID = re.compile(r'"id": "(paper_\d+)"')
+_GEMINI_STATUS = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL"}
+
+
+@dataclass
+class ServiceProfile:
+    """
+    Behaviour of a stubbed service.
+
+    Parameters
+    ----------
+    latency_ms : float
+        Base latency of every call.
+    jitter_ms : float
+        Mean of the exponentially distributed extra latency, which gives the long tail
+        seen on real APIs.
+    error_rate : float
+        Fraction of calls answered with a server error.
+    throttle_rate : float
+        Fraction of calls answered with 429 Too Many Requests.
+    """
+
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+
+    def delay(self) -> float:
+        """Latency of one call, in seconds."""
+        jitter = random.expovariate(1 / self.jitter_ms) if self.jitter_ms > 0 else 0.0
+        return (self.latency_ms + jitter) / 1000
+
+    def fault(self) -> Optional[int]:
+        """The error status of one call, or None if it succeeds."""
+        draw = random.random()
+        if draw < self.throttle_rate:
+            return 429
+        if draw < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+
+def fake_embedding(text: str) -> list[float]:
+    """A deterministic unit-scale embedding of a text."""
+    rng = random.Random(hashlib.sha256(text.encode()).digest())
+    return [rng.uniform(-1.0, 1.0) for _ in range(EMBEDDING_DIMENSIONS)]
+
+
+def _prompt_text(body: dict) -> str:
+    """All the text of a `generateContent` request."""
+    texts = []
+    for content in body.get("contents", []) + [body.get("systemInstruction") or {}]:
+        texts.extend(part.get("text", "") for part in content.get("parts", []))
+    return "\n".join(texts)
+
+
+def _answer(body: dict) -> str:
+    """A plausible answer: ranked ids for re-rank prompts, Markdown prose otherwise."""
+    prompt = _prompt_text(body)
+    config = body.get("generationConfig") or {}
+    if config.get("responseMimeType") == "application/json":
+        ids = _PAPER_ID.findall(prompt)
+        if ids:
+            return json.dumps(random.Random(prompt).sample(ids, min(5, len(ids))))
+        return "{}"
+    return "Stub answer. " + " ".join(f"Sentence {i} about the repository." for i in range(40))
+
+
+def _candidate(text: str, model: str) -> dict:
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": 1, "candidatesTokenCount": 1, "totalTokenCount": 2},
+        "modelVersion": model,
+    }
+
+
+def _gemini_error(status: int) -> JSONResponse:
+    return JSONResponse(
+        {"error": {"code": status, "message": "stub failure", "status": _GEMINI_STATUS.get(status, "INTERNAL")}},
+        status_code=status,
+    )
+
+
+def gemini_app(profile: ServiceProfile, stream_chunks: int = 8) -> FastAPI:
+    """
+    Build the Gemini API stub.
+
+    Parameters
+    ----------
+    profile : ServiceProfile
+        Latency and failure rates; streamed answers spread the latency over their chunks.
+    stream_chunks : int
+        Number of chunks of a streamed answer.
+
+    Returns
+    -------
+    FastAPI
+        The stub application.
+    """
+    app = FastAPI()
+
+    @app.post("/{version}/models/{target}")
+    async def models(target: str, request: Request):
+        model, _, method = target.partition(":")
+        body = await request.json()
+        status = profile.fault()
+
+        if method == "streamGenerateContent":
+            if status is not None:
+                await asyncio.sleep(profile.delay())
+                return _gemini_error(status)
+            return StreamingResponse(_stream(_answer(body), model), media_type="text/event-stream")
+
+        await asyncio.sleep(profile.delay())
+        if status is not None:
+            return _gemini_error(status)
+        if method == "generateContent":
+            return _candidate(_answer(body), model)
+        if method == "embedContent":
+            return {"embedding": {"values": fake_embedding(_prompt_text({"contents": [body.get("content", {})]}))}}
+        if method == "batchEmbedContents":
+            return {"embeddings": [
+                {"values": fake_embedding(_prompt_text({"contents": [item.get("content", {})]}))}
+                for item in body.get("requests", [])
+            ]}
+        return JSONResponse({"error": {"code": 404, "message": f"unknown method {method}"}}, status_code=404)
+
+    async def _stream(text: str, model: str) -> AsyncIterator[str]:
+        # The first chunk takes the base latency, later ones share the jitter
+        words = text.split(" ")
+        size = max(1, len(words) // stream_chunks)
+        await asyncio.sleep(profile.latency_ms / 1000)
+        for start in range(0, len(words), size):
+            chunk = " ".join(words[start:start + size]) + " "
+            yield f"data: {json.dumps(_candidate(chunk, model))}\r\n\r\n"
+            await asyncio.sleep((profile.delay() - profile.latency_ms / 1000) / stream_chunks)
+
+    return app
+
+
+def github_app(profile: ServiceProfile) -> FastAPI:
+    """
+    Build the GitHub REST API stub.
+
+    Parameters
+    ----------
+    profile : ServiceProfile
+        Latency and failure rates.
+
+    Returns
+    -------
+    FastAPI
+        The stub application.
+    """
+    app = FastAPI()
+
+    def headers(remaining: int = 4999) -> dict[str, str]:
+        return {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(int(time.time()) + 1),
+            "ETag": '"stub"',
+        }
+
+    async def reply(content) -> JSONResponse:
+        await asyncio.sleep(profile.delay())
+        status = profile.fault()
+        if status == 429:
+            return JSONResponse({"message": "API rate limit exceeded"}, status_code=429, headers=headers(0))
+        if status is not None:
+            return JSONResponse({"message": "Server Error"}, status_code=status, headers=headers())
+        return JSONResponse(content, headers=headers())
+
+    @app.get("/repos/{owner}/{repo}")
+    async def repository(owner: str, repo: str):
+        return await reply({
+            "full_name": f"{owner}/{repo}",
+            "name": repo,
+            "owner": {"login": owner},
+            "description": "A stubbed repository",
+            "html_url": f"https://github.com/{owner}/{repo}",
+            "default_branch": "main",
+            "stargazers_count": 1234,
+            "forks_count": 56,
+            "open_issues_count": 7,
+            "language": "Python",
+        })
+
+    @app.get("/repos/{owner}/{repo}/readme")
+    async def readme(owner: str, repo: str):
+        text = f"# {repo}\n\n## Installation\n\n```bash\npip install {repo}\n```\n"
+        return await reply({"encoding": "base64", "content": base64.b64encode(text.encode()).decode()})
+
+    @app.get("/repos/{owner}/{repo}/issues")
+    async def issues(owner: str, repo: str):
+        return await reply([
+            {
+                "number": number,
+                "title": f"Stub issue {number}",
+                "body": "Something does not work as expected.",
+                "html_url": f"https://github.com/{owner}/{repo}/issues/{number}",
+                "labels": [{"name": "good first issue"}],
+                "comments": number % 3,
+                "state": "open",
+            }
+            for number in range(1, 21)
+        ])
+
+    @app.get("/{path:path}")
+    async def other(path: str):
+        return await reply({})
+
+    return app
+
+
+async def serve_stubs(
+    host: str,
+    gemini_port: int,
+    mongo_port: int,
+    github_port: int,
+    gemini: ServiceProfile,
+    mongo: ServiceProfile,
+    github: ServiceProfile,
+) -> None:
+    """
+    Run the Gemini, MongoDB and GitHub stubs in the current event loop until cancelled.
+
+    Parameters
+    ----------
+    host : str
+        Interface to listen on.
+    gemini_port, mongo_port, github_port : int
+        Ports of the three stubs.
+    gemini, mongo, github : ServiceProfile
+        Behaviour of each stub.
+    """
+    import uvicorn
+
+    from benchmarks.loadtest.mongo_stub import MongoStub
+
+    servers = [
+        uvicorn.Server(uvicorn.Config(gemini_app(gemini), host=host, port=gemini_port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(github_app(github), host=host, port=github_port, log_level="warning")),
+    ]
+    await asyncio.gather(*(server.serve() for server in servers), MongoStub(mongo).serve(host, mongo_port))
@@ -11,3 +11,6 @@ MAX_TOTAL_SIZE_BYTES = 500 * 1024 * 1024  # 500 MB
 OUTPUT_FILE_PATH = "digest.txt"
 
 TMP_BASE_PATH = Path(tempfile.gettempdir()) / "forky"
+
+# Long-lived caches live outside TMP_BASE_PATH so repository cleanup does not remove them
+CACHE_BASE_PATH = Path(tempfile.gettempdir()) / "forky-cache"
@@ -0,0 +1,154 @@
+""" Concurrent, deadline-bounded orchestration of the repository analysis stages. """
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+from server.ai import content_provider
+from server.server_config import ANALYSIS_DEADLINE
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One step of the analysis pipeline.
+
+    `run` receives the results of the stages listed in `depends_on` as keyword arguments.
+    """
+
+    name: str
+    run: Callable[..., Awaitable[Any]]
+    depends_on: tuple[str, ...] = ()
+
+
+@dataclass
+class PipelineResult:
+    """Results of the stages that finished, and the names of those that did not."""
+
+    results: dict[str, Any] = field(default_factory=dict)
+    failed: list[str] = field(default_factory=list)
+    pending: list[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        """Whether every stage finished successfully before the deadline."""
+        return not self.failed and not self.pending
+
+
+async def run_stages(stages: list[Stage], deadline: float) -> PipelineResult:
+    """
+    Run a dependency graph of stages, starting each one as soon as its inputs are ready.
+
+    Independent stages run concurrently, so the total latency follows the slowest chain
+    of dependent stages instead of the sum of all stages. Stages still running when the
+    deadline expires are cancelled and reported as pending.
+
+    Parameters
+    ----------
+    stages : list[Stage]
+        The stages to run; dependencies must refer to stages listed earlier.
+    deadline : float
+        The overall time budget in seconds.
+
+    Returns
+    -------
+    PipelineResult
+        The partial or complete results.
+
+    Raises
+    ------
+    ValueError
+        If a stage depends on an unknown or later stage.
+    """
+    start = time.monotonic()
+    tasks: dict[str, asyncio.Task] = {}
+
+    async def _run(stage: Stage) -> Any:
+        inputs = {dep: await tasks[dep] for dep in stage.depends_on}
+        return await stage.run(**inputs)
+
+    for stage in stages:
+        missing = [dep for dep in stage.depends_on if dep not in tasks]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages {missing}")
+        tasks[stage.name] = asyncio.create_task(_run(stage), name=f"analysis:{stage.name}")
+
+    _, still_running = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in still_running:
+        task.cancel()
+    await asyncio.gather(*still_running, return_exceptions=True)
+
+    result = PipelineResult(elapsed=time.monotonic() - start)
+    for name, task in tasks.items():
+        if task in still_running:
+            result.pending.append(name)
+        elif task.exception() is not None:
+            print(f"Analysis stage {name} failed: {task.exception()}")
+            result.failed.append(name)
+        else:
+            result.results[name] = task.result()
+    return result
+
+
+async def analyze_repository(
+    url: str,
+    repo_data: dict,
+    tree: str,
+    content: str,
+    deadline: Optional[float] = None,
+) -> PipelineResult:
+    """
+    Run the full repository analysis with independent stages in parallel.
+
+    The README, metrics, issues, description and diagram stages start immediately; the
+    installation instructions start as soon as the README is available.
+
+    Parameters
+    ----------
+    url : str
+        The GitHub repository URL
+    repo_data : dict
+        Repository data from the GitHub API
+    tree : str
+        String representation of the repository file structure
+    content : str
+        Content of the repository files
+    deadline : Optional[float]
+        Overall time budget in seconds; defaults to `ANALYSIS_DEADLINE`
+
+    Returns
+    -------
+    PipelineResult
+        Results keyed by stage name: "readme", "installation", "description", "metrics",
+        "issues" and "diagram". Stages that missed the deadline are listed as pending.
+    """
+
+    async def readme() -> str:
+        return await content_provider.get_github_readme(url)
+
+    async def installation(readme: str) -> str:
+        return await content_provider.get_installation_usage(url, readme=readme)
+
+    async def description() -> dict:
+        return await content_provider.get_project_description(tree, content)
+
+    async def metrics() -> dict:
+        return await content_provider.get_project_metrics(repo_data)
+
+    async def issues() -> dict:
+        return await content_provider.get_repository_issues(repo_data, content)
+
+    async def diagram() -> str:
+        return await asyncio.to_thread(content_provider.get_general_overview_diagram, url, tree)
+
+    stages = [
+        Stage("readme", readme),
+        Stage("installation", installation, depends_on=("readme",)),
+        Stage("description", description),
+        Stage("metrics", metrics),
+        Stage("issues", issues),
+        Stage("diagram", diagram),
+    ]
+    return await run_stages(stages, ANALYSIS_DEADLINE if deadline is None else deadline)
@@ -0,0 +1,305 @@
+""" Compact, memory-mapped binary format for the CVPR paper catalog.
+
+The JSON catalog has to be parsed into Python strings by every process that reads it.
+The binary catalog is instead memory-mapped read-only, so all worker processes share a
+single page-cache copy and individual fields are only decoded when they are accessed.
+
+File layout (all integers little-endian):
+
+    header    : magic, version, field count, record count, index offset, strings offset
+    records   : record count x field count x (offset: u32, length: u32)
+    index     : record count x (title hash: u64), sorted, then record count x (record: u32)
+    strings   : UTF-8 string table, identical strings stored once
+
+A field length of `NULL_LENGTH` encodes `None`; list fields are joined with `LIST_SEPARATOR`.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from server.ai.paper_catalog import iter_catalog, normalize_title
+
+MAGIC = b"FKYC"
+VERSION = 1
+
+FIELDS: tuple[str, ...] = (
+    "title",
+    "authors",
+    "pdf",
+    "supp",
+    "arxiv",
+    "bibtex",
+    "abstract",
+    "poster_session",
+    "poster_location",
+)
+LIST_FIELDS = frozenset({"authors"})
+FIELD_INDEX = {name: idx for idx, name in enumerate(FIELDS)}
+
+LIST_SEPARATOR = "\x1f"
+NULL_LENGTH = 0xFFFFFFFF
+
+_HEADER = struct.Struct("<4sHHIQQ")
+_SLOT = struct.Struct("<II")
+_HASH = struct.Struct("<Q")
+_RECORD = struct.Struct("<I")
+
+
+def title_hash(title: str) -> int:
+    """
+    Compute the stable 64-bit hash used by the catalog title index.
+
+    Parameters
+    ----------
+    title : str
+        The paper title.
+
+    Returns
+    -------
+    int
+        The hash of the normalized title.
+    """
+    digest = hashlib.blake2b(normalize_title(title).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class PaperRecord(Mapping):
+    """A read-only view of one paper whose fields are decoded on access."""
+
+    __slots__ = ("_catalog", "_index")
+
+    def __init__(self, catalog: "BinaryCatalog", index: int):
+        self._catalog = catalog
+        self._index = index
+
+    def __getitem__(self, field: str):
+        if field not in FIELD_INDEX:
+            raise KeyError(field)
+        return self._catalog._field(self._index, FIELD_INDEX[field])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __repr__(self) -> str:
+        return f"PaperRecord({self['title']!r})"
+
+
+class BinaryCatalog(Mapping):
+    """
+    A memory-mapped paper catalog that behaves like a read-only `dict[title, paper]`.
+
+    Parameters
+    ----------
+    path : Path
+        The path to a catalog written by `write_catalog`.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a catalog of a supported version.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, field_count, self._count, self._index_offset, self._strings_offset = (
+            _HEADER.unpack_from(self._mm, 0)
+        )
+        if magic != MAGIC or version != VERSION or field_count != len(FIELDS):
+            self._mm.close()
+            raise ValueError(f"{self.path} is not a supported paper catalog")
+        self._records_offset = _HEADER.size
+        self._positions_offset = self._index_offset + self._count * _HASH.size
+
+    def _field(self, index: int, field: int):
+        slot = self._records_offset + (index * len(FIELDS) + field) * _SLOT.size
+        offset, length = _SLOT.unpack_from(self._mm, slot)
+        if length == NULL_LENGTH:
+            return None
+
+        start = self._strings_offset + offset
+        value = self._mm[start:start + length].decode("utf-8")
+        if FIELDS[field] in LIST_FIELDS:
+            return value.split(LIST_SEPARATOR) if value else []
+        return value
+
+    def record(self, index: int) -> PaperRecord:
+        """
+        Return the paper stored at a given position.
+
+        Parameters
+        ----------
+        index : int
+            The record position, between 0 and `len(catalog) - 1`.
+
+        Returns
+        -------
+        PaperRecord
+            A lazy view of the paper.
+        """
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return PaperRecord(self, index)
+
+    def find(self, title: str) -> Optional[PaperRecord]:
+        """
+        Look up a paper by title through the sorted hash index.
+
+        Parameters
+        ----------
+        title : str
+            The paper title; casing and punctuation are ignored.
+
+        Returns
+        -------
+        Optional[PaperRecord]
+            The matching paper, or None if the title is not in the catalog.
+        """
+        target = title_hash(title)
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _HASH.unpack_from(self._mm, self._index_offset + mid * _HASH.size)[0] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        normalized = normalize_title(title)
+        while lo < self._count:
+            if _HASH.unpack_from(self._mm, self._index_offset + lo * _HASH.size)[0] != target:
+                break
+            (index,) = _RECORD.unpack_from(self._mm, self._positions_offset + lo * _RECORD.size)
+            if normalize_title(self._field(index, 0)) == normalized:
+                return PaperRecord(self, index)
+            lo += 1
+        return None
+
+    def __getitem__(self, title: str) -> PaperRecord:
+        record = self.find(title)
+        if record is None:
+            raise KeyError(title)
+        return record
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._count):
+            yield self._field(index, 0)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def values(self) -> Iterator[PaperRecord]:
+        """Yield every paper in storage order without going through the title index."""
+        for index in range(self._count):
+            yield PaperRecord(self, index)
+
+    def items(self) -> Iterator[tuple[str, PaperRecord]]:
+        """Yield `(title, paper)` pairs in storage order."""
+        for index in range(self._count):
+            yield self._field(index, 0), PaperRecord(self, index)
+
+    def close(self) -> None:
+        """Unmap the catalog file."""
+        self._mm.close()
+
+    def __enter__(self) -> "BinaryCatalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_catalog(papers: Iterable[tuple[str, Mapping]], path: Path) -> int:
+    """
+    Write papers to a binary catalog.
+
+    The file is written next to its destination and atomically renamed into place, so
+    processes that already have the old catalog mapped keep reading a consistent copy.
+
+    Parameters
+    ----------
+    papers : Iterable[tuple[str, Mapping]]
+        `(title, paper)` pairs, as produced by `iter_catalog` or `dict.items()`.
+    path : Path
+        The destination file.
+
+    Returns
+    -------
+    int
+        The number of records written.
+    """
+    path = Path(path)
+    strings = bytearray()
+    interned: dict[str, tuple[int, int]] = {}
+    slots = bytearray()
+    index: list[tuple[int, int]] = []
+
+    for count, (title, paper) in enumerate(papers):
+        for name in FIELDS:
+            value = paper.get(name) if name != "title" else paper.get("title") or title
+            if value is None:
+                slots += _SLOT.pack(0, NULL_LENGTH)
+                continue
+
+            if name in LIST_FIELDS:
+                value = LIST_SEPARATOR.join(value)
+            if value not in interned:
+                encoded = value.encode("utf-8")
+                interned[value] = (len(strings), len(encoded))
+                strings += encoded
+            slots += _SLOT.pack(*interned[value])
+        index.append((title_hash(title), count))
+
+    index.sort()
+    record_count = len(index)
+    index_offset = _HEADER.size + len(slots)
+    strings_offset = index_offset + record_count * (_HASH.size + _RECORD.size)
+
+    # Per process, so workers rebuilding the catalog at the same time do not share a temp file
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(FIELDS), record_count, index_offset, strings_offset))
+        f.write(slots)
+        f.write(b"".join(_HASH.pack(h) for h, _ in index))
+        f.write(b"".join(_RECORD.pack(i) for _, i in index))
+        f.write(strings)
+    os.replace(tmp_path, path)
+    return record_count
+
+
+def convert_catalog(source: Path, destination: Path) -> int:
+    """
+    Convert a JSON or JSONL catalog into the binary format.
+
+    Parameters
+    ----------
+    source : Path
+        The JSON or JSONL catalog to read.
+    destination : Path
+        The binary catalog to write.
+
+    Returns
+    -------
+    int
+        The number of records written.
+    """
+    return write_catalog(iter_catalog(source), destination)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python -m server.ai.binary_catalog <catalog.json|.jsonl> <catalog.fkc>")
+        sys.exit(1)
+    print(f"Wrote {convert_catalog(Path(sys.argv[1]), Path(sys.argv[2]))} papers to {sys.argv[2]}")
@@ -0,0 +1,280 @@
+""" Offline job computing topic clusters and a 2D map of the paper catalog.
+
+The stored paper embeddings are grouped with spherical k-means and projected to two
+dimensions with PCA. Every cluster is labelled with its most distinctive terms by class
+TF-IDF over the titles and abstracts of its papers. The result is written as one JSON
+file that `/papers/map` serves as it is, without any vector search or LLM call.
+
+Usage:
+    python -m server.ai.build_topic_map [--clusters 30]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Mapping
+
+import numpy as np
+
+from server.ai.embedders import paper_text, terms
+from server.ai.gemini_client import LOCAL_CATALOG_SHARD, TOPIC_MAP_FILE, GeminiClient, catalog_version
+from server.server_config import CATALOG_SHARDS, PAPER_INDEX_BACKEND
+
+DEFAULT_CLUSTERS = 30
+KEYWORDS_PER_CLUSTER = 8
+# Terms used by fewer papers are too rare to describe a cluster
+MIN_TERM_PAPERS = 3
+# Paper fields kept in the drill-down of a cluster
+PAPER_FIELDS = ("title", "authors", "abstract", "pdf", "arxiv", "poster_session", "poster_location")
+
+
+def kmeans(vectors: np.ndarray, clusters: int, iterations: int = 100, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Spherical k-means of unit vectors, seeded with k-means++.
+
+    Parameters
+    ----------
+    vectors : np.ndarray
+        Unit-length row vectors.
+    clusters : int
+        Number of clusters.
+    iterations : int
+        Maximum number of assignment rounds.
+    seed : int
+        Seed of the initialization.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The cluster of every row, and the unit-length cluster centroids.
+    """
+    rng = np.random.default_rng(seed)
+    rows = len(vectors)
+    centroids = [vectors[rng.integers(rows)]]
+    distances = 1.0 - vectors @ centroids[0]
+    for _ in range(1, clusters):
+        weights = np.clip(distances, 0.0, None) ** 2
+        total = weights.sum()
+        row = rng.choice(rows, p=weights / total) if total > 0 else rng.integers(rows)
+        centroids.append(vectors[row])
+        distances = np.minimum(distances, 1.0 - vectors @ vectors[row])
+    centroids = np.stack(centroids)
+
+    labels = np.full(rows, -1)
+    for _ in range(iterations):
+        similarities = vectors @ centroids.T
+        assigned = similarities.argmax(axis=1)
+        if np.array_equal(assigned, labels):
+            break
+        labels = assigned
+        for cluster in range(clusters):
+            members = vectors[labels == cluster]
+            if len(members):
+                centroid = members.sum(axis=0)
+            else:
+                # Move an empty cluster to the paper furthest from its own centroid
+                centroid = vectors[similarities.max(axis=1).argmin()]
+            centroids[cluster] = centroid / (np.linalg.norm(centroid) or 1.0)
+    return labels, centroids
+
+
+def project_2d(vectors: np.ndarray) -> np.ndarray:
+    """The first two principal components of the rows, scaled into [-1, 1]."""
+    centered = vectors - vectors.mean(axis=0)
+    _, _, vt = np.linalg.svd(centered, full_matrices=False)
+    points = centered @ vt[:2].T
+    return points / (np.abs(points).max(axis=0) + 1e-12)
+
+
+def cluster_keywords(texts: list[str], labels: np.ndarray, clusters: int, count: int = KEYWORDS_PER_CLUSTER) -> list[list[str]]:
+    """
+    The most distinctive terms of every cluster, by class TF-IDF.
+
+    All texts of a cluster are treated as one document; a term scores high when it is
+    frequent in the cluster and rare in the others. Keywords do not share words, and a
+    strong bigram such as "gaussian splatting" is preferred over its single words.
+
+    Parameters
+    ----------
+    texts : list[str]
+        The text of every paper.
+    labels : np.ndarray
+        The cluster of every paper.
+    clusters : int
+        Number of clusters.
+    count : int
+        Number of keywords per cluster.
+
+    Returns
+    -------
+    list[list[str]]
+        The keywords of every cluster, best first.
+    """
+    papers_with: dict[str, int] = {}
+    cluster_counts: list[dict[str, int]] = [{} for _ in range(clusters)]
+    for text, label in zip(texts, labels):
+        paper_terms = terms(text)
+        for term in set(paper_terms):
+            papers_with[term] = papers_with.get(term, 0) + 1
+        counts = cluster_counts[label]
+        for term in paper_terms:
+            counts[term] = counts.get(term, 0) + 1
+
+    vocabulary = [term for term, papers in papers_with.items() if papers >= MIN_TERM_PAPERS]
+    column = {term: index for index, term in enumerate(vocabulary)}
+    frequencies = np.zeros((clusters, len(vocabulary)))
+    for cluster, counts in enumerate(cluster_counts):
+        for term, term_count in counts.items():
+            if term in column:
+                frequencies[cluster, column[term]] = term_count
+    sizes = frequencies.sum(axis=1, keepdims=True)
+    totals = frequencies.sum(axis=0)
+    scores = frequencies / np.where(sizes == 0, 1, sizes) * np.log(1 + sizes.mean() / np.where(totals == 0, 1, totals))
+
+    keywords = []
+    for cluster in range(clusters):
+        ranked = [index for index in np.argsort(-scores[cluster])[:count * 3] if scores[cluster, index] > 0]
+        # A bigram that scores at least half as high as one of its words replaces that word
+        absorbed = {
+            word
+            for index in ranked if " " in vocabulary[index]
+            for word in vocabulary[index].split()
+            if word in column and scores[cluster, index] >= scores[cluster, column[word]] / 2
+        }
+        chosen: list[str] = []
+        covered: set[str] = set()
+        for index in ranked:
+            term = vocabulary[index]
+            words = set(term.split())
+            if term in absorbed or words & covered:
+                continue
+            chosen.append(term)
+            covered |= words
+            if len(chosen) == count:
+                break
+        keywords.append(chosen)
+    return keywords
+
+
+def build_topic_map(papers: Mapping, titles: list[str], vectors: np.ndarray, clusters: int, venue: str) -> dict:
+    """
+    Cluster, project and label the papers.
+
+    Parameters
+    ----------
+    papers : Mapping
+        The catalog, keyed by title.
+    titles : list[str]
+        Titles of the embedded papers, in the row order of `vectors`.
+    vectors : np.ndarray
+        The stored paper embeddings.
+    clusters : int
+        Number of topic clusters.
+    venue : str
+        Label of the catalog, e.g. "CVPR 2025".
+
+    Returns
+    -------
+    dict
+        The topic map: `clusters` with their label, keywords, size and position, `points`
+        as `[title, x, y, cluster]` rows, and `papers` of every cluster, closest to its
+        centroid first.
+
+    Raises
+    ------
+    ValueError
+        If none of the embedded papers is in the catalog.
+    """
+    known = [row for row, title in enumerate(titles) if title in papers]
+    titles = [titles[row] for row in known]
+    if not titles:
+        raise ValueError("None of the embedded papers is in the catalog")
+    vectors = vectors[known].astype(np.float64)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+    clusters = max(1, min(clusters, len(titles)))
+
+    labels, centroids = kmeans(vectors, clusters)
+    points = project_2d(vectors)
+    keywords = cluster_keywords([paper_text(title, papers[title]) for title in titles], labels, clusters)
+    closeness = (vectors * centroids[labels]).sum(axis=1)
+
+    cluster_entries, cluster_papers = [], {}
+    for cluster in range(clusters):
+        members = np.flatnonzero(labels == cluster)
+        members = members[np.argsort(-closeness[members])]
+        center = points[members].mean(axis=0) if len(members) else np.zeros(2)
+        cluster_entries.append({
+            "id": cluster,
+            "label": ", ".join(keywords[cluster][:3]) or f"Topic {cluster + 1}",
+            "keywords": keywords[cluster],
+            "size": len(members),
+            "x": round(float(center[0]), 4),
+            "y": round(float(center[1]), 4),
+        })
+        cluster_papers[str(cluster)] = [
+            {field: papers[titles[row]].get(field) for field in PAPER_FIELDS} for row in members
+        ]
+
+    # Largest topics first; ids stay stable within one map
+    cluster_entries.sort(key=lambda entry: -entry["size"])
+    return {
+        "version": catalog_version(),
+        "created_at": int(time.time()),
+        "venue": venue,
+        "clusters": cluster_entries,
+        "points": [
+            [title, round(float(x), 4), round(float(y), 4), int(label)]
+            for title, (x, y), label in zip(titles, points, labels)
+        ],
+        "papers": cluster_papers,
+    }
+
+
+def write_topic_map(topic_map: dict, path: Path) -> None:
+    """Write the topic map atomically, so the server never reads a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(topic_map, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def _stored_embeddings(gemini_client: GeminiClient) -> tuple[list[str], np.ndarray]:
+    """Titles and embeddings of the local catalog shard, from the configured paper index."""
+    if PAPER_INDEX_BACKEND == "local":
+        return gemini_client.paper_index.matrix()
+    shard = next(shard for shard in CATALOG_SHARDS if shard["id"] == LOCAL_CATALOG_SHARD)
+    collection = gemini_client.mongo_client[shard["database"]][shard["collection"]]
+    titles, vectors = [], []
+    for document in collection.find({"embedding": {"$exists": True}}, {"title": 1, "embedding": 1}):
+        titles.append(document["title"])
+        vectors.append(document["embedding"])
+    return titles, np.asarray(vectors, dtype=np.float32)
+
+
+def main():
+    """Build the topic map of the CVPR catalog from its stored embeddings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clusters", type=int, default=DEFAULT_CLUSTERS, help="number of topic clusters")
+    parser.add_argument("--output", type=Path, default=TOPIC_MAP_FILE, help="where to write the topic map")
+    args = parser.parse_args()
+
+    gemini_client = GeminiClient()
+    papers = gemini_client._get_cvpr_papers()
+    titles, vectors = _stored_embeddings(gemini_client)
+    if not titles:
+        print("No stored paper embeddings found")
+        return
+
+    start = time.perf_counter()
+    shard = next(shard for shard in CATALOG_SHARDS if shard["id"] == LOCAL_CATALOG_SHARD)
+    topic_map = build_topic_map(papers, titles, vectors, args.clusters, f"{shard['venue']} {shard['year']}")
+    write_topic_map(topic_map, args.output)
+    print(f"Mapped {len(topic_map['points'])} papers into {len(topic_map['clusters'])} topics "
+          f"in {time.perf_counter() - start:.1f}s: {args.output}")
+    for cluster in topic_map["clusters"]:
+        print(f"  {cluster['size']:>5}  {cluster['label']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+""" Bounded in-memory store for chat sessions and the repository context they refer to. """
+
+import hashlib
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from config import CACHE_BASE_PATH
+from server.ai.summarizer import count_tokens
+
+CHAT_SESSIONS_FILE = CACHE_BASE_PATH / "chat_sessions.sqlite3"
+
+
+@dataclass
+class ChatContext:
+    """A repository digest and summary uploaded once and shared by all its conversations."""
+
+    digest_id: str
+    content: str
+    summary: str
+    last_used: float = field(default_factory=time.time)
+
+    @property
+    def size(self) -> int:
+        """Approximate memory footprint in bytes."""
+        return len(self.content) + len(self.summary)
+
+
+@dataclass
+class ChatSession:
+    """One conversation about a repository context."""
+
+    session_id: str
+    digest_id: str
+    history: list[dict] = field(default_factory=list)
+    last_used: float = field(default_factory=time.time)
+
+
+def digest_id_for(content: str) -> str:
+    """Derive a stable digest id from repository content."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+
+
+def append_message(history: list[dict], role: str, text: str, token_budget: int) -> None:
+    """
+    Add a message to a history and trim the oldest turns beyond the token budget.
+
+    Parameters
+    ----------
+    history : list[dict]
+        The session history, updated in place.
+    role : str
+        "user" or "model".
+    text : str
+        The message text.
+    token_budget : int
+        Maximum number of history tokens kept.
+    """
+    history.append({"role": role, "text": text, "tokens": count_tokens(text)})
+    total = sum(message["tokens"] for message in history)
+    while len(history) > 1 and total > token_budget:
+        total -= history.pop(0)["tokens"]
+    # Keep the history starting on a user turn
+    while len(history) > 1 and history[0]["role"] != "user":
+        history.pop(0)
+
+
+class ChatSessionStore:
+    """
+    LRU store of chat contexts and sessions with TTL expiry and a memory cap.
+
+    Repository contexts are keyed by digest id, so a popular repository is held once no
+    matter how many people chat about it. Each session keeps its own history, trimmed to
+    a token budget. The store is thread-safe, so the handlers can call it through
+    `asyncio.to_thread` like the shared store.
+
+    Parameters
+    ----------
+    ttl : float
+        Seconds of inactivity after which contexts and sessions expire.
+    max_bytes : int
+        Memory cap for the stored contexts.
+    max_sessions : int
+        Maximum number of live sessions.
+    history_token_budget : int
+        Maximum number of history tokens kept per session.
+    """
+
+    def __init__(self, ttl: float, max_bytes: int, max_sessions: int, history_token_budget: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.history_token_budget = history_token_budget
+        self._contexts: OrderedDict[str, ChatContext] = OrderedDict()
+        self._sessions: OrderedDict[str, ChatSession] = OrderedDict()
+        self._context_bytes = 0
+        self._lock = threading.Lock()
+
+    def create(self, content: str, summary: str = "") -> ChatSession:
+        """
+        Start a session, storing the repository context if it is not stored yet.
+
+        Contexts are keyed by a hash of their content, so a session can only ever share
+        the context of another session with the very same content.
+
+        Parameters
+        ----------
+        content : str
+            The repository digest.
+        summary : str
+            The repository summary.
+
+        Returns
+        -------
+        ChatSession
+            The new session.
+
+        Raises
+        ------
+        ValueError
+            If the context alone is larger than the memory cap.
+        """
+        if len(content) + len(summary) > self.max_bytes:
+            raise ValueError("Repository context is too large for a chat session")
+
+        digest_id = digest_id_for(content)
+        session = ChatSession(secrets.token_urlsafe(16), digest_id)
+        with self._lock:
+            context = self._contexts.pop(digest_id, None)
+            if context is not None:
+                self._context_bytes -= context.size
+            context = ChatContext(digest_id, content, summary or (context.summary if context else ""))
+            self._contexts[digest_id] = context
+            self._context_bytes += context.size
+
+            self._sessions[session.session_id] = session
+            self._evict()
+        return session
+
+    def get(self, session_id: str) -> Optional[tuple[ChatSession, ChatContext]]:
+        """
+        Look up a live session and its context, refreshing both.
+
+        Parameters
+        ----------
+        session_id : str
+            The session id returned by `create`.
+
+        Returns
+        -------
+        Optional[tuple[ChatSession, ChatContext]]
+            The session and its context, or None if either expired or was evicted.
+        """
+        with self._lock:
+            self._evict()
+            session = self._sessions.get(session_id)
+            context = self._contexts.get(session.digest_id) if session else None
+            if session is None or context is None:
+                return None
+
+            now = time.time()
+            session.last_used = context.last_used = now
+            self._sessions.move_to_end(session_id)
+            self._contexts.move_to_end(context.digest_id)
+        return session, context
+
+    def append(self, session: ChatSession, role: str, text: str) -> None:
+        """
+        Add a message to a session and trim the oldest turns beyond the token budget.
+
+        Parameters
+        ----------
+        session : ChatSession
+            The session to update.
+        role : str
+            "user" or "model".
+        text : str
+            The message text.
+        """
+        with self._lock:
+            append_message(session.history, role, text, self.history_token_budget)
+
+    def stats(self) -> dict[str, int]:
+        """Current number of contexts and sessions and the bytes held by contexts."""
+        with self._lock:
+            return {"contexts": len(self._contexts), "sessions": len(self._sessions), "bytes": self._context_bytes}
+
+    def _evict(self) -> None:
+        cutoff = time.time() - self.ttl
+
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_used >= cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+        while self._contexts:
+            oldest = next(iter(self._contexts.values()))
+            if oldest.last_used >= cutoff and self._context_bytes <= self.max_bytes:
+                break
+            self._contexts.popitem(last=False)
+            self._context_bytes -= oldest.size
+
+
+class SharedChatSessionStore:
+    """
+    Chat session store kept in SQLite so that several worker processes share it.
+
+    Offers the same interface as `ChatSessionStore`. A session created by one worker can
+    be continued by any other, with the same TTL, memory cap and history trimming. Each
+    worker also keeps the most recently used contexts in memory, which is safe because
+    the content of a digest never changes. Contents live in their own table, so
+    refreshing a context or session only rewrites small rows and a lookup whose
+    context is cached locally never reads the content. The methods block on SQLite and
+    are meant to be called through `asyncio.to_thread`.
+
+    Parameters
+    ----------
+    ttl : float
+        Seconds of inactivity after which contexts and sessions expire.
+    max_bytes : int
+        Size cap for the stored contexts.
+    max_sessions : int
+        Maximum number of live sessions.
+    history_token_budget : int
+        Maximum number of history tokens kept per session.
+    path : Path
+        The SQLite database file.
+    local_cache_bytes : int
+        Size cap for the contexts each worker keeps in memory.
+    """
+
+    SCHEMA_VERSION = 2
+
+    def __init__(
+        self,
+        ttl: float,
+        max_bytes: int,
+        max_sessions: int,
+        history_token_budget: int,
+        path: Path = CHAT_SESSIONS_FILE,
+        local_cache_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.history_token_budget = history_token_budget
+        self.local_cache_bytes = local_cache_bytes
+        self._local: OrderedDict[str, ChatContext] = OrderedDict()
+        self._local_bytes = 0
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            # Sessions are short-lived, so an older layout is dropped rather than migrated
+            (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+            if version != self.SCHEMA_VERSION:
+                for table in ("contexts", "context_contents", "sessions"):
+                    self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+                self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            for statement in (
+                """
+                CREATE TABLE IF NOT EXISTS contexts (
+                    digest_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """,
+                "CREATE TABLE IF NOT EXISTS context_contents (digest_id TEXT PRIMARY KEY, content TEXT NOT NULL)",
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    digest_id TEXT NOT NULL,
+                    history TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """,
+                "CREATE INDEX IF NOT EXISTS contexts_last_used ON contexts (last_used)",
+                "CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)",
+                """
+                CREATE TRIGGER IF NOT EXISTS contexts_delete AFTER DELETE ON contexts BEGIN
+                    DELETE FROM context_contents WHERE digest_id = OLD.digest_id;
+                END
+                """,
+            ):
+                self._conn.execute(statement)
+
+    def create(self, content: str, summary: str = "") -> ChatSession:
+        """
+        Start a session, storing the repository context if it is not stored yet.
+
+        Contexts are keyed by a hash of their content, so a session can only ever share
+        the context of another session with the very same content.
+
+        Parameters
+        ----------
+        content : str
+            The repository digest.
+        summary : str
+            The repository summary.
+
+        Returns
+        -------
+        ChatSession
+            The new session.
+
+        Raises
+        ------
+        ValueError
+            If the context alone is larger than the memory cap.
+        """
+        if len(content) + len(summary) > self.max_bytes:
+            raise ValueError("Repository context is too large for a chat session")
+
+        digest_id = digest_id_for(content)
+        session = ChatSession(secrets.token_urlsafe(16), digest_id)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO contexts VALUES (?, ?, ?, ?)
+                ON CONFLICT (digest_id) DO UPDATE SET
+                    summary = CASE WHEN excluded.summary != '' THEN excluded.summary ELSE summary END,
+                    last_used = excluded.last_used
+                """,
+                (digest_id, summary, len(content) + len(summary), now),
+            )
+            # The content of a digest id never changes, so a stored one is not rewritten
+            self._conn.execute("INSERT OR IGNORE INTO context_contents VALUES (?, ?)", (digest_id, content))
+            self._conn.execute("INSERT INTO sessions VALUES (?, ?, '[]', ?)", (session.session_id, digest_id, now))
+            self._evict(now)
+        return session
+
+    def get(self, session_id: str) -> Optional[tuple[ChatSession, ChatContext]]:
+        """
+        Look up a live session and its context, refreshing both.
+
+        Parameters
+        ----------
+        session_id : str
+            The session id returned by `create`.
+
+        Returns
+        -------
+        Optional[tuple[ChatSession, ChatContext]]
+            The session and its context, or None if either expired or was evicted.
+        """
+        now = time.time()
+        cutoff = now - self.ttl
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT s.digest_id, s.history, c.summary FROM sessions s JOIN contexts c USING (digest_id)
+                WHERE s.session_id = ? AND s.last_used >= ? AND c.last_used >= ?
+                """,
+                (session_id, cutoff, cutoff),
+            ).fetchone()
+            if row is None:
+                return None
+            digest_id, history, summary = row
+
+            context = self._local.get(digest_id)
+            if context is None:
+                row = self._conn.execute(
+                    "SELECT content FROM context_contents WHERE digest_id = ?", (digest_id,)
+                ).fetchone()
+                if row is None:
+                    # Evicted by another worker since the session was read
+                    return None
+                context = ChatContext(digest_id, row[0], summary)
+                self._cache_locally(context)
+            else:
+                self._local.move_to_end(digest_id)
+                context.summary = summary
+
+            self._conn.execute("UPDATE sessions SET last_used = ? WHERE session_id = ?", (now, session_id))
+            self._conn.execute("UPDATE contexts SET last_used = ? WHERE digest_id = ?", (now, digest_id))
+
+        context.last_used = now
+        return ChatSession(session_id, digest_id, json.loads(history), now), context
+
+    def append(self, session: ChatSession, role: str, text: str) -> None:
+        """
+        Add a message to a session and trim the oldest turns beyond the token budget.
+
+        Parameters
+        ----------
+        session : ChatSession
+            The session to update.
+        role : str
+            "user" or "model".
+        text : str
+            The message text.
+        """
+        append_message(session.history, role, text, self.history_token_budget)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET history = ?, last_used = ? WHERE session_id = ?",
+                (json.dumps(session.history), time.time(), session.session_id),
+            )
+
+    def stats(self) -> dict[str, int]:
+        """Current number of contexts and sessions and the bytes held by contexts."""
+        with self._lock:
+            contexts, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM contexts").fetchone()
+            (sessions,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return {"contexts": contexts, "sessions": sessions, "bytes": size}
+
+    def _cache_locally(self, context: ChatContext) -> None:
+        self._local[context.digest_id] = context
+        self._local_bytes += context.size
+        while self._local_bytes > self.local_cache_bytes and len(self._local) > 1:
+            _, oldest = self._local.popitem(last=False)
+            self._local_bytes -= oldest.size
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.ttl
+        self._conn.execute("DELETE FROM sessions WHERE last_used < ?", (cutoff,))
+        self._conn.execute(
+            """
+            DELETE FROM sessions WHERE session_id IN (
+                SELECT session_id FROM sessions ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_sessions,),
+        )
+        self._conn.execute("DELETE FROM contexts WHERE last_used < ?", (cutoff,))
+
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM contexts").fetchone()
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for digest_id, size in self._conn.execute("SELECT digest_id, size FROM contexts ORDER BY last_used"):
+            victims.append((digest_id,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM contexts WHERE digest_id = ?", victims)
@@ -1,17 +1,26 @@
+import asyncio
 import base64
-import os
-import re
 from datetime import datetime, timedelta
-
-import requests
-from pyvis.network import Network
+from typing import Optional
 
 from server.ai.gemini_client import GeminiClient
+from server.ai.github_client import get_github_client
+from server.ai.summarizer import summarize_repository
+from server.diagram_cache import diagram_cache
+from server.repo_tree import overview_graph
+
+_gemini_client: Optional[GeminiClient] = None
+
+
+def get_gemini_client() -> GeminiClient:
+    """Return the process-wide Gemini client, creating it on first use."""
+    global _gemini_client
+    if _gemini_client is None:
+        _gemini_client = GeminiClient()
+    return _gemini_client
 
-# Initialize the Gemini client
-gemini_client = GeminiClient()
 
-def get_github_readme(url: str) -> str:
+async def get_github_readme(url: str) -> str:
     """
     Fetch the README file from a GitHub repository.
 
@@ -29,27 +38,26 @@ def get_github_readme(url: str) -> str:
     parts = url.split('/')
     owner, repo = parts[-2], parts[-1]
 
-    # Construct the URL for the README file
-    readme_url = f"https://api.github.com/repos/{owner}/{repo}/readme"
-
+    github = get_github_client()
     try:
-        response = requests.get(readme_url)
-        if response.status_code == 200:
-            # GitHub returns the content as base64 encoded
-            content = response.json().get("content", "")
-            if content:
-                # Decode the base64 content
-                decoded_content = base64.b64decode(content).decode('utf-8')
-                return decoded_content
+        data = await github.get_json(github.api_url(f"/repos/{owner}/{repo}/readme"), kind="readme")
+        # GitHub returns the content as base64 encoded
+        content = (data or {}).get("content", "")
+        if content:
+            # Decode the base64 content
+            return base64.b64decode(content).decode('utf-8')
         return ""
     except Exception as e:
         print(f"Error fetching README: {e}")
         return ""
 
-def get_project_description(tree: str, content: str) -> dict:
+async def get_project_description(tree: str, content: str) -> dict:
     """
     Generate a project description using the repository structure and content.
 
+    Digests too large for a single prompt are summarized chunk by chunk and reduced
+    into the final description.
+
     Parameters
     ----------
     tree : str
@@ -62,11 +70,14 @@ def get_project_description(tree: str, content: str) -> dict:
     dict
         Dictionary containing summary, use cases, and contribution insights
     """
-    result = gemini_client.analyze_repository(tree, content)
+    result, usage = await summarize_repository(get_gemini_client(), tree, content)
+    if usage.chunks:
+        print(f"Summarized {usage.input_tokens} tokens in {usage.chunks} chunks over "
+              f"{usage.rounds} round(s), reduced from {usage.summary_tokens} summary tokens")
     return result
 
 
-def get_installation_usage(url: str) -> str:
+async def get_installation_usage(url: str, readme: Optional[str] = None) -> str:
     """
     Extract installation and usage instructions from a repository's README.
 
@@ -77,6 +88,8 @@ def get_installation_usage(url: str) -> str:
     ----------
     url : str
         The GitHub repository URL (can be API URL or regular URL)
+    readme : Optional[str]
+        The README content if it was already fetched
 
     Returns
     -------
@@ -84,125 +97,52 @@ def get_installation_usage(url: str) -> str:
         Formatted installation and usage instructions extracted from the README,
         including terminal commands for cloning, installing, and running the project
     """
-    readme = get_github_readme(url)
+    if readme is None:
+        readme = await get_github_readme(url)
     if not readme:
         return "# No README found\n```bash\n# Generic installation\ngit clone [repository-url]\ncd [repository-name]\n```"
-    result = gemini_client.get_installation_instructions(readme)
+    result = await asyncio.to_thread(get_gemini_client().get_installation_instructions, readme)
     return result
 
-def get_general_overview_diagram(url, tree) -> str:
+def get_general_overview_diagram(url, tree) -> Optional[str]:
     """
-    Generate a general overview diagram in HTML format based on the repository structure.
+    Generate a general overview diagram based on the repository structure.
     Note: This feature is currently disabled and will be available in a future update.
 
+    The diagram is stored as a compact graph, served as JSON by `/diagrams/{id}` and drawn
+    in the browser by `static/js/graph.js`. The tree is parsed in one pass and large
+    directories are collapsed, so even trees with `MAX_FILES` entries are drawn with a
+    bounded number of nodes. Graphs are cached by a hash of the tree under a disk cap,
+    see `DiagramCache`.
+
     Parameters
     ----------
+    url : str
+        The GitHub URL of the repository, used in error messages
     tree : str
         String representation of the repository file structure
 
     Returns
     -------
-    str
-        HTML code containing a PyVis network visualization of the repository structure
+    Optional[str]
+        The id of the graph, or None if the tree has no entries
     """
+    key = diagram_cache.key(tree)
+    if diagram_cache.contains(key):
+        return key
 
-    # Check if the diagram already exists
-    diagram_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "diagrams", f"{url.split('/')[-2]}_{url.split('/')[-1]}_diagram.html")
-    diagram_name=f"{url.split('/')[-2]}_{url.split('/')[-1]}_diagram.html"
-    if os.path.exists(diagram_path):
-        return diagram_name
-
-    # Create a new network
-    net = Network(height="400px", width="100%", bgcolor="#ffffff", font_color="#000000")
-
-    # Parse the tree structure
-    lines = tree.strip().split('\n')
-    if len(lines) <= 1:
-        return "<div>No structure to display</div>"
-
-    # Skip the "Directory structure:" line if present
-    start_idx = 1 if "Directory structure:" in lines[0] else 0
-
-    nodes = {}
-    edges = []
-
-    # Process each line in the tree
-    for i in range(start_idx, len(lines)):
-        line = lines[i]
-        if not line.strip():
-            continue
-
-        # Calculate the depth based on indentation
-        depth = (len(line) - len(line.lstrip())) // 4
-
-        # Extract the node name (file or directory)
-        node_match = re.search(r'[├└]── (.+?)/?$', line.strip())
-        if node_match:
-            node_name = node_match.group(1)
-
-            # Add node to the network
-            node_id = f"{depth}_{node_name}"
-
-            # Determine node color based on type
-            if node_name.endswith('/') or '/' not in line:
-                # Directory
-                nodes[node_id] = {"name": node_name, "level": depth, "color": "#4ECDC4"}
-            else:
-                # File
-                nodes[node_id] = {"name": node_name, "level": depth, "color": "#FF6B6B"}
-
-            # Connect to parent if not root
-            if depth > 0:
-                # Find parent (the most recent node with depth-1)
-                for j in range(i-1, -1, -1):
-                    parent_line = lines[j]
-                    parent_depth = (len(parent_line) - len(parent_line.lstrip())) // 4
-
-                    if parent_depth == depth - 1:
-                        parent_match = re.search(r'[├└]── (.+?)/?$', parent_line.strip())
-                        if parent_match:
-                            parent_name = parent_match.group(1)
-                            parent_id = f"{parent_depth}_{parent_name}"
-                            edges.append((parent_id, node_id))
-                            break
-
-    # Add nodes to the network
-    for node_id, node_data in nodes.items():
-        net.add_node(node_id, label=node_data["name"], color=node_data["color"],
-                    title=node_data["name"], size=15)
-
-    # Add edges to the network
-    for source, target in edges:
-        net.add_edge(source, target)
-
-    # Configure physics
-    net.barnes_hut(gravity=-3000, central_gravity=0.3, spring_length=150)
-
-    # Generate HTML
-    html = net.generate_html()
-
-    # Save HTML to validate it's correctly created
+    graph = overview_graph(tree)
+    if graph is None:
+        return None
     try:
-        # Extract repo and owner from the URL
-        repo_parts = url.split('/')
-        owner = repo_parts[-2] if len(repo_parts) >= 2 else "unknown"
-        repo = repo_parts[-1] if len(repo_parts) >= 1 else "unknown"
-
-        # Create diagrams directory
-        diagrams_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "diagrams")
-        os.makedirs(diagrams_dir, exist_ok=True)
-
-        # Save with repo and owner in filename
-        with open(diagram_path, "w", encoding="utf-8") as f:
-            f.write(html)
-
-        return diagram_name
-    except Exception as e:
-        print(f"Error saving diagram HTML: {e}")
-        return os.path.join(diagrams_dir, f"repo_diagram.html")
+        diagram_cache.put(key, graph)
+    except OSError as e:
+        print(f"Error saving diagram for {url}: {e}")
+        return None
+    return key
 
 
-def get_project_metrics(repo_data: dict) -> dict:
+async def get_project_metrics(repo_data: dict) -> dict:
     """
     Extract key metrics from a GitHub repository's data.
 
@@ -227,19 +167,25 @@ def get_project_metrics(repo_data: dict) -> dict:
         - language: Primary programming language used
         - license: Repository license information
     """
+    contributors = None
+    if repo_data.get("contributors_url"):
+        contributors = await get_github_client().get_json(
+            repo_data["contributors_url"], kind="contributors", params={"per_page": 100}
+        )
+
     project_metrics = {
         "stars": repo_data.get("stargazers_count", 0),
         "forks": repo_data.get("forks_count", 0),
         "open_issues": repo_data.get("open_issues_count", 0),
         "watchers": repo_data.get("watchers_count", 0),
-        "contributors": len(requests.get(repo_data.get("contributors_url", "")).json()),
+        "contributors": len(contributors or []),
         "language": repo_data.get("language", "Unknown"),
-        "license": repo_data.get("license", {}).get("name", "No license"),
+        "license": (repo_data.get("license") or {}).get("name", "No license"),
     }
     return project_metrics
 
 
-def get_repository_issues(repo_data: dict, content: str) -> dict:
+async def get_repository_issues(repo_data: dict, content: str) -> dict:
     """
     Fetch and categorize issues from a GitHub repository.
 
@@ -263,9 +209,9 @@ def get_repository_issues(repo_data: dict, content: str) -> dict:
     """
     try:
         issues_url = repo_data.get("issues_url", "").replace("{/number}", "")
-        issues_response = requests.get(f"{issues_url}?state=open")
+        all_issues = await get_github_client().get_json(issues_url, kind="issues", params={"state": "open"})
 
-        if issues_response.status_code != 200:
+        if all_issues is None:
             return {
                 "beginner_issues": [],
                 "intermediate_issues": [],
@@ -273,9 +219,7 @@ def get_repository_issues(repo_data: dict, content: str) -> dict:
                 "crazy_ideas": []
             }
 
-        # Get all issues and filter to only include those from the last 3 months
-        all_issues = issues_response.json()
-
+        # Filter issues to only include those from the last year
         # Calculate the date 3 months ago from now
         one_year_ago = datetime.now() - timedelta(days=365)
 
@@ -308,17 +252,18 @@ def get_repository_issues(repo_data: dict, content: str) -> dict:
             }
             issues_data.append(issue_info)
 
-        # Use the select_issues method to categorize issues
-        categorized_issues = gemini_client.select_issues(issues_data, repo_name, content)
+        # Categorize issues and generate a crazy idea concurrently
+        gemini_client = get_gemini_client()
+        categorized_issues, crazy_idea = await asyncio.gather(
+            asyncio.to_thread(gemini_client.select_issues, issues_data, repo_name, content),
+            asyncio.to_thread(gemini_client.generate_crazy_idea, repo_name, content),
+        )
 
         # Extract issues based on categorization
         beginner_issues = [issues_data[idx] for idx in categorized_issues["beginner_issues"] if idx < len(issues_data)]
         intermediate_issues = [issues_data[idx] for idx in categorized_issues["intermediate_issues"] if idx < len(issues_data)]
         advanced_issues = [issues_data[idx] for idx in categorized_issues["advanced_issues"] if idx < len(issues_data)]
 
-        # Generate a crazy idea
-        crazy_idea = gemini_client.generate_crazy_idea(repo_name, content)
-
         # Limit to a reasonable number for display
         return {
             "beginner_issues": beginner_issues[:5],
@@ -1,9 +1,19 @@
+import argparse
 import requests
 from bs4 import BeautifulSoup
 import json
 import re
+from collections import deque
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urljoin
 from tqdm import tqdm
 
+from server.ai.paper_catalog import append_jsonl_paper, iter_jsonl_papers, normalize_title
+
+OPENACCESS_BASE_URL = 'https://openaccess.thecvf.com'
+OPENACCESS_LISTING_URL = OPENACCESS_BASE_URL + '/CVPR2025?day=all'
+
 def fetch_openaccess_papers():
     url = 'https://openaccess.thecvf.com/CVPR2025?day=all'
     response = requests.get(url)
@@ -108,11 +118,188 @@ def merge_data(papers, posters):
             papers[title].update({'poster_location': '', 'poster_session': ''})
     return papers
 
+class _ListingParser(HTMLParser):
+    """Incremental parser for the openaccess listing that emits one entry per paper."""
+
+    def __init__(self):
+        super().__init__()
+        self.entries = deque()
+        self._current = None
+        self._in_dt = False
+        self._link = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'dt':
+            self._flush()
+            self._current = {'title': '', 'href': None, 'authors': []}
+            self._in_dt = True
+        elif tag == 'a' and self._current is not None:
+            href = attrs.get('href') or ''
+            if self._in_dt and self._current['href'] is None:
+                self._current['href'] = href
+                self._link = 'title'
+            elif not self._in_dt and href == '#':
+                self._current['authors'].append('')
+                self._link = 'author'
+
+    def handle_endtag(self, tag):
+        if tag == 'a':
+            self._link = None
+        elif tag == 'dt':
+            self._in_dt = False
+
+    def handle_data(self, data):
+        if self._link == 'title':
+            self._current['title'] += data
+        elif self._link == 'author':
+            self._current['authors'][-1] += data
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def _flush(self):
+        entry, self._current = self._current, None
+        if entry and entry['href'] and entry['title'].strip():
+            entry['title'] = entry['title'].strip()
+            entry['authors'] = [a.strip() for a in entry['authors'] if a.strip()]
+            self.entries.append(entry)
+
+
+class _DetailParser(HTMLParser):
+    """Parser for a paper detail page that extracts the abstract and resource links."""
+
+    def __init__(self):
+        super().__init__()
+        self.abstract = ''
+        self.links = {}
+        self._div_depth = 0
+        self._href = None
+        self._text = ''
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'div':
+            if self._div_depth or attrs.get('id') == 'abstract':
+                self._div_depth += 1
+        elif tag == 'a':
+            self._href = attrs.get('href', '')
+            self._text = ''
+
+    def handle_endtag(self, tag):
+        if tag == 'div' and self._div_depth:
+            self._div_depth -= 1
+        elif tag == 'a' and self._href is not None:
+            text = self._text.strip()
+            if text in ['pdf', 'supp', 'arXiv']:
+                # arXiv links are absolute, the others relative to the openaccess site
+                self.links[text.lower()] = urljoin(OPENACCESS_BASE_URL, self._href)
+            self._href = None
+
+    def handle_data(self, data):
+        if self._div_depth:
+            self.abstract += data
+        if self._href is not None:
+            self._text += data
+
+
+def iter_listing_entries(url=OPENACCESS_LISTING_URL):
+    """Stream the openaccess listing and yield title, link and authors as they are parsed."""
+    parser = _ListingParser()
+    with requests.get(url, stream=True) as response:
+        response.encoding = response.encoding or 'utf-8'
+        for chunk in response.iter_content(chunk_size=64 * 1024, decode_unicode=True):
+            parser.feed(chunk)
+            while parser.entries:
+                yield parser.entries.popleft()
+    parser.close()
+    yield from parser.entries
+
+
+def iter_openaccess_papers(url=OPENACCESS_LISTING_URL, skip=frozenset()):
+    """Yield complete paper records one at a time, skipping normalized titles in `skip`."""
+    for entry in iter_listing_entries(url):
+        if normalize_title(entry['title']) in skip:
+            continue
+
+        parser = _DetailParser()
+        parser.feed(requests.get(OPENACCESS_BASE_URL + entry['href']).text)
+        parser.close()
+
+        yield {
+            'title': entry['title'],
+            'authors': entry['authors'],
+            'pdf': parser.links.get('pdf'),
+            'supp': parser.links.get('supp'),
+            'arxiv': parser.links.get('arxiv'),
+            'bibtex': parser.links.get('bibtex'),
+            'abstract': parser.abstract.strip()
+        }
+
+
+def build_poster_index(posters):
+    """Index poster information by normalized title for constant-time merging."""
+    return {normalize_title(title): info for title, info in posters.items()}
+
+
+def _drop_partial_line(path):
+    """Truncate a JSONL file after its last complete line, left cut short by an interrupted run."""
+    with open(path, 'rb+') as f:
+        end = f.seek(0, 2)
+        position = end
+        while position > 0:
+            block = min(64 * 1024, position)
+            f.seek(position - block)
+            newline = f.read(block).rfind(b'\n')
+            if newline != -1:
+                position = position - block + newline + 1
+                break
+            position -= block
+        if position != end:
+            f.truncate(position)
+
+
+def stream_catalog(path, posters=None):
+    """
+    Append merged paper records to a JSONL catalog as they are scraped.
+
+    Papers already present in the catalog are skipped, so an interrupted run resumes
+    where it stopped instead of starting over.
+    """
+    path = Path(path)
+    poster_index = build_poster_index(posters if posters is not None else fetch_poster_info())
+    done = {normalize_title(p['title']) for p in iter_jsonl_papers(path)} if path.exists() else set()
+    empty_poster = {'poster_location': '', 'poster_session': ''}
+
+    if path.exists():
+        # Otherwise the first new record would be appended to the partial line
+        _drop_partial_line(path)
+
+    written = 0
+    with open(path, 'a', encoding='utf-8') as f:
+        for paper in tqdm(iter_openaccess_papers(skip=done), desc="Streaming papers"):
+            paper.update(poster_index.get(normalize_title(paper['title']), empty_poster))
+            append_jsonl_paper(f, paper)
+            written += 1
+    return written
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Scrape the CVPR 2025 paper catalog.")
+    parser.add_argument('--stream', action='store_true',
+                        help="append records to a JSONL catalog as they are scraped")
+    parser.add_argument('--output', default=None, help="output file path")
+    args = parser.parse_args()
+
+    if args.stream:
+        stream_catalog(args.output or 'cvpr2025_papers.jsonl')
+        return
+
     papers = fetch_openaccess_papers()
     posters = fetch_poster_info()
     merged_data = merge_data(papers, posters)
-    with open('cvpr2025_papers.json', 'w', encoding='utf-8') as f:
+    with open(args.output or 'cvpr2025_papers.json', 'w', encoding='utf-8') as f:
         json.dump(merged_data, f, ensure_ascii=False, indent=4)
 
 if __name__ == '__main__':
@@ -0,0 +1,366 @@
+""" Pluggable text embedders for papers and search queries.
+
+The same embedder must produce the corpus vectors stored in the index and the query
+vectors searched against them. `GeminiEmbedder` calls the remote `embedding-001` model;
+`HashingEmbedder` and `TfidfSvdEmbedder` run on the CPU with NumPy, so queries are
+embedded in microseconds and search works without network access.
+"""
+
+import json
+import os
+import re
+import zlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+EMBEDDING_BACKENDS = ("gemini", "hashing", "tfidf")
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to we with our which "
+    "these their can via using based".split()
+)
+# Sparse products are computed in chunks of at most this many cells to bound memory
+_BLOCK_CELLS = 8 * 1024 * 1024
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase alphanumeric words of a text, without stop words."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOP_WORDS]
+
+
+def terms(text: str) -> list[str]:
+    """The words of a text followed by its word bigrams, as used for TF-IDF weighting."""
+    tokens = tokenize(text)
+    return tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+
+def paper_text(title: str, paper: dict) -> str:
+    """The text embedded for a paper: its title followed by its abstract."""
+    return f"{title} {paper.get('abstract') or ''}"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class Embedder(ABC):
+    """
+    Turns texts into fixed-size vectors whose cosine similarity reflects relevance.
+
+    Attributes
+    ----------
+    name : str
+        Identifies the embedder and its settings; vectors of different names are not comparable.
+    dimensions : int
+        Length of the vectors.
+    """
+
+    name: str
+    dimensions: int
+
+    @abstractmethod
+    def embed_documents(self, texts: list[str]) -> np.ndarray:
+        """Embed corpus texts into a `(len(texts), dimensions)` float32 array of unit vectors."""
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embed one search query."""
+        return self.embed_documents([text])[0]
+
+
+class GeminiEmbedder(Embedder):
+    """
+    The remote `embedding-001` model.
+
+    Parameters
+    ----------
+    embed_batch : Callable[[list[str]], list[list[float]]]
+        Embeds a list of texts with one API call.
+    batch_size : int
+        Maximum number of texts per API call.
+    """
+
+    name = "gemini:embedding-001"
+    dimensions = 768
+
+    def __init__(self, embed_batch: Callable[[list[str]], list[list[float]]], batch_size: int = 100):
+        self.embed_batch = embed_batch
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts: list[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self.embed_batch(texts[start:start + self.batch_size]))
+        return _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dimensions))
+
+
+class HashingEmbedder(Embedder):
+    """
+    Signed feature hashing of words, word bigrams and character n-grams.
+
+    No training is needed: the vector of a text depends only on the text, so corpus and
+    queries are always consistent. Character n-grams make related word forms (e.g.
+    "segment" and "segmentation") overlap. Term frequencies are dampened with a log.
+
+    Parameters
+    ----------
+    dimensions : int
+        Length of the vectors.
+    char_ngrams : tuple[int, int]
+        Smallest and largest character n-gram, taken within word boundaries.
+    """
+
+    def __init__(self, dimensions: int = 768, char_ngrams: tuple[int, int] = (3, 5)):
+        self.dimensions = dimensions
+        self.char_ngrams = char_ngrams
+        self.name = f"hashing:{dimensions}:{char_ngrams[0]}-{char_ngrams[1]}"
+
+    def _features(self, text: str) -> dict[str, float]:
+        tokens = tokenize(text)
+        features: dict[str, float] = {}
+        low, high = self.char_ngrams
+        for token in tokens:
+            features[token] = features.get(token, 0.0) + 2.0
+            padded = f"<{token}>"
+            for n in range(low, min(high, len(padded)) + 1):
+                for start in range(len(padded) - n + 1):
+                    gram = padded[start:start + n]
+                    features[gram] = features.get(gram, 0.0) + 1.0
+        for first, second in zip(tokens, tokens[1:]):
+            bigram = f"{first} {second}"
+            features[bigram] = features.get(bigram, 0.0) + 2.0
+        return features
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in self._features(text).items():
+            digest = zlib.crc32(feature.encode("utf-8"))
+            # The low bits pick the dimension, a high bit the sign, so collisions cancel out on average
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % self.dimensions] += sign * (1.0 + np.log(count))
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return _normalize(np.stack([self._vector(text) for text in texts]))
+
+
+class TfidfSvdEmbedder(Embedder):
+    """
+    TF-IDF over words and word bigrams, projected onto its top singular vectors (LSA).
+
+    The model is fitted once on the corpus with a randomized truncated SVD and saved next
+    to the catalog; queries are then projected with the same vocabulary and components.
+    Vectors are zero-padded to `dimensions` when the corpus supports fewer components.
+
+    Parameters
+    ----------
+    dimensions : int
+        Length of the vectors.
+    max_features : int
+        Size of the vocabulary, keeping the terms with the highest document frequency.
+    min_df : int
+        Terms in fewer documents are ignored.
+    """
+
+    def __init__(self, dimensions: int = 768, max_features: int = 50_000, min_df: int = 2):
+        self.dimensions = dimensions
+        self.max_features = max_features
+        self.min_df = min_df
+        self.vocabulary: dict[str, int] = {}
+        self.idf: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+        self.fingerprint = ""
+
+    @property
+    def name(self) -> str:
+        return f"tfidf:{self.dimensions}:{self.fingerprint}"
+
+    @property
+    def fitted(self) -> bool:
+        """Whether a vocabulary and components are loaded."""
+        return self.components is not None
+
+    def _sparse_rows(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """TF-IDF rows of `texts` in CSR form: data, column indices and row pointers."""
+        data, indices, indptr = [], [], [0]
+        for text in texts:
+            counts: dict[int, int] = {}
+            for term in terms(text):
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    counts[column] = counts.get(column, 0) + 1
+            columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            weights = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))) * self.idf[columns]
+            norm = np.linalg.norm(weights)
+            data.append(weights / norm if norm else weights)
+            indices.append(columns)
+            indptr.append(indptr[-1] + len(columns))
+        return np.concatenate(data or [np.zeros(0)]), np.concatenate(indices or [np.zeros(0, np.int64)]), np.asarray(indptr)
+
+    @staticmethod
+    def _sparse_times(csr: tuple, dense: np.ndarray) -> np.ndarray:
+        """Compressed sparse rows times a dense matrix, in chunks of rows."""
+        data, indices, indptr = csr
+        rows = len(indptr) - 1
+        result = np.zeros((rows, dense.shape[1]))
+        chunk = max(1, _BLOCK_CELLS // dense.shape[1])
+        start = 0
+        while start < rows:
+            end = max(start + 1, int(np.searchsorted(indptr, indptr[start] + chunk, side="right")) - 1)
+            end = min(end, rows)
+            lo, hi = indptr[start], indptr[end]
+            if hi > lo:
+                products = data[lo:hi, None] * dense[indices[lo:hi]]
+                nonempty = np.diff(indptr[start:end + 1]) > 0
+                result[start:end][nonempty] = np.add.reduceat(products, indptr[start:end][nonempty] - lo, axis=0)
+            start = end
+        return result
+
+    @staticmethod
+    def _transpose(csr: tuple, columns: int) -> tuple:
+        """The transpose of compressed sparse rows, in the same form."""
+        data, indices, indptr = csr
+        order = np.argsort(indices, kind="stable")
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        counts = np.bincount(indices, minlength=columns)
+        return data[order], rows[order], np.concatenate([[0], np.cumsum(counts)])
+
+    def fit(self, texts: Iterable[str], power_iterations: int = 2, seed: int = 0) -> "TfidfSvdEmbedder":
+        """
+        Learn the vocabulary, IDF weights and SVD components from the corpus.
+
+        Parameters
+        ----------
+        texts : Iterable[str]
+            The corpus, e.g. title and abstract of every paper.
+        power_iterations : int
+            Subspace iterations of the randomized SVD; more are slower and more accurate.
+        seed : int
+            Seed of the random projection.
+
+        Returns
+        -------
+        TfidfSvdEmbedder
+            The fitted embedder.
+        """
+        texts = list(texts)
+        document_frequency: dict[str, int] = {}
+        for text in texts:
+            for term in set(terms(text)):
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        frequent = [term for term, df in document_frequency.items() if df >= self.min_df]
+        frequent.sort(key=lambda term: (-document_frequency[term], term))
+        self.vocabulary = {term: column for column, term in enumerate(frequent[:self.max_features])}
+        df = np.array([document_frequency[term] for term in self.vocabulary], dtype=np.float64)
+        self.idf = np.log((1 + len(texts)) / (1 + df)) + 1.0
+
+        csr = self._sparse_rows(texts)
+        rows, columns = len(texts), len(self.vocabulary)
+        csr_t = self._transpose(csr, columns)
+        rank = max(1, min(self.dimensions, rows - 1, columns))
+        # Randomized range finder (Halko et al.) with power iterations, then an exact SVD of the small projection
+        rng = np.random.default_rng(seed)
+        basis = self._sparse_times(csr, rng.standard_normal((columns, min(rank + 10, columns))))
+        for _ in range(power_iterations):
+            basis, _ = np.linalg.qr(basis)
+            basis = self._sparse_times(csr, self._sparse_times(csr_t, basis))
+        basis, _ = np.linalg.qr(basis)
+        projected = self._sparse_times(csr_t, basis).T
+        _, _, vt = np.linalg.svd(projected, full_matrices=False)
+        self.components = vt[:rank].astype(np.float32)
+        self.fingerprint = f"{zlib.crc32(json.dumps(frequent[:self.max_features]).encode()):08x}"
+        return self
+
+    def embed_documents(self, texts: list[str]) -> np.ndarray:
+        if not self.fitted:
+            raise RuntimeError("The TF-IDF embedder has not been fitted")
+        csr = self._sparse_rows(texts)
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        vectors[:, :len(self.components)] = self._sparse_times(csr, self.components.T)
+        return _normalize(vectors)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        if not self.fitted:
+            raise RuntimeError("The TF-IDF embedder has not been fitted")
+        # Only the columns of the query's terms contribute to the projection
+        data, indices, _ = self._sparse_rows([text])
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        vector[:len(self.components)] = self.components[:, indices] @ data
+        return _normalize(vector)
+
+    def save(self, path: Path) -> None:
+        """Write the fitted model to an `.npz` file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp.npz")
+        np.savez(
+            tmp_path,
+            terms=np.array(json.dumps(terms)),
+            idf=self.idf,
+            components=self.components,
+            settings=np.array([self.dimensions, self.max_features, self.min_df]),
+            fingerprint=np.array(self.fingerprint),
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "TfidfSvdEmbedder":
+        """Read a model written by `save`."""
+        with np.load(path) as model:
+            dimensions, max_features, min_df = (int(value) for value in model["settings"])
+            embedder = cls(dimensions, max_features, min_df)
+            embedder.vocabulary = {term: column for column, term in enumerate(json.loads(str(model["terms"])))}
+            embedder.idf = model["idf"]
+            embedder.components = model["components"]
+            embedder.fingerprint = str(model["fingerprint"])
+        return embedder
+
+
+def create_embedder(
+    backend: str,
+    dimensions: int = 768,
+    model_file: Optional[Path] = None,
+    embed_batch: Optional[Callable[[list[str]], list[list[float]]]] = None,
+) -> Embedder:
+    """
+    Create the embedder of a backend.
+
+    Parameters
+    ----------
+    backend : str
+        One of `EMBEDDING_BACKENDS`.
+    dimensions : int
+        Vector length of the local backends; must match the vector index.
+    model_file : Optional[Path]
+        Fitted TF-IDF model; loaded if it exists, otherwise the embedder is returned
+        unfitted and has to be fitted on the corpus.
+    embed_batch : Optional[Callable[[list[str]], list[list[float]]]]
+        The batched API call used by the Gemini backend.
+
+    Returns
+    -------
+    Embedder
+        The embedder.
+
+    Raises
+    ------
+    ValueError
+        If the backend is unknown or the Gemini backend has no `embed_batch`.
+    """
+    if backend == "gemini":
+        if embed_batch is None:
+            raise ValueError("The gemini embedding backend needs an embed_batch function")
+        return GeminiEmbedder(embed_batch)
+    if backend == "hashing":
+        return HashingEmbedder(dimensions)
+    if backend == "tfidf":
+        if model_file is not None and model_file.exists():
+            return TfidfSvdEmbedder.load(model_file)
+        return TfidfSvdEmbedder(dimensions)
+    raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {', '.join(EMBEDDING_BACKENDS)}")
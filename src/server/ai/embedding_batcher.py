@@ -0,0 +1,105 @@
+""" Micro-batching of concurrent embedding requests into single batched API calls. """
+
+import asyncio
+import time
+from typing import Callable, Optional
+
+from server.metrics import histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 100)
+QUEUE_DELAY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+batch_sizes = histogram(
+    "forky_embedding_batch_size", "Number of distinct texts sent per embedding call", BATCH_SIZE_BUCKETS
+)
+queue_delays = histogram(
+    "forky_embedding_queue_delay_seconds", "Time an embedding request waited for its batch to be sent", QUEUE_DELAY_BUCKETS
+)
+
+
+class EmbeddingBatcher:
+    """
+    Collect concurrent embedding requests and send them as one batched call.
+
+    The first request of a batch opens a window of `window` seconds; every request
+    arriving in the meantime joins the batch, which is sent when the window closes or as
+    soon as it holds `max_batch_size` texts. Identical texts in a batch are embedded once.
+    The blocking API call runs on the default thread pool, and each caller receives its
+    own vector, or the error of the call.
+
+    Parameters
+    ----------
+    embed_batch : Callable[[list[str]], list[list[float]]]
+        Embeds a list of texts with one API call, returning vectors in the same order.
+    window : float
+        Longest time in seconds a request waits for others to join its batch.
+    max_batch_size : int
+        Number of distinct texts that triggers sending a batch at once.
+    """
+
+    def __init__(self, embed_batch: Callable[[list[str]], list[list[float]]], window: float, max_batch_size: int):
+        self.embed_batch = embed_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self._enqueued_at: list[float] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending: set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> list[float]:
+        """
+        Embed one text as part of the next batch.
+
+        Parameters
+        ----------
+        text : str
+            The text to embed.
+
+        Returns
+        -------
+        list[float]
+            The embedding.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        self._pending.setdefault(text, []).append(future)
+        self._enqueued_at.append(time.monotonic())
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        return await future
+
+    def _dispatch(self) -> None:
+        """Send the pending batch, leaving the next request to open a new one."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        enqueued_at, self._enqueued_at = self._enqueued_at, []
+        now = time.monotonic()
+        for enqueued in enqueued_at:
+            queue_delays.observe(now - enqueued)
+        batch_sizes.observe(len(batch))
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: dict[str, list[asyncio.Future]]) -> None:
+        texts = list(batch)
+        try:
+            vectors = await asyncio.to_thread(self.embed_batch, texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"expected {len(texts)} embeddings, got {len(vectors)}")
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for text, vector in zip(texts, vectors):
+            for future in batch[text]:
+                if not future.done():
+                    future.set_result(vector)
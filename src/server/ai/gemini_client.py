@@ -1,24 +1,117 @@
+import asyncio
+import hashlib
 import json
 import os
+import re
+import threading
 import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterable, Optional, Union
 
 from dotenv import load_dotenv
-from google import genai
-from google.genai.types import GenerateContentConfig, GoogleSearch, Tool
 from pydantic import BaseModel
-from pymongo import MongoClient
-import google.generativeai as genaisearch
-import requests
+
+from server.ai.binary_catalog import BinaryCatalog, write_catalog
+from server.ai.chat_sessions import ChatContext, ChatSessionStore, SharedChatSessionStore
+from server.ai.embedding_batcher import EmbeddingBatcher
+from server.ai.llm_cache import GenerationCache, generation_key
+from server.ai.paper_catalog import load_catalog
+from server.ai.resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, hedged
+from server.ai.sharded_index import CatalogShard, ShardedPaperIndex
+from server.server_config import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+    CATALOG_SHARDS,
+    CHAT_HISTORY_TOKEN_BUDGET,
+    CHAT_MAX_CONTEXT_BYTES,
+    CHAT_MAX_SESSIONS,
+    CHAT_SESSION_TTL,
+    DEFAULT_SHARDS,
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_MAX_SIZE,
+    EMBEDDING_BATCH_WINDOW,
+    EMBEDDING_DIMENSIONS,
+    PAPER_INDEX_BACKEND,
+    PASSAGE_SEARCH_LIMIT,
+    RERANK_HEDGE_DEFAULT,
+    RERANK_HEDGE_QUANTILE,
+    SEARCH_DEADLINE,
+    WORKERS,
+)
+
+if TYPE_CHECKING:
+    from google import genai
+    from pymongo import MongoClient
+    from pymongo.database import Database
+
+    from server.ai.embedders import Embedder
+    from server.ai.local_index import LocalPaperIndex
+    from server.ai.passage_index import PassageIndex
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Constants for CVPR papers caching
-CVPR_PAPERS_CACHE_DIR = Path("src/data/cache")
+CVPR_PAPERS_CACHE_DIR = Path(os.getenv("CVPR_PAPERS_CACHE_DIR", "src/data/cache"))
 CVPR_PAPERS_CACHE_FILE = CVPR_PAPERS_CACHE_DIR / "cvpr2025_papers.json"
+CVPR_PAPERS_JSONL_FILE = CVPR_PAPERS_CACHE_DIR / "cvpr2025_papers.jsonl"
+CVPR_PAPERS_CATALOG_FILE = CVPR_PAPERS_CACHE_DIR / "cvpr2025_papers.fkc"
 CVPR_PAPERS_CACHE_MAX_AGE = 24 * 60 * 60  # 24 hours in seconds
+# Fitted TF-IDF embedder and paper vectors of the local index, derived from the catalog
+TFIDF_MODEL_FILE = CVPR_PAPERS_CACHE_DIR / "tfidf_svd.npz"
+LOCAL_INDEX_VECTORS_FILE = CVPR_PAPERS_CACHE_DIR / "cvpr2025_vectors.npz"
+# Topic clusters and 2D layout of the catalog, written by `build_topic_map`
+TOPIC_MAP_FILE = CVPR_PAPERS_CACHE_DIR / "cvpr2025_topic_map.json"
+# Locally stored paper PDFs, named as in their `pdf` URL, and the passage index built from them
+PAPER_PDF_DIR = Path(os.getenv("PAPER_PDF_DIR", str(CVPR_PAPERS_CACHE_DIR / "pdfs")))
+PASSAGES_DIR = CVPR_PAPERS_CACHE_DIR / "passages"
+# The shard whose papers are in the local catalog files
+LOCAL_CATALOG_SHARD = "cvpr2025"
+
+GEMINI_MODEL = "gemini-2.0-flash"
+# Alternative Gemini API endpoint, e.g. the local stub used by the load tests
+GEMINI_API_BASE_URL = os.getenv("GEMINI_API_BASE_URL")
+EMBEDDING_MODEL = "models/embedding-001"
+# Ids of the candidates in the ranking prompt, "paper_<index>"
+_RANKED_ID = re.compile(r"paper_\d+")
+
+# Freshness policy of cached generations per call site, in seconds
+GENERATION_CACHE_TTLS: dict[str, int] = {
+    "analyze_repository": 7 * 24 * 60 * 60,
+    "installation_instructions": 7 * 24 * 60 * 60,
+    "select_issues": 6 * 60 * 60,
+    "crazy_idea": 24 * 60 * 60,
+    "chunk_summary": 30 * 24 * 60 * 60,
+    "search_rerank": 60 * 60,
+    "match_reason": 7 * 24 * 60 * 60,
+    "query_embedding": 30 * 24 * 60 * 60,
+}
+
+# Number of query embeddings and search results kept in memory per process
+EMBEDDING_CACHE_SIZE = 2048
+SEARCH_RESULT_CACHE_SIZE = 1024
+
+# Repository content beyond this many characters is not sent to single-shot prompts
+MAX_PROMPT_CONTENT_CHARS = 500_000
+
+def catalog_version() -> str:
+    """
+    Fingerprint of the paper catalog and shard configuration.
+
+    Changes whenever a catalog file is rewritten or the shards are reconfigured, so
+    anything derived from search results can tell when it is stale.
+    """
+    parts = [json.dumps(CATALOG_SHARDS, sort_keys=True)]
+    for path in (CVPR_PAPERS_CATALOG_FILE, CVPR_PAPERS_JSONL_FILE, CVPR_PAPERS_CACHE_FILE):
+        try:
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}")
+        except FileNotFoundError:
+            parts.append(f"{path.name}:missing")
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
 
 class AnalyzeRepositoryResponse(BaseModel):
     summary: str
@@ -46,50 +139,547 @@ class PaperSearchResponse(BaseModel):
     abstract: str
     poster_session: Optional[str]
     poster_location: Optional[str]
+    venue: Optional[str] = None
+    paper_id: Optional[str] = None
+    passage: Optional[str] = None
+
+@dataclass
+class PaperSearchResult:
+    """Papers found by a search; `degraded` is set when they are in vector order instead of ranked by Gemini."""
+
+    papers: list[dict]
+    degraded: bool = False
+
 
 class GeminiClient:
     def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        self._api_key = os.getenv("GEMINI_API_KEY")
+        if not self._api_key:
             raise ValueError("GEMINI_API_KEY environment variable is not set")
 
-        self.client = genai.Client(api_key=api_key)
-        genaisearch.configure(api_key=api_key)
-        self.chat_histories = {}  
-        
-        # Use MongoDB Atlas vector search to get top 15 similar papers
-        mongodb_uri = os.getenv("MONGODB_URI")
-        if not mongodb_uri:
+        # Used for MongoDB Atlas vector search of similar papers, unless the local index is used
+        self._mongodb_uri = os.getenv("MONGODB_URI")
+        if not self._mongodb_uri and PAPER_INDEX_BACKEND == "atlas":
             raise ValueError("MONGODB_URI environment variable is not set")
-        
-        self.mongo_client = MongoClient(mongodb_uri)
 
-        self.db = self.mongo_client["cvpr_papers"]
+        # The Gemini SDKs and the Mongo client are created on first use, so importing
+        # and constructing this class stays cheap during a cold start
+        self._init_lock = threading.Lock()
+        self._client: Optional["genai.Client"] = None
+        self._embedder = None
+        self._text_embedder: Optional["Embedder"] = None
+        self._mongo_client: Optional["MongoClient"] = None
+        self._paper_index: Optional[Union[ShardedPaperIndex, "LocalPaperIndex"]] = None
+        self._passage_index: Optional["PassageIndex"] = None
 
-    def _get_cvpr_papers(self) -> dict:
+        # Workers share sessions through SQLite so a conversation can hop between them
+        store = SharedChatSessionStore if WORKERS > 1 else ChatSessionStore
+        self.chat_sessions = store(
+            ttl=CHAT_SESSION_TTL,
+            max_bytes=CHAT_MAX_CONTEXT_BYTES,
+            max_sessions=CHAT_MAX_SESSIONS,
+            history_token_budget=CHAT_HISTORY_TOKEN_BUDGET,
+        )
+
+        self._catalog: Optional[BinaryCatalog] = None
+        self.generation_cache = GenerationCache()
+
+        self._cache_lock = threading.Lock()
+        self._embeddings: OrderedDict[str, list[float]] = OrderedDict()
+        self._search_results: OrderedDict[tuple, tuple[float, list[dict]]] = OrderedDict()
+        self.embedding_batcher = EmbeddingBatcher(self._embed_texts, EMBEDDING_BATCH_WINDOW, EMBEDDING_BATCH_MAX_SIZE)
+
+        # Search ranking is hedged at the recent p95 latency and skipped while Gemini keeps failing
+        self.rerank_latency = LatencyTracker(default=RERANK_HEDGE_DEFAULT)
+        self.rerank_breaker = CircuitBreaker("gemini_rerank", BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+
+    @property
+    def client(self) -> "genai.Client":
+        """The Gemini client, created on first use."""
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    from google import genai
+
+                    http_options = {"base_url": GEMINI_API_BASE_URL} if GEMINI_API_BASE_URL else None
+                    self._client = genai.Client(api_key=self._api_key, http_options=http_options)
+        return self._client
+
+    @property
+    def embedder(self):
+        """The `google.generativeai` module used for embeddings, configured on first use."""
+        if self._embedder is None:
+            with self._init_lock:
+                if self._embedder is None:
+                    import google.generativeai as genaisearch
+
+                    if GEMINI_API_BASE_URL:
+                        genaisearch.configure(
+                            api_key=self._api_key,
+                            transport="rest",
+                            client_options={"api_endpoint": GEMINI_API_BASE_URL},
+                        )
+                    else:
+                        genaisearch.configure(api_key=self._api_key)
+                    self._embedder = genaisearch
+        return self._embedder
+
+    @property
+    def text_embedder(self) -> "Embedder":
         """
-        Get CVPR papers data, using cached version if available and not too old.
-        
+        The embedder of `EMBEDDING_BACKEND`, created on first use.
+
+        The TF-IDF backend is fitted on the catalog the first time and saved, so later
+        processes load it instead.
+        """
+        if self._text_embedder is None:
+            with self._init_lock:
+                if self._text_embedder is None:
+                    from server.ai.embedders import TfidfSvdEmbedder, create_embedder, paper_text
+
+                    embedder = create_embedder(EMBEDDING_BACKEND, EMBEDDING_DIMENSIONS, TFIDF_MODEL_FILE, self._embed_texts)
+                    if isinstance(embedder, TfidfSvdEmbedder) and not embedder.fitted:
+                        papers = self._get_cvpr_papers()
+                        embedder.fit(paper_text(title, paper) for title, paper in papers.items())
+                        embedder.save(TFIDF_MODEL_FILE)
+                    self._text_embedder = embedder
+        return self._text_embedder
+
+    @property
+    def mongo_client(self) -> "MongoClient":
+        """The MongoDB client, created on first use."""
+        if self._mongo_client is None:
+            with self._init_lock:
+                if self._mongo_client is None:
+                    from pymongo import MongoClient
+
+                    self._mongo_client = MongoClient(self._mongodb_uri)
+        return self._mongo_client
+
+    @property
+    def db(self) -> "Database":
+        """The papers database."""
+        return self.mongo_client["cvpr_papers"]
+
+    @property
+    def paper_index(self) -> Union[ShardedPaperIndex, "LocalPaperIndex"]:
+        """The vector index over the catalog shards, or over the local catalog with `PAPER_INDEX_BACKEND=local`."""
+        if self._paper_index is None:
+            shards = [CatalogShard(**shard) for shard in CATALOG_SHARDS]
+            if PAPER_INDEX_BACKEND == "local":
+                from server.ai.local_index import LocalPaperIndex
+
+                self._paper_index = LocalPaperIndex(
+                    next(shard for shard in shards if shard.id == LOCAL_CATALOG_SHARD),
+                    self._get_cvpr_papers,
+                    catalog_version,
+                    self.text_embedder,
+                    LOCAL_INDEX_VECTORS_FILE,
+                )
+            else:
+                self._paper_index = ShardedPaperIndex(self.mongo_client, shards, DEFAULT_SHARDS)
+        return self._paper_index
+
+    @property
+    def passage_index(self) -> Optional["PassageIndex"]:
+        """The full-text passage index, once `ingest_passages` has built one."""
+        if self._passage_index is None and (PASSAGES_DIR / "index.json").exists():
+            with self._init_lock:
+                if self._passage_index is None:
+                    from server.ai.passage_index import PassageIndex
+
+                    self._passage_index = PassageIndex(PASSAGES_DIR)
+        return self._passage_index
+
+    def _generate(
+        self,
+        prompt: Any,
+        config: Optional[dict] = None,
+        cache_ttl: Optional[float] = None,
+        model: str = GEMINI_MODEL,
+    ) -> str:
+        """
+        Generate content with Gemini, optionally through the generation cache.
+
+        Parameters
+        ----------
+        prompt : Any
+            The prompt or contents to send.
+        config : Optional[dict]
+            The generation config.
+        cache_ttl : Optional[float]
+            How long the response may be reused, in seconds. Calls without a TTL
+            always go to the model.
+        model : str
+            The model to use.
+
+        Returns
+        -------
+        str
+            The generated text, or an empty string if the model returned nothing.
+        """
+        key = generation_key(model, prompt, config) if cache_ttl else None
+        if key:
+            cached = self.generation_cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self.client.models.generate_content(model=model, contents=prompt, config=config)
+        text = response.text if response and response.text else ""
+
+        if key and text:
+            self.generation_cache.put(key, text, cache_ttl)
+        return text
+
+    def analyze_repository(self, tree: str, content: str) -> dict:
+        """
+        Summarize a repository and suggest use cases and contribution areas.
+
+        Parameters
+        ----------
+        tree : str
+            String representation of the repository file structure
+        content : str
+            Content of the repository files
+
+        Returns
+        -------
+        dict
+            Dictionary with "summary", "use_cases" and "contribution_insights"
+        """
+        prompt = f"""
+        You are helping a developer understand an open source repository.
+
+        Repository structure:
+        {tree}
+
+        Repository content:
+        {content[:MAX_PROMPT_CONTENT_CHARS]}
+
+        Provide:
+        1. "summary": A concise description of what the project does and how it is organized
+        2. "use_cases": The main use cases of the project
+        3. "contribution_insights": Areas where a new contributor could help
+        """
+        try:
+            text = self._generate(
+                prompt,
+                config={"response_mime_type": "application/json", "response_schema": AnalyzeRepositoryResponse},
+                cache_ttl=GENERATION_CACHE_TTLS["analyze_repository"],
+            )
+            return AnalyzeRepositoryResponse.model_validate_json(text).model_dump()
+        except Exception as e:
+            print(f"Error analyzing repository: {e}")
+            return {"summary": "Unable to analyze the repository at this time.", "use_cases": [], "contribution_insights": []}
+
+    def summarize_chunk(self, chunk: str) -> str:
+        """
+        Summarize one chunk of a repository digest for the map phase of summarization.
+
+        Parameters
+        ----------
+        chunk : str
+            A group of complete files, or part of a single large file
+
+        Returns
+        -------
+        str
+            A compact summary naming the files and what they implement
+        """
+        prompt = f"""
+        Summarize the following repository files for a later project-level analysis.
+        For each file or group of related files, state its path, its purpose, the main
+        classes or functions it defines and how it relates to the rest of the project.
+        Be concise and factual.
+
+        {chunk}
+        """
+        try:
+            return self._generate(prompt, cache_ttl=GENERATION_CACHE_TTLS["chunk_summary"])
+        except Exception as e:
+            print(f"Error summarizing chunk: {e}")
+            return ""
+
+    def _chat_request(self, context: ChatContext, history: list[dict], message: str) -> tuple[list[dict], dict]:
+        """Build the contents and config of a chat turn about a repository."""
+        system_instruction = f"""
+        You are Forky, an assistant helping a developer understand and contribute to a repository.
+        Answer in Markdown, grounded in the repository below.
+
+        Repository summary:
+        {context.summary}
+
+        Repository content:
+        {context.content[:MAX_PROMPT_CONTENT_CHARS]}
+        """
+        contents = [{"role": turn["role"], "parts": [{"text": turn["text"]}]} for turn in history]
+        contents.append({"role": "user", "parts": [{"text": message}]})
+        return contents, {"system_instruction": system_instruction}
+
+    def chat(self, context: ChatContext, history: list[dict], message: str) -> str:
+        """
+        Answer a chat message about a repository.
+
+        Parameters
+        ----------
+        context : ChatContext
+            The repository digest and summary of the session
+        history : list[dict]
+            Previous turns, each with a "role" ("user" or "model") and "text"
+        message : str
+            The new user message
+
+        Returns
+        -------
+        str
+            The Markdown answer
+        """
+        contents, config = self._chat_request(context, history, message)
+        return self._generate(contents, config=config)
+
+    async def chat_stream(self, context: ChatContext, history: list[dict], message: str) -> AsyncIterator[str]:
+        """
+        Stream the answer to a chat message about a repository as it is generated.
+
+        Parameters
+        ----------
+        context : ChatContext
+            The repository digest and summary of the session
+        history : list[dict]
+            Previous turns, each with a "role" ("user" or "model") and "text"
+        message : str
+            The new user message
+
+        Yields
+        ------
+        str
+            Successive pieces of the Markdown answer
+        """
+        contents, config = self._chat_request(context, history, message)
+        stream = await self.client.aio.models.generate_content_stream(
+            model=GEMINI_MODEL, contents=contents, config=config
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+    def get_installation_instructions(self, readme: str) -> str:
+        """
+        Extract installation and usage instructions from a README.
+
+        Parameters
+        ----------
+        readme : str
+            The README content
+
+        Returns
+        -------
+        str
+            Markdown with the terminal commands needed to clone, install and run the project
+        """
+        prompt = f"""
+        Extract the installation and usage instructions from this README.
+        Return Markdown with short explanations and fenced ```bash blocks containing the
+        commands to clone, install and run the project. Do not invent commands.
+
+        README:
+        {readme[:MAX_PROMPT_CONTENT_CHARS]}
+        """
+        try:
+            return self._generate(prompt, cache_ttl=GENERATION_CACHE_TTLS["installation_instructions"])
+        except Exception as e:
+            print(f"Error extracting installation instructions: {e}")
+            return "# Installation instructions unavailable\n```bash\ngit clone [repository-url]\n```"
+
+    def explain_match(self, query: str, paper: dict) -> str:
+        """
+        Explain why a paper matches a search query.
+
+        Search results only carry the ranking; the explanation is generated when a user
+        asks for it and cached, so each (query, paper) pair is written once.
+
+        Parameters
+        ----------
+        query : str
+            The search query
+        paper : dict
+            The paper, with at least "title" and "abstract"
+
+        Returns
+        -------
+        str
+            The explanation
+        """
+        prompt = f"""
+        A user searched computer vision conference papers for: "{query}"
+
+        Paper title: {paper["title"]}
+        Venue: {paper.get("venue") or "unknown"}
+        Abstract: {paper["abstract"]}
+
+        Explain in one paragraph why this paper is relevant to the query, including:
+        - How the paper's research aligns with the query
+        - Key technical contributions that match the query
+        - Potential impact or applications related to the query
+        - Why someone interested in this query should read this paper
+
+        Return only the explanation as plain text.
+        """
+        return self._generate(prompt, cache_ttl=GENERATION_CACHE_TTLS["match_reason"]).strip()
+
+    def select_issues(self, issues: list[dict], repo_name: str, content: str) -> dict:
+        """
+        Categorize open issues by difficulty.
+
+        Parameters
+        ----------
+        issues : list[dict]
+            Issues with title, description, labels, link and assignment status
+        repo_name : str
+            The repository name
+        content : str
+            Content of the repository files, used as context
+
         Returns
         -------
         dict
-            The CVPR papers data
+            Indices into `issues` under "beginner_issues", "intermediate_issues" and "advanced_issues"
+        """
+        empty = {"beginner_issues": [], "intermediate_issues": [], "advanced_issues": []}
+        if not issues:
+            return empty
+
+        indexed_issues = [{"index": idx, **issue} for idx, issue in enumerate(issues)]
+        prompt = f"""
+        These are the open issues of the {repo_name} repository:
+        {json.dumps(indexed_issues, indent=2)}
+
+        Repository content for context:
+        {content[:MAX_PROMPT_CONTENT_CHARS // 4]}
+
+        Classify the unassigned issues into beginner, intermediate and advanced difficulty.
+        Return the issue indices for each category.
+        """
+        try:
+            text = self._generate(
+                prompt,
+                config={"response_mime_type": "application/json", "response_schema": SelectIssuesResponse},
+                cache_ttl=GENERATION_CACHE_TTLS["select_issues"],
+            )
+            return SelectIssuesResponse.model_validate_json(text).model_dump()
+        except Exception as e:
+            print(f"Error selecting issues: {e}")
+            return empty
+
+    def generate_crazy_idea(self, repo_name: str, content: str) -> str:
+        """
+        Suggest an ambitious, creative contribution for a repository.
+
+        Parameters
+        ----------
+        repo_name : str
+            The repository name
+        content : str
+            Content of the repository files, used as context
+
+        Returns
+        -------
+        str
+            A short Markdown description of the idea
+        """
+        prompt = f"""
+        Based on the {repo_name} repository below, propose one creative and ambitious
+        feature that a contributor could build. Describe it in a short Markdown paragraph.
+
+        Repository content:
+        {content[:MAX_PROMPT_CONTENT_CHARS // 4]}
+        """
+        try:
+            return self._generate(prompt, cache_ttl=GENERATION_CACHE_TTLS["crazy_idea"])
+        except Exception as e:
+            print(f"Error generating idea: {e}")
+            return "Unable to generate ideas at this time."
+
+    def _open_binary_catalog(self) -> Optional[BinaryCatalog]:
+        """
+        Open the memory-mapped catalog if it is fresh and not older than its sources.
+
+        Returns
+        -------
+        Optional[BinaryCatalog]
+            The mapped catalog, or None if it has to be rebuilt.
+        """
+        if not CVPR_PAPERS_CATALOG_FILE.exists():
+            return None
+
+        mtime = CVPR_PAPERS_CATALOG_FILE.stat().st_mtime
+        if time.time() - mtime >= CVPR_PAPERS_CACHE_MAX_AGE:
+            return None
+        for source in (CVPR_PAPERS_JSONL_FILE, CVPR_PAPERS_CACHE_FILE):
+            if source.exists() and source.stat().st_mtime > mtime:
+                return None
+
+        if self._catalog is None or self._catalog.path.stat().st_mtime != mtime:
+            try:
+                self._catalog = BinaryCatalog(CVPR_PAPERS_CATALOG_FILE)
+            except ValueError as e:
+                print(f"Error opening CVPR papers catalog: {e}")
+                return None
+        return self._catalog
+
+    def _store_binary_catalog(self, papers_data: dict) -> Any:
+        """
+        Convert papers data to the binary catalog and return the mapped copy.
+
+        Falls back to returning `papers_data` itself if the catalog cannot be written.
+        """
+        try:
+            write_catalog(papers_data.items(), CVPR_PAPERS_CATALOG_FILE)
+            self._catalog = BinaryCatalog(CVPR_PAPERS_CATALOG_FILE)
+            return self._catalog
+        except (OSError, ValueError) as e:
+            print(f"Error writing CVPR papers catalog: {e}")
+            return papers_data
+
+    def _get_cvpr_papers(self) -> Any:
+        """
+        Get CVPR papers data, using cached version if available and not too old.
+
+        Whenever possible the papers are served from the memory-mapped binary catalog,
+        which all worker processes share instead of each holding a parsed copy.
+
+        Returns
+        -------
+        Mapping
+            The CVPR papers data keyed by title
         """
         # Create cache directory if it doesn't exist
         CVPR_PAPERS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+        catalog = self._open_binary_catalog()
+        if catalog is not None:
+            return catalog
+
+        # Prefer a locally scraped JSONL catalog, which is parsed one record at a time
+        if CVPR_PAPERS_JSONL_FILE.exists():
+            papers_data = load_catalog(CVPR_PAPERS_JSONL_FILE)
+            if papers_data:
+                return self._store_binary_catalog(papers_data)
+
         # Check if cache exists and is not too old
         if CVPR_PAPERS_CACHE_FILE.exists():
             cache_age = time.time() - CVPR_PAPERS_CACHE_FILE.stat().st_mtime
             if cache_age < CVPR_PAPERS_CACHE_MAX_AGE:
                 try:
                     with open(CVPR_PAPERS_CACHE_FILE, 'r') as f:
-                        return json.load(f)
+                        return self._store_binary_catalog(json.load(f))
                 except json.JSONDecodeError:
                     print("Error reading cached CVPR papers, will download fresh copy")
 
         # Download fresh copy if cache doesn't exist or is too old
         try:
+            import requests
+
             response = requests.get("https://storage.googleapis.com/tecla/cvpr2025_papers.json")
             papers_data = response.json()
             
@@ -97,7 +687,7 @@ class GeminiClient:
             with open(CVPR_PAPERS_CACHE_FILE, 'w') as f:
                 json.dump(papers_data, f)
             
-            return papers_data
+            return self._store_binary_catalog(papers_data)
         except Exception as e:
             print(f"Error downloading CVPR papers: {e}")
             # If download fails and we have a cache, try to use it even if old
@@ -109,131 +699,331 @@ class GeminiClient:
                     pass
             return {}
         
-    async def search_cvpr_papers(self, query: str) -> list[dict]:
+    def _embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Embed several texts with a single batched API call."""
+        response = self.embedder.embed_content(model=EMBEDDING_MODEL, content=texts)
+        return (response or {}).get("embedding") or []
+
+    async def embed_query(self, query: str) -> list[float]:
         """
-        Search through CVPR 2025 papers based on user query.
-        First uses vector search to get top 15 papers, then uses Gemini to rank the top 5.
+        Embed a search query, reusing earlier embeddings of the same query.
+
+        Local embedding backends embed the query directly, which takes microseconds. With
+        the Gemini backend, embeddings are kept in a per-process LRU and in the shared
+        generation cache, so a query is embedded at most once across workers and restarts.
+        Queries that miss both caches are embedded in micro-batches with other concurrent
+        queries.
+
+        Parameters
+        ----------
+        query : str
+            The search query.
+
+        Returns
+        -------
+        list[float]
+            The query embedding, or an empty list if the model returned none.
+        """
+        query = query.strip()
+        if EMBEDDING_BACKEND != "gemini":
+            # Loading or fitting the local model on first use must not block the event loop
+            embedder = self._text_embedder or await asyncio.to_thread(lambda: self.text_embedder)
+            return embedder.embed_query(query).tolist()
+
+        with self._cache_lock:
+            embedding = self._embeddings.get(query)
+            if embedding is not None:
+                self._embeddings.move_to_end(query)
+                return embedding
+
+        key = generation_key(EMBEDDING_MODEL, query, {"task": "query_embedding"})
+        cached = await asyncio.to_thread(self.generation_cache.get, key)
+        if cached is not None:
+            embedding = json.loads(cached)
+        else:
+            embedding = await self.embedding_batcher.embed(query)
+            if embedding:
+                await asyncio.to_thread(
+                    self.generation_cache.put, key, json.dumps(embedding), GENERATION_CACHE_TTLS["query_embedding"]
+                )
+
+        if embedding:
+            with self._cache_lock:
+                self._embeddings[query] = embedding
+                while len(self._embeddings) > EMBEDDING_CACHE_SIZE:
+                    self._embeddings.popitem(last=False)
+        return embedding
+
+    def _cached_search(self, key: tuple) -> Optional[list[dict]]:
+        with self._cache_lock:
+            entry = self._search_results.get(key)
+            if entry is None or entry[0] <= time.time():
+                return None
+            self._search_results.move_to_end(key)
+            return entry[1]
+
+    def _store_search(self, key: tuple, papers: list[dict]) -> None:
+        with self._cache_lock:
+            self._search_results[key] = (time.time() + GENERATION_CACHE_TTLS["search_rerank"], papers)
+            while len(self._search_results) > SEARCH_RESULT_CACHE_SIZE:
+                self._search_results.popitem(last=False)
+
+    def _search_passages_sync(self, embedding: list[float], venues: Optional[list[str]]) -> list[dict]:
+        if LOCAL_CATALOG_SHARD not in {shard.id for shard in self.paper_index.resolve(venues)}:
+            return []
+        index = self.passage_index
+        # Passages embedded by another backend are not comparable with the query vector
+        if index is None or not index.available(self.text_embedder.name):
+            return []
+        return index.search(embedding, limit=PASSAGE_SEARCH_LIMIT)
+
+    async def _search_passages(self, embedding: list[float], venues: Optional[list[str]]) -> list[dict]:
+        """Papers whose full-text passages match the query; an unavailable index finds none."""
+        try:
+            return await asyncio.to_thread(self._search_passages_sync, embedding, venues)
+        except Exception as e:
+            print(f"Error searching paper passages: {e!r}")
+            return []
+
+    async def _merge_passage_hits(self, papers: list[dict], passage_hits: list[dict], papers_data: Any) -> list[dict]:
+        """
+        Add the papers found through their full text to the vector search candidates.
+
+        Papers found by both keep their vector search hit and gain the matching passage.
+        New papers get the document id of the paper index, so their match reason can be
+        requested like for any other hit. They are interleaved with the vector search hits,
+        so both sources reach the top of the list if ranking is skipped.
+        """
+        by_title = {paper["title"]: paper for paper in papers}
+        shard = self.paper_index.shards[LOCAL_CATALOG_SHARD]
+        found = []
+        for hit in passage_hits:
+            if hit["title"] in by_title:
+                by_title[hit["title"]].setdefault("passage", hit["passage"])
+                continue
+            paper = papers_data.get(hit["title"])
+            if paper is not None:
+                found.append(dict(paper, title=hit["title"], venue=shard.label, shard=shard.id, passage=hit["passage"]))
+
+        if found:
+            try:
+                document_ids = await asyncio.to_thread(
+                    self.paper_index.document_ids, shard.id, [paper["title"] for paper in found]
+                )
+            except Exception as e:
+                print(f"Error looking up passage hits in the paper index: {e!r}")
+                document_ids = {}
+            for paper in found:
+                if paper["title"] in document_ids:
+                    paper["_id"] = document_ids[paper["title"]]
+
+        merged = []
+        for index in range(max(len(papers), len(found))):
+            merged.extend(source[index] for source in (papers, found) if index < len(source))
+        return merged
+
+    async def _rerank(self, prompt: str, timeout: float) -> list[str]:
+        """
+        Rank search candidates with Gemini within a time budget.
+
+        Cached rankings are returned at once. Otherwise the call is hedged: if it is slower
+        than the recent p95 latency, a second identical request is sent and the first
+        answer wins. Calls are skipped entirely while the circuit breaker is open.
+
+        Parameters
+        ----------
+        prompt : str
+            The ranking prompt.
+        timeout : float
+            The time left in the request budget, in seconds.
+
+        Returns
+        -------
+        list[str]
+            The ids of the ranked papers, most relevant first.
+
+        Raises
+        ------
+        CircuitOpenError
+            If Gemini has been failing and is not being called.
+        asyncio.TimeoutError
+            If no answer arrived within `timeout`.
+        """
+        config = {"response_mime_type": "application/json"}
+        key = generation_key(GEMINI_MODEL, prompt, config)
+        cached = await asyncio.to_thread(self.generation_cache.get, key)
+        if cached is not None:
+            return json.loads(cached)
+
+        if timeout <= 0:
+            raise asyncio.TimeoutError("the search budget is exhausted")
+        if not self.rerank_breaker.allow():
+            raise CircuitOpenError("Gemini ranking is temporarily disabled")
+
+        async def attempt() -> str:
+            start = time.monotonic()
+            response = await self.client.aio.models.generate_content(model=GEMINI_MODEL, contents=prompt, config=config)
+            self.rerank_latency.observe(time.monotonic() - start)
+            return response.text if response and response.text else ""
+
+        try:
+            text = await hedged(attempt, self.rerank_latency.quantile(RERANK_HEDGE_QUANTILE), timeout)
+            ranked = json.loads(text)
+            if not isinstance(ranked, list) or not all(
+                isinstance(paper_id, str) and _RANKED_ID.fullmatch(paper_id) for paper_id in ranked
+            ):
+                raise ValueError("ranking is not a JSON array of paper ids")
+        except Exception:
+            self.rerank_breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled: neither a success nor a failure, but a half-open trial must end
+            self.rerank_breaker.release()
+            raise
+        self.rerank_breaker.record_success()
+        await asyncio.to_thread(self.generation_cache.put, key, text, GENERATION_CACHE_TTLS["search_rerank"])
+        return ranked
+
+    async def search_cvpr_papers(
+        self,
+        query: str,
+        venues: Optional[list[str]] = None,
+        use_cache: bool = True,
+        deadline: float = SEARCH_DEADLINE,
+    ) -> PaperSearchResult:
+        """
+        Search through conference papers based on user query.
+        First uses vector search to get the top 15 papers across the selected catalog
+        shards, adds the papers whose full text matches best if a passage index has been
+        built, then uses Gemini to rank the top 5 once over the merged candidates.
+        Gemini only returns the ranked ids, which keeps the generation short; match
+        reasons are generated on demand by `explain_match`.
+
+        The search has a time budget. If Gemini fails, is disabled by its circuit breaker
+        or has not answered when the budget runs out, the top 5 papers are returned in
+        vector-search order and the result is marked as degraded.
 
         Parameters
         ----------
         query : str
             The search query from the user
+        venues : Optional[list[str]]
+            Catalog shard ids to search (e.g. "cvpr2025", "iccv2023"); defaults to CVPR 2025
+        use_cache : bool
+            Whether an earlier result of the same search may be returned
+        deadline : float
+            Time budget of the search in seconds
 
         Returns
         -------
-        list[dict]
-            List of top 5 most relevant papers matching the query
+        PaperSearchResult
+            The top 5 most relevant papers matching the query
         """
+        cache_key = (query.strip(), tuple(sorted(shard.id for shard in self.paper_index.resolve(venues))))
+        cached = self._cached_search(cache_key) if use_cache else None
+        if cached is not None:
+            return PaperSearchResult(cached)
+
+        expires_at = time.monotonic() + deadline
         try:
             # Get papers data using cache
             papers_data = self._get_cvpr_papers()
             if not papers_data:
-                return []
+                return PaperSearchResult([])
 
             # Create embedding for the query
-            response = genaisearch.embed_content(
-                model="models/embedding-001",
-                content=query
-            )
+            embedding = await asyncio.wait_for(self.embed_query(query), timeout=deadline)
+            if not embedding:
+                return PaperSearchResult([])
 
-            if not response:
-                return []
-
-            vector_results = self.db["papers"].aggregate([
-                {
-                    "$vectorSearch": {
-                        "index": "embeddings",
-                        "path": "embedding",
-                        "queryVector": response['embedding'],
-                        "numCandidates": 15,
-                        "limit":15
-                    }
-                }
-            ])
-            
-            
-            list_papers = list(vector_results)
-            if not list_papers:
-                return []
-
-            # Create a simplified version with IDs for Gemini
-            simplified_papers = {}
-            for idx, paper in enumerate(list_papers):
-                simplified_papers[f"paper_{idx}"] = {
-                    "id": f"paper_{idx}",
-                    "title": paper["title"],
-                    "abstract": paper["abstract"]
-                }
-
-            # Create the prompt for Gemini to rank top 5
-            prompt = f"""
-            Given this list of CVPR 2025 papers:
-            {json.dumps(simplified_papers, indent=2)}
-
-            And this user query: "{query}"
-
-            Please find the top 5 most relevant papers that match the query. Consider:
-            1. Title relevance
-            2. Abstract content
-            3. Research area/category
-            4. Keywords and technical terms
-
-            For each selected paper, provide:
-            1. The paper ID
-            2. A detailed explanation of why this paper is relevant to the query, including:
-               - How the paper's research aligns with the query
-               - Key technical contributions that match the query
-               - Potential impact or applications related to the query
-               - Why someone interested in this query should read this paper
-
-            Return your response as a JSON array with these fields for each paper:
-            - "paper_id": The ID of the paper (e.g., "paper_0")
-            - "match_reason": A detailed explanation of why this paper matches the query and why it should be read
-
-            Sort the papers by relevance to the query. Return only the top 5 most relevant papers.
-            Your response should be ONLY the JSON array, with no additional text or explanation.
-            """
-
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt,
-                config={
-                    "response_mime_type": "application/json",
-                },
+            list_papers, passage_hits = await asyncio.wait_for(
+                asyncio.gather(
+                    self.paper_index.search(embedding, venues, limit=15),
+                    self._search_passages(embedding, venues),
+                ),
+                timeout=max(expires_at - time.monotonic(), 0.1),
             )
+            list_papers = await self._merge_passage_hits(list_papers, passage_hits, papers_data)
+            if not list_papers:
+                return PaperSearchResult([])
+        except Exception as e:
+            print(f"Error searching CVPR papers: {e!r}")
+            return PaperSearchResult([])
 
-            if not response or not response.text:
-                return []
+        # Create a simplified version with IDs for Gemini
+        simplified_papers = {}
+        for idx, paper in enumerate(list_papers):
+            simplified_papers[f"paper_{idx}"] = {
+                "id": f"paper_{idx}",
+                "venue": paper.get("venue"),
+                "title": paper.get("title"),
+                "abstract": paper.get("abstract")
+            }
+            if paper.get("passage"):
+                simplified_papers[f"paper_{idx}"]["matching_passage"] = paper["passage"]
 
-            # Parse Gemini's response to get ranked papers
-            ranked_papers = json.loads(response.text)
-            
-            # Convert ranked papers to full paper details
-            matched_papers = []
-            for ranked_paper in ranked_papers:
-                paper_id = ranked_paper["paper_id"]
-                idx = int(paper_id.split("_")[1])
-                paper = list_papers[idx]
-                
-                # Create PaperSearchResponse and convert to dict
-                paper_response = PaperSearchResponse(
-                    title=paper["title"],
-                    authors=paper["authors"],
-                    pdf=paper["pdf"],
-                    supp=paper.get("supp"),
-                    arxiv=paper.get("arxiv"),
-                    bibtex=paper.get("bibtex"),
-                    abstract=paper["abstract"],
-                    poster_session=paper.get("poster_session"),
-                    poster_location=paper.get("poster_location")
-                )
-                # Add match reason to the response
-                paper_dict = paper_response.model_dump()
-                paper_dict["match_reason"] = ranked_paper["match_reason"]
-                matched_papers.append(paper_dict)
-            
-            return matched_papers
+        # Create the prompt for Gemini to rank top 5
+        prompt = f"""
+        Given this list of computer vision conference papers:
+        {json.dumps(simplified_papers, indent=2)}
+
+        And this user query: "{query}"
+
+        Please find the top 5 most relevant papers that match the query. Consider:
+        1. Title relevance
+        2. Abstract content
+        3. Research area/category
+        4. Keywords and technical terms
 
+        Return your response as a JSON array with the IDs of the top 5 most relevant papers,
+        sorted by relevance to the query, e.g. ["paper_3", "paper_0", "paper_7", "paper_1", "paper_12"].
+        Your response should be ONLY the JSON array, with no additional text or explanation.
+        """
+
+        try:
+            ranked_ids = await self._rerank(prompt, max(expires_at - time.monotonic(), 0.0))
+            # Ignore unknown or repeated ids
+            ranked = [
+                idx for idx in dict.fromkeys(int(paper_id.split("_")[1]) for paper_id in ranked_ids[:5])
+                if idx < len(list_papers)
+            ]
         except Exception as e:
-            print(f"Error searching CVPR papers: {e}")
-            return []
+            print(f"Ranking CVPR papers failed, returning vector search order: {e!r}")
+            ranked = []
+
+        # Built outside the ranking so a malformed paper cannot fail the fallback as well
+        matched_papers = self._paper_responses(list_papers[idx] for idx in ranked)
+        if not matched_papers:
+            return PaperSearchResult(self._paper_responses(list_papers[:5]), degraded=True)
+        self._store_search(cache_key, matched_papers)
+        return PaperSearchResult(matched_papers)
+
+    @classmethod
+    def _paper_responses(cls, papers: Iterable[dict]) -> list[dict]:
+        """Search hits as returned to clients, skipping papers that cannot be shown."""
+        responses = []
+        for paper in papers:
+            try:
+                responses.append(cls._paper_response(paper))
+            except ValueError as e:
+                print(f"Skipping invalid paper {paper.get('title')!r}: {e}")
+        return responses
+
+    @staticmethod
+    def _paper_response(paper: dict) -> dict:
+        """A search hit as returned to clients, with the `paper_id` used to request its match reason."""
+        # Catalogs uploaded from other sources may lack any of these fields
+        return PaperSearchResponse(
+            title=paper.get("title") or "",
+            authors=paper.get("authors") or [],
+            pdf=paper.get("pdf") or "",
+            supp=paper.get("supp"),
+            arxiv=paper.get("arxiv"),
+            bibtex=paper.get("bibtex"),
+            abstract=paper.get("abstract") or "",
+            poster_session=paper.get("poster_session"),
+            poster_location=paper.get("poster_location"),
+            venue=paper.get("venue"),
+            paper_id=f"{paper['shard']}:{paper['_id']}" if "_id" in paper and paper.get("shard") else None,
+            passage=paper.get("passage"),
+        ).model_dump()
@@ -0,0 +1,228 @@
+""" Shared, pooled and cached async client for the GitHub REST API. """
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from config import CACHE_BASE_PATH
+
+# Load environment variables from .env file
+load_dotenv()
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_CACHE_DIR = CACHE_BASE_PATH / "github"
+
+# How long a cached response is served without revalidation, per endpoint type (seconds)
+GITHUB_CACHE_TTLS: dict[str, int] = {
+    "repo": 60 * 60,
+    "readme": 6 * 60 * 60,
+    "contributors": 24 * 60 * 60,
+    "issues": 15 * 60,
+    "default": 10 * 60,
+}
+
+# Stop spending requests once this many remain, unless the reset is imminent
+GITHUB_RATE_LIMIT_RESERVE = 5
+GITHUB_RATE_LIMIT_MAX_WAIT = 10  # In seconds
+
+
+class GitHubRateLimited(Exception):
+    """Raised when the rate limit is exhausted and there is no cached response to fall back on."""
+
+
+class _ResponseCache:
+    """On-disk cache of JSON responses and their ETags, one file per request."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def load(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def store(self, key: str, entry: dict) -> None:
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error caching GitHub response: {e}")
+
+
+class GitHubClient:
+    """
+    Async GitHub API client with connection pooling, conditional requests and throttling.
+
+    Responses are cached on disk with a TTL per endpoint type. Expired entries are
+    revalidated with `If-None-Match`, and a `304 Not Modified` reply does not count
+    against the GitHub quota. The `X-RateLimit-*` headers of every reply are tracked
+    so that requests are held back, or served stale from cache, before the quota runs out.
+
+    Parameters
+    ----------
+    token : Optional[str]
+        A GitHub token; defaults to the `GITHUB_TOKEN` environment variable.
+    base_url : str
+        The API root, overridable for tests and load testing.
+    cache_dir : Path
+        Where cached responses are stored.
+    timeout : float
+        Per-request timeout in seconds.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        base_url: str = GITHUB_API_URL,
+        cache_dir: Path = GITHUB_CACHE_DIR,
+        timeout: float = 10.0,
+    ):
+        headers = {"Accept": "application/vnd.github+json", "User-Agent": "forky"}
+        token = token or os.getenv("GITHUB_TOKEN")
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        self.base_url = base_url.rstrip("/")
+        self.cache = _ResponseCache(cache_dir)
+        self.rate_limit_remaining: Optional[int] = None
+        self.rate_limit_reset: float = 0.0
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            follow_redirects=True,
+        )
+
+    def api_url(self, path: str) -> str:
+        """Build an absolute API URL from a path such as `/repos/owner/name`."""
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    @staticmethod
+    def _cache_key(url: str, params: Optional[dict]) -> str:
+        query = json.dumps(sorted((params or {}).items()))
+        return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+    def _track_rate_limit(self, response: httpx.Response) -> None:
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is not None:
+            self.rate_limit_remaining = int(remaining)
+        if reset is not None:
+            self.rate_limit_reset = float(reset)
+
+    async def _throttle(self, has_fallback: bool) -> bool:
+        """
+        Wait for quota if it is nearly exhausted.
+
+        Returns False if the caller should serve its cached fallback instead of requesting.
+        """
+        if self.rate_limit_remaining is None or self.rate_limit_remaining > GITHUB_RATE_LIMIT_RESERVE:
+            return True
+
+        wait = self.rate_limit_reset - time.time()
+        if wait <= 0:
+            return True
+        if has_fallback:
+            return False
+        if wait > GITHUB_RATE_LIMIT_MAX_WAIT:
+            raise GitHubRateLimited(f"GitHub rate limit exhausted for {int(wait)}s")
+
+        await asyncio.sleep(wait)
+        return True
+
+    async def get_json(self, url: str, kind: str = "default", params: Optional[dict] = None) -> Optional[Any]:
+        """
+        Fetch a GitHub API resource, using the cache whenever possible.
+
+        Concurrent requests for the same resource share a single upstream call.
+
+        Parameters
+        ----------
+        url : str
+            The absolute API URL.
+        kind : str
+            The endpoint type used to pick a TTL from `GITHUB_CACHE_TTLS`.
+        params : Optional[dict]
+            Query string parameters.
+
+        Returns
+        -------
+        Optional[Any]
+            The decoded JSON body, or None if the resource could not be fetched.
+        """
+        key = self._cache_key(url, params)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                return await self._fetch(key, url, kind, params)
+        finally:
+            if not lock.locked() and self._locks.get(key) is lock:
+                del self._locks[key]
+
+    async def _fetch(self, key: str, url: str, kind: str, params: Optional[dict]) -> Optional[Any]:
+        entry = await asyncio.to_thread(self.cache.load, key)
+        ttl = GITHUB_CACHE_TTLS.get(kind, GITHUB_CACHE_TTLS["default"])
+        if entry and time.time() - entry["fetched_at"] < ttl:
+            return entry["body"]
+
+        try:
+            if not await self._throttle(has_fallback=entry is not None):
+                return entry["body"]
+
+            headers = {"If-None-Match": entry["etag"]} if entry and entry.get("etag") else {}
+            response = await self._client.get(url, params=params, headers=headers)
+            self._track_rate_limit(response)
+        except (httpx.HTTPError, GitHubRateLimited) as e:
+            print(f"Error fetching {url}: {e}")
+            return entry["body"] if entry else None
+
+        if response.status_code == 304 and entry:
+            entry["fetched_at"] = time.time()
+        elif response.status_code == 200:
+            entry = {"etag": response.headers.get("ETag"), "fetched_at": time.time(), "body": response.json()}
+        else:
+            print(f"GitHub returned {response.status_code} for {url}")
+            return entry["body"] if entry else None
+
+        await asyncio.to_thread(self.cache.store, key, entry)
+        return entry["body"]
+
+    async def aclose(self) -> None:
+        """Close the pooled connections."""
+        await self._client.aclose()
+
+
+_github_client: Optional[GitHubClient] = None
+
+
+def get_github_client() -> GitHubClient:
+    """Return the process-wide GitHub client, creating it on first use."""
+    global _github_client
+    if _github_client is None:
+        _github_client = GitHubClient()
+    return _github_client
+
+
+async def close_github_client() -> None:
+    """Close the process-wide GitHub client if it was created."""
+    global _github_client
+    if _github_client is not None:
+        await _github_client.aclose()
+        _github_client = None
@@ -0,0 +1,303 @@
+""" Incremental full-text ingestion of paper PDFs into the passage index.
+
+The job runs in three resumable stages:
+
+1. Text is extracted from the PDFs in `PAPER_PDF_DIR` by a pool of processes. The passages
+   of every PDF are saved as soon as it is done and recorded in an append-only manifest,
+   so an interrupted run continues where it stopped. PDFs are only processed again when
+   their size or modification time changes.
+2. Passages are embedded with the configured embedding backend. Vectors are cached in
+   SQLite by a hash of the embedder and the passage text, so unchanged passages are never
+   embedded twice, even when a PDF is re-extracted.
+3. The vectors of all passages are written as one matrix that the server memory-maps.
+
+Usage:
+    python -m server.ai.ingest_passages [--workers 8] [--retry-errors]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterator, Mapping, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+from server.ai.embedders import Embedder
+from server.ai.gemini_client import PAPER_PDF_DIR, PASSAGES_DIR, GeminiClient
+from server.ai.passage_index import SNIPPET_CHARS, split_passages
+
+MANIFEST_FILE = PASSAGES_DIR / "manifest.jsonl"
+PASSAGE_TEXT_DIR = PASSAGES_DIR / "text"
+EMBEDDING_CACHE_FILE = PASSAGES_DIR / "embeddings.sqlite3"
+# Passages sent to the embedder at once; each batch is committed to the cache
+EMBED_BATCH_SIZE = 64
+
+
+def pdf_name(paper: Mapping) -> Optional[str]:
+    """The file name of a paper's PDF, taken from its `pdf` URL."""
+    url = paper.get("pdf")
+    if not url:
+        return None
+    return Path(urlparse(url).path).name or None
+
+
+def extract_text(path: str) -> str:
+    """
+    Extract the text of a PDF, page by page.
+
+    Runs in a worker process; pypdf is imported there so the parent does not need it.
+
+    Parameters
+    ----------
+    path : str
+        The PDF file.
+
+    Returns
+    -------
+    str
+        The text of all pages, separated by blank lines.
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+def _extract_passages(path: str) -> list[str]:
+    return split_passages(extract_text(path))
+
+
+class Manifest:
+    """
+    Append-only record of the processed PDFs; the last entry of a file wins.
+
+    Parameters
+    ----------
+    path : Path
+        The JSONL manifest file.
+    """
+
+    def __init__(self, path: Path = MANIFEST_FILE):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # A line cut short by an interrupted run
+                    self.entries[entry["file"]] = entry
+
+    def is_current(self, file: str, stat: os.stat_result, retry_errors: bool) -> bool:
+        """Whether the PDF was processed in its current version."""
+        entry = self.entries.get(file)
+        if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            return False
+        return not (retry_errors and entry.get("error"))
+
+    def record(self, entry: dict) -> None:
+        """Append an entry and flush it to disk."""
+        self.entries[entry["file"]] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def _passages_file(file: str) -> Path:
+    return PASSAGE_TEXT_DIR / f"{Path(file).stem}.json"
+
+
+def extract_all(papers: Mapping, manifest: Manifest, workers: int, retry_errors: bool) -> None:
+    """
+    Extract the passages of every new or changed PDF with a process pool.
+
+    Parameters
+    ----------
+    papers : Mapping
+        The catalog, keyed by title.
+    manifest : Manifest
+        The record of processed PDFs, updated as PDFs finish.
+    workers : int
+        Number of extraction processes.
+    retry_errors : bool
+        Also process PDFs that failed before and have not changed since.
+    """
+    titles_by_file = {pdf_name(paper): title for title, paper in papers.items() if pdf_name(paper)}
+    pending = []
+    for path in sorted(PAPER_PDF_DIR.glob("*.pdf")):
+        if path.name in titles_by_file and not manifest.is_current(path.name, path.stat(), retry_errors):
+            pending.append(path)
+    print(f"{len(pending)} PDF(s) to extract, {len(manifest.entries)} already in the manifest")
+    if not pending:
+        return
+
+    PASSAGE_TEXT_DIR.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_extract_passages, str(path)): path for path in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            stat = path.stat()
+            entry = {"file": path.name, "title": titles_by_file[path.name], "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            try:
+                passages = future.result()
+            except Exception as e:
+                print(f"Error extracting {path.name}: {e}")
+                entry["error"] = str(e)
+            else:
+                # The passages are saved before the manifest entry, so a recorded PDF is always complete
+                target = _passages_file(path.name)
+                tmp_target = target.with_name(target.name + ".tmp")
+                tmp_target.write_text(json.dumps(passages, ensure_ascii=False), encoding="utf-8")
+                tmp_target.replace(target)
+                entry["passages"] = len(passages)
+            manifest.record(entry)
+            if done % 100 == 0 or done == len(pending):
+                print(f"Extracted {done}/{len(pending)} PDF(s) in {time.perf_counter() - start:.0f}s")
+
+
+class EmbeddingCache:
+    """
+    Passage vectors in SQLite, keyed by a hash of the embedder name and the passage text.
+
+    Parameters
+    ----------
+    path : Path
+        The SQLite database file.
+    embedder : Embedder
+        The embedder whose vectors are cached.
+    """
+
+    def __init__(self, path: Path, embedder: Embedder):
+        self.embedder = embedder
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def key(self, passage: str) -> str:
+        """The content hash of a passage under this embedder."""
+        return hashlib.sha256(f"{self.embedder.name}\0{passage}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """The cached vectors among `keys`."""
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            found.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+        return found
+
+    def embed(self, passages: list[str]) -> np.ndarray:
+        """
+        Vectors of the passages, embedding and caching only those not seen before.
+
+        Parameters
+        ----------
+        passages : list[str]
+            The passages.
+
+        Returns
+        -------
+        np.ndarray
+            One float32 row per passage.
+        """
+        keys = [self.key(passage) for passage in passages]
+        vectors = self.get_many(keys)
+        missing = list({key: passage for key, passage in zip(keys, passages) if key not in vectors}.items())
+        for start in range(0, len(missing), EMBED_BATCH_SIZE):
+            batch = missing[start:start + EMBED_BATCH_SIZE]
+            embedded = self.embedder.embed_documents([passage for _, passage in batch]).astype(np.float32)
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for (key, _), vector in zip(batch, embedded)],
+                )
+            vectors.update((key, vector) for (key, _), vector in zip(batch, embedded))
+            if (start // EMBED_BATCH_SIZE) % 50 == 49:
+                print(f"Embedded {start + len(batch)}/{len(missing)} new passage(s)")
+        print(f"Embedded {len(missing)} new passage(s), {len(keys) - len(missing)} from the cache")
+        dimensions = self.embedder.dimensions
+        return np.stack([vectors[key] for key in keys]) if keys else np.zeros((0, dimensions), dtype=np.float32)
+
+
+def _current_passages(papers: Mapping, manifest: Manifest) -> Iterator[tuple[str, list[str]]]:
+    """`(title, passages)` of every extracted PDF whose paper is still in the catalog."""
+    for file, entry in sorted(manifest.entries.items()):
+        if entry.get("error") or not entry.get("passages") or entry["title"] not in papers:
+            continue
+        try:
+            passages = json.loads(_passages_file(file).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading the passages of {file}: {e}")
+            continue
+        yield entry["title"], passages
+
+
+def build_index(papers: Mapping, manifest: Manifest, embedder: Embedder) -> None:
+    """
+    Embed the passages of all extracted PDFs and write the passage index.
+
+    Parameters
+    ----------
+    papers : Mapping
+        The catalog, keyed by title.
+    manifest : Manifest
+        The record of processed PDFs.
+    embedder : Embedder
+        The embedder of the server's search queries.
+    """
+    titles, rows, all_passages = [], [], []
+    for title, passages in _current_passages(papers, manifest):
+        rows.extend([len(titles)] * len(passages))
+        all_passages.extend(passages)
+        titles.append(title)
+
+    vectors = EmbeddingCache(EMBEDDING_CACHE_FILE, embedder).embed(all_passages)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+    snippets = [passage[:SNIPPET_CHARS] for passage in all_passages]
+
+    # The metadata is replaced last; the server reloads when it changes and checks both agree
+    vectors_file, metadata_file = PASSAGES_DIR / "vectors.npy", PASSAGES_DIR / "index.json"
+    tmp_vectors = vectors_file.with_name("vectors.tmp.npy")
+    np.save(tmp_vectors, vectors.astype(np.float32))
+    tmp_vectors.replace(vectors_file)
+    tmp_metadata = metadata_file.with_name(metadata_file.name + ".tmp")
+    metadata = {"embedder": embedder.name, "titles": titles, "rows": rows, "snippets": snippets}
+    tmp_metadata.write_text(json.dumps(metadata, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    tmp_metadata.replace(metadata_file)
+    print(f"Indexed {len(rows)} passage(s) of {len(titles)} paper(s): {vectors_file}")
+
+
+def main():
+    """Extract, embed and index the full text of the locally stored paper PDFs."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of extraction processes")
+    parser.add_argument("--retry-errors", action="store_true", help="extract PDFs that failed before again")
+    args = parser.parse_args()
+
+    gemini_client = GeminiClient()
+    papers = gemini_client._get_cvpr_papers()
+    if not papers:
+        print("No papers data available")
+        return
+    if not PAPER_PDF_DIR.is_dir():
+        print(f"No PDF directory at {PAPER_PDF_DIR}")
+        return
+
+    manifest = Manifest()
+    extract_all(papers, manifest, args.workers, args.retry_errors)
+    build_index(papers, manifest, gemini_client.text_embedder)
+
+
+if __name__ == "__main__":
+    main()
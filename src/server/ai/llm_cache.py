@@ -0,0 +1,182 @@
+""" Content-addressed, size-capped SQLite cache for LLM generations. """
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+from config import CACHE_BASE_PATH
+
+LLM_CACHE_FILE = CACHE_BASE_PATH / "llm_cache.sqlite3"
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+
+
+def _encode(value: Any) -> Any:
+    """JSON fallback for generation configs that contain schemas or SDK objects."""
+    if isinstance(value, type) and issubclass(value, BaseModel):
+        return value.model_json_schema()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return repr(value)
+
+
+def generation_key(model: str, contents: Any, config: Any = None) -> str:
+    """
+    Compute the cache key of a generation request.
+
+    Parameters
+    ----------
+    model : str
+        The model name.
+    contents : Any
+        The prompt or list of contents.
+    config : Any
+        The generation config, including any response schema.
+
+    Returns
+    -------
+    str
+        A SHA-256 hex digest of the canonical JSON encoding of the request.
+    """
+    payload = json.dumps(
+        {"model": model, "contents": contents, "config": config},
+        sort_keys=True,
+        default=_encode,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    Persistent cache of generated text keyed by a hash of the request.
+
+    Every entry carries its own expiry, chosen by the call site. When the total size
+    exceeds `max_bytes`, expired entries are purged first and then the least recently
+    used ones. The total is kept up to date by triggers, so every worker sees the same
+    running total without summing the table. The database runs in WAL mode so several
+    worker processes can share it.
+
+    Parameters
+    ----------
+    path : Path
+        The SQLite database file.
+    max_bytes : int
+        The size cap for stored values.
+    """
+
+    def __init__(self, path: Path = LLM_CACHE_FILE, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS generations (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS generations_accessed ON generations (accessed_at)")
+        # One immediate transaction, so a worker starting at the same time waits for the triggers
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO generations_size SELECT 0, COALESCE(SUM(size), 0) FROM generations"
+            )
+            for name, event, change in (
+                ("insert", "INSERT", "NEW.size"),
+                ("update", "UPDATE OF size", "NEW.size - OLD.size"),
+                ("delete", "DELETE", "-OLD.size"),
+            ):
+                self._conn.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS generations_{name} AFTER {event} ON generations "
+                    f"BEGIN UPDATE generations_size SET total = total + {change}; END"
+                )
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return a cached generation if it exists and has not expired.
+
+        Parameters
+        ----------
+        key : str
+            The key from `generation_key`.
+
+        Returns
+        -------
+        Optional[str]
+            The cached text, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM generations WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE generations SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0] if row else None
+
+    def put(self, key: str, value: str, ttl: float) -> None:
+        """
+        Store a generation and evict entries if the cache grew past its size cap.
+
+        Parameters
+        ----------
+        key : str
+            The key from `generation_key`.
+        value : str
+            The generated text.
+        ttl : float
+            How long the entry stays fresh, in seconds.
+        """
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete skips the triggers
+            self._conn.execute(
+                """
+                INSERT INTO generations VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = excluded.value, size = excluded.size,
+                    expires_at = excluded.expires_at, accessed_at = excluded.accessed_at
+                """,
+                (key, value, size, now + ttl, now),
+            )
+            self._evict(now)
+
+    def _total_size(self) -> int:
+        (total,) = self._conn.execute("SELECT total FROM generations_size").fetchone()
+        return total
+
+    def _evict(self, now: float) -> None:
+        if self._total_size() <= self.max_bytes:
+            return
+
+        self._conn.execute("DELETE FROM generations WHERE expires_at <= ?", (now,))
+        excess = self._total_size() - self.max_bytes
+        if excess <= 0:
+            return
+
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM generations ORDER BY accessed_at"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM generations WHERE key = ?", victims)
@@ -0,0 +1,195 @@
+""" In-process vector index over the local paper catalog, for search without MongoDB Atlas. """
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterable, Mapping, Optional
+
+import numpy as np
+
+from server.ai.embedders import Embedder, paper_text
+from server.ai.sharded_index import CatalogShard
+
+
+def document_id(title: str) -> str:
+    """The document id of a paper in the local index, derived from its title alone."""
+    return hashlib.blake2b(title.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class LocalPaperIndex:
+    """
+    Exact cosine search over the embedded catalog, held as one NumPy matrix.
+
+    A drop-in replacement for `ShardedPaperIndex` that serves the single shard backed by
+    the local catalog. The paper vectors are computed on first use with the configured
+    embedder and saved next to the catalog; they are recomputed when the catalog or the
+    embedder changes. Document ids are hashes of the titles, so an id returned by a search
+    keeps pointing at the same paper after the catalog is rebuilt.
+
+    Parameters
+    ----------
+    shard : CatalogShard
+        The shard the local catalog belongs to.
+    load_papers : Callable[[], Mapping]
+        Returns the catalog, keyed by title.
+    version : Callable[[], str]
+        Fingerprint of the catalog, which changes whenever it is rewritten.
+    embedder : Embedder
+        Embeds the papers; queries must be embedded with the same embedder.
+    vectors_file : Path
+        Where the paper vectors are saved.
+    """
+
+    def __init__(
+        self,
+        shard: CatalogShard,
+        load_papers: Callable[[], Mapping],
+        version: Callable[[], str],
+        embedder: Embedder,
+        vectors_file: Path,
+    ):
+        self.shard = shard
+        self.shards = {shard.id: shard}
+        self.default_shards = [shard.id]
+        self.load_papers = load_papers
+        self.version = version
+        self.embedder = embedder
+        self.vectors_file = vectors_file
+        self._lock = threading.Lock()
+        self._key: Optional[str] = None
+        self._titles: list[str] = []
+        self._rows: dict[str, int] = {}  # Row of every document id
+        self._vectors: Optional[np.ndarray] = None
+
+    def resolve(self, shard_ids: Optional[Iterable[str]] = None) -> list[CatalogShard]:
+        """The local shard, whichever shards are requested."""
+        return [self.shard]
+
+    def _load(self) -> tuple[list[str], np.ndarray]:
+        """The titles and vectors of the current catalog, embedding it if needed."""
+        key = f"{self.embedder.name}:{self.version()}"
+        with self._lock:
+            if self._key == key:
+                return self._titles, self._vectors
+
+            titles, vectors = None, None
+            if self.vectors_file.exists():
+                try:
+                    with np.load(self.vectors_file) as saved:
+                        if str(saved["key"]) == key:
+                            titles, vectors = json.loads(str(saved["titles"])), saved["vectors"]
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Error reading paper vectors, recomputing them: {e}")
+
+            if vectors is None:
+                papers = self.load_papers()
+                titles = list(papers.keys())
+                vectors = self.embedder.embed_documents([paper_text(title, papers[title]) for title in titles])
+                try:
+                    self.vectors_file.parent.mkdir(parents=True, exist_ok=True)
+                    tmp_file = self.vectors_file.with_name(f"{self.vectors_file.name}.{os.getpid()}.tmp.npz")
+                    np.savez(tmp_file, key=np.array(key), titles=np.array(json.dumps(titles)), vectors=vectors)
+                    tmp_file.replace(self.vectors_file)
+                except OSError as e:
+                    print(f"Error saving paper vectors: {e}")
+
+            self._key, self._titles, self._vectors = key, titles, vectors
+            self._rows = {document_id(title): row for row, title in enumerate(titles)}
+            return titles, vectors
+
+    def matrix(self) -> tuple[list[str], np.ndarray]:
+        """The titles of the catalog and their unit-length vectors, one row per title."""
+        return self._load()
+
+    def _paper(self, titles: list[str], row: int, score: Optional[float] = None) -> Optional[dict]:
+        paper: Any = self.load_papers().get(titles[row])
+        if paper is None:
+            return None
+        hit = dict(paper, _id=document_id(titles[row]), venue=self.shard.label, shard=self.shard.id)
+        if score is not None:
+            hit["score"] = score
+        return hit
+
+    def _search(self, query_vector: list[float], limit: int) -> list[dict]:
+        titles, vectors = self._load()
+        if not titles:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = vectors @ (query / (np.linalg.norm(query) or 1.0))
+        limit = min(limit, len(titles))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        hits = (self._paper(titles, int(row), float(scores[row])) for row in top)
+        return [hit for hit in hits if hit is not None]
+
+    def get(self, shard_id: str, document_id: str) -> Optional[dict]:
+        """
+        Fetch one paper by the shard and document id of a search hit.
+
+        Parameters
+        ----------
+        shard_id : str
+            The shard the paper was found in.
+        document_id : str
+            The document id of the paper, see `document_id`.
+
+        Returns
+        -------
+        Optional[dict]
+            The paper, or None if the shard or paper is unknown.
+        """
+        if shard_id != self.shard.id:
+            return None
+        titles, _ = self._load()
+        row = self._rows.get(document_id)
+        return self._paper(titles, row) if row is not None else None
+
+    def document_ids(self, shard_id: str, titles: Iterable[str]) -> dict[str, str]:
+        """
+        Look up the document ids of papers by title, e.g. for papers found by another index.
+
+        Parameters
+        ----------
+        shard_id : str
+            The shard the papers belong to.
+        titles : Iterable[str]
+            The paper titles.
+
+        Returns
+        -------
+        dict[str, str]
+            The document id of every title found in the catalog.
+        """
+        if shard_id != self.shard.id:
+            return {}
+        self._load()
+        ids = {title: document_id(title) for title in titles}
+        return {title: paper_id for title, paper_id in ids.items() if paper_id in self._rows}
+
+    async def search(
+        self,
+        query_vector: list[float],
+        shard_ids: Optional[Iterable[str]] = None,
+        limit: int = 15,
+    ) -> list[dict]:
+        """
+        Return the papers most similar to a query vector.
+
+        Parameters
+        ----------
+        query_vector : list[float]
+            The query embedding.
+        shard_ids : Optional[Iterable[str]]
+            Ignored; the local catalog is a single shard.
+        limit : int
+            The number of hits to return.
+
+        Returns
+        -------
+        list[dict]
+            Papers sorted by descending cosine similarity, tagged with their venue.
+        """
+        return await asyncio.to_thread(self._search, query_vector, limit)
@@ -0,0 +1,113 @@
+""" Helpers for reading and writing the CVPR paper catalog. """
+
+import json
+import re
+from pathlib import Path
+from typing import IO, Iterator
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_title(title: str) -> str:
+    """
+    Normalize a paper title so that the same paper matches across pages.
+
+    The CVF listing and the accepted papers page disagree on casing, punctuation and
+    whitespace, so titles are lowercased and reduced to alphanumeric words.
+
+    Parameters
+    ----------
+    title : str
+        The raw paper title.
+
+    Returns
+    -------
+    str
+        The normalized title, suitable as a hash index key.
+    """
+    return _NON_ALNUM.sub(" ", title.lower()).strip()
+
+
+def append_jsonl_paper(handle: IO[str], paper: dict) -> None:
+    """
+    Append a single paper record to an open JSONL catalog and flush it to disk.
+
+    Parameters
+    ----------
+    handle : IO[str]
+        A text file opened in append mode.
+    paper : dict
+        The paper record to write.
+    """
+    handle.write(json.dumps(paper, ensure_ascii=False) + "\n")
+    handle.flush()
+
+
+def iter_jsonl_papers(path: Path) -> Iterator[dict]:
+    """
+    Lazily yield paper records from a JSONL catalog.
+
+    A truncated last line, left behind by an interrupted scrape, is skipped.
+
+    Parameters
+    ----------
+    path : Path
+        The path to the JSONL catalog.
+
+    Yields
+    ------
+    dict
+        One paper record per line.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping malformed catalog line in {path}")
+
+
+def iter_catalog(path: Path) -> Iterator[tuple[str, dict]]:
+    """
+    Yield `(title, paper)` pairs from a JSON or JSONL catalog.
+
+    JSONL catalogs are read one record at a time; JSON catalogs are parsed in full.
+
+    Parameters
+    ----------
+    path : Path
+        The path to the catalog file.
+
+    Yields
+    ------
+    tuple[str, dict]
+        The paper title and its record.
+    """
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        for paper in iter_jsonl_papers(path):
+            yield paper["title"], paper
+        return
+
+    with open(path, encoding="utf-8") as f:
+        yield from json.load(f).items()
+
+
+def load_catalog(path: Path) -> dict:
+    """
+    Load a JSON or JSONL catalog into a dict keyed by title.
+
+    Parameters
+    ----------
+    path : Path
+        The path to the catalog file.
+
+    Returns
+    -------
+    dict
+        The papers keyed by title.
+    """
+    return dict(iter_catalog(path))
@@ -0,0 +1,163 @@
+""" Passage-level vector index over the full text of papers, with hits aggregated to papers. """
+
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+PASSAGE_WORDS = 180
+PASSAGE_OVERLAP = 40
+# Passages shorter than this many words, e.g. page headers, are dropped
+MIN_PASSAGE_WORDS = 30
+SNIPPET_CHARS = 280
+
+_HYPHENATED = re.compile(r"(\w)-\s*\n\s*(\w)")
+_WHITESPACE = re.compile(r"\s+")
+_REFERENCES = re.compile(r"\n\s*(References|REFERENCES|Bibliography)\s*\n")
+
+
+def split_passages(text: str, words: int = PASSAGE_WORDS, overlap: int = PASSAGE_OVERLAP) -> list[str]:
+    """
+    Split the text of a paper into overlapping passages of about `words` words.
+
+    Words hyphenated across lines are joined, and the reference list is dropped since it
+    matches many queries without saying anything about the paper itself.
+
+    Parameters
+    ----------
+    text : str
+        The extracted text of the paper.
+    words : int
+        Length of a passage in words.
+    overlap : int
+        Number of words shared by consecutive passages, so a sentence cut at a passage
+        boundary is still whole in one of them.
+
+    Returns
+    -------
+    list[str]
+        The passages, in reading order.
+    """
+    text = _HYPHENATED.sub(r"\1\2", text)
+    references = _REFERENCES.search(text)
+    if references and references.start() > len(text) / 3:
+        text = text[:references.start()]
+    tokens = _WHITESPACE.sub(" ", text).strip().split(" ")
+    passages = []
+    for start in range(0, len(tokens), words - overlap):
+        chunk = tokens[start:start + words]
+        if len(chunk) >= MIN_PASSAGE_WORDS:
+            passages.append(" ".join(chunk))
+        if start + words >= len(tokens):
+            break
+    return passages
+
+
+class PassageIndex:
+    """
+    Exact cosine search over the passage vectors written by `ingest_passages`.
+
+    The vectors are memory-mapped, so all worker processes share one copy through the page
+    cache. A search ranks passages and then aggregates them to papers: a paper scores as its
+    best passage, plus a small bonus for each further matching passage, and is returned with
+    that best passage as a snippet. The files are reloaded when the ingestion rewrites them.
+
+    Parameters
+    ----------
+    directory : Path
+        The directory holding `vectors.npy` and `index.json`.
+    """
+
+    # Added to the score of a paper for every further passage among the top hits, up to MAX_BONUS_PASSAGES
+    PASSAGE_BONUS = 0.01
+    MAX_BONUS_PASSAGES = 5
+
+    def __init__(self, directory: Path):
+        self.vectors_file = directory / "vectors.npy"
+        self.metadata_file = directory / "index.json"
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self.embedder_name: Optional[str] = None
+        self._titles: list[str] = []
+        self._rows: Optional[np.ndarray] = None
+        self._snippets: list[str] = []
+        self._vectors: Optional[np.ndarray] = None
+
+    def _reload(self) -> bool:
+        """Load the index if it changed on disk; False if there is none."""
+        try:
+            mtime = self.metadata_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime != self._mtime:
+            try:
+                metadata = json.loads(self.metadata_file.read_text(encoding="utf-8"))
+                vectors = np.load(self.vectors_file, mmap_mode="r")
+                if len(vectors) != len(metadata["rows"]):
+                    raise ValueError("passage vectors and metadata do not match")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error loading the passage index: {e}")
+                return self._vectors is not None
+            self.embedder_name = metadata["embedder"]
+            self._titles = metadata["titles"]
+            self._rows = np.asarray(metadata["rows"], dtype=np.int32)
+            self._snippets = metadata["snippets"]
+            self._vectors = vectors
+            self._mtime = mtime
+        return True
+
+    def available(self, embedder_name: str) -> bool:
+        """Whether an index exists whose passages were embedded by `embedder_name`."""
+        with self._lock:
+            return self._reload() and self.embedder_name == embedder_name
+
+    def search(self, query_vector: list[float], limit: int = 10, passages: int = 200) -> list[dict]:
+        """
+        Find the papers with the passages most similar to a query vector.
+
+        Parameters
+        ----------
+        query_vector : list[float]
+            The query embedding, from the embedder that embedded the passages.
+        limit : int
+            The number of papers to return.
+        passages : int
+            The number of top passages aggregated into papers.
+
+        Returns
+        -------
+        list[dict]
+            `title`, `score` and best matching `passage` of every paper, best first.
+        """
+        with self._lock:
+            if not self._reload():
+                return []
+            titles, rows, snippets, vectors = self._titles, self._rows, self._snippets, self._vectors
+        if not len(vectors):
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        scores = vectors @ (query / (np.linalg.norm(query) or 1.0))
+        passages = min(passages, len(scores))
+        top = np.argpartition(-scores, passages - 1)[:passages]
+        top = top[np.argsort(-scores[top])]
+
+        papers: dict[int, dict] = {}
+        for passage in top:
+            paper = int(rows[passage])
+            hit = papers.get(paper)
+            if hit is None:
+                papers[paper] = {
+                    "title": titles[paper],
+                    "score": float(scores[passage]),
+                    "passage": snippets[passage],
+                    "matches": 1,
+                }
+            else:
+                hit["matches"] += 1
+        for hit in papers.values():
+            hit["score"] += self.PASSAGE_BONUS * min(hit.pop("matches") - 1, self.MAX_BONUS_PASSAGES)
+        return sorted(papers.values(), key=lambda hit: -hit["score"])[:limit]
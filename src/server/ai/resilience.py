@@ -0,0 +1,175 @@
+""" Latency tracking, hedged requests and a circuit breaker for calls to external models. """
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class LatencyTracker:
+    """
+    Quantiles over the most recent latencies of a call.
+
+    Parameters
+    ----------
+    window : int
+        Number of recent observations kept.
+    default : float
+        Value returned by `quantile` until `min_samples` observations are available.
+    min_samples : int
+        Observations needed before quantiles are computed from data.
+    """
+
+    def __init__(self, window: int = 200, default: float = 1.0, min_samples: int = 20):
+        self.default = default
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        """Record the latency of one completed call."""
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float:
+        """The `q` quantile (0 to 1) of the recent latencies."""
+        if len(self._samples) < self.min_samples:
+            return self.default
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Stop calling a dependency after repeated failures, then probe it again.
+
+    After `failure_threshold` consecutive failures the breaker opens and `allow` refuses
+    every call for `reset_timeout` seconds. It then lets a single trial call through:
+    success closes the breaker, failure opens it for another `reset_timeout`.
+
+    Parameters
+    ----------
+    name : str
+        Name used in log messages.
+    failure_threshold : int
+        Consecutive failures that open the breaker.
+    reset_timeout : float
+        Seconds the breaker stays open before a trial call.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """"closed", "open" or "half_open"."""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return "open"
+            return "half_open"
+
+    def allow(self) -> bool:
+        """Whether a call may be made now; in the half-open state only one trial call is allowed."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> None:
+        """Close the breaker."""
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"Circuit breaker {self.name} closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def release(self) -> None:
+        """End an allowed call without a verdict, e.g. when it was cancelled, so a later call can be the trial."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the breaker at the threshold or after a failed trial."""
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or (self._opened_at is None and self._failures >= self.failure_threshold):
+                print(f"Circuit breaker {self.name} opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+async def hedged(call: Callable[[], Awaitable[T]], hedge_delay: float, timeout: float) -> T:
+    """
+    Run a call, and start a second identical one if the first is slower than `hedge_delay`.
+
+    The first successful result wins and the other attempt is cancelled. A failed attempt
+    does not end the race while the other one is still running.
+
+    Parameters
+    ----------
+    call : Callable[[], Awaitable[T]]
+        Starts one attempt.
+    hedge_delay : float
+        Seconds to wait for the first attempt before starting the second.
+    timeout : float
+        Overall time budget in seconds.
+
+    Returns
+    -------
+    T
+        The result of the first attempt to succeed.
+
+    Raises
+    ------
+    asyncio.TimeoutError
+        If no attempt succeeded within `timeout`.
+    Exception
+        The error of the last attempt, if both failed.
+    """
+    deadline = time.monotonic() + timeout
+    attempts = {asyncio.ensure_future(call())}
+    hedge_at = time.monotonic() + hedge_delay if hedge_delay < timeout else None
+    error: Optional[BaseException] = None
+
+    try:
+        while attempts or hedge_at is not None:
+            if not attempts:
+                # The first attempt failed before the hedge delay: retry at once
+                hedge_at = None
+                attempts.add(asyncio.ensure_future(call()))
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wait_until = min(deadline, hedge_at) if hedge_at is not None else deadline
+            done, attempts = await asyncio.wait(attempts, timeout=wait_until - now, return_when=asyncio.FIRST_COMPLETED)
+            for attempt in done:
+                if attempt.exception() is None:
+                    return attempt.result()
+                error = attempt.exception()
+            if hedge_at is not None and time.monotonic() >= hedge_at:
+                hedge_at = None
+                attempts.add(asyncio.ensure_future(call()))
+    finally:
+        for attempt in attempts:
+            attempt.cancel()
+
+    if error is not None and time.monotonic() < deadline:
+        raise error
+    raise asyncio.TimeoutError(f"no attempt succeeded within {timeout:.1f}s")
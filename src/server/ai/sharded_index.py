@@ -0,0 +1,190 @@
+""" Sharded paper index with one vector-search shard per conference and year. """
+
+import asyncio
+import heapq
+import math
+from dataclasses import dataclass
+from itertools import chain
+from typing import TYPE_CHECKING, Iterable, Optional
+
+if TYPE_CHECKING:
+    from pymongo import MongoClient
+
+
+@dataclass(frozen=True)
+class CatalogShard:
+    """A single conference-year collection with its own vector search index."""
+
+    id: str
+    venue: str
+    year: str
+    database: str
+    collection: str
+    index: str = "embeddings"
+
+    @property
+    def label(self) -> str:
+        """Human readable name of the shard, e.g. "CVPR 2025"."""
+        return f"{self.venue} {self.year}"
+
+
+class ShardedPaperIndex:
+    """
+    Fan a vector query out to several catalog shards and merge the hits by score.
+
+    Each shard is queried in parallel on the default thread pool, so wall time follows
+    the slowest shard rather than the number of shards. The per-shard candidate count
+    shrinks with the square root of the number of shards, which keeps the merged pool
+    (and the single LLM rerank that follows) bounded as venues are added.
+
+    Parameters
+    ----------
+    mongo_client : MongoClient
+        The client used to reach the shard collections.
+    shards : Iterable[CatalogShard]
+        All available shards.
+    default_shards : Iterable[str]
+        Shard ids searched when a query does not select any.
+    """
+
+    def __init__(
+        self,
+        mongo_client: "MongoClient",
+        shards: Iterable[CatalogShard],
+        default_shards: Iterable[str],
+    ):
+        self.mongo_client = mongo_client
+        self.shards = {shard.id: shard for shard in shards}
+        self.default_shards = [shard_id for shard_id in default_shards if shard_id in self.shards]
+
+    def resolve(self, shard_ids: Optional[Iterable[str]] = None) -> list[CatalogShard]:
+        """
+        Map requested shard ids to shards, ignoring unknown ids.
+
+        Parameters
+        ----------
+        shard_ids : Optional[Iterable[str]]
+            The requested shard ids; falls back to the defaults when empty.
+
+        Returns
+        -------
+        list[CatalogShard]
+            The shards to search, without duplicates.
+        """
+        selected = dict.fromkeys(s for s in (shard_ids or []) if s in self.shards)
+        return [self.shards[shard_id] for shard_id in (selected or self.default_shards)]
+
+    @staticmethod
+    def per_shard_limit(limit: int, shard_count: int) -> int:
+        """Number of candidates to request from each of `shard_count` shards."""
+        return max(1, math.ceil(limit / math.sqrt(max(shard_count, 1))))
+
+    def _search_shard(self, shard: CatalogShard, query_vector: list[float], limit: int) -> list[dict]:
+        collection = self.mongo_client[shard.database][shard.collection]
+        hits = collection.aggregate([
+            {
+                "$vectorSearch": {
+                    "index": shard.index,
+                    "path": "embedding",
+                    "queryVector": query_vector,
+                    "numCandidates": limit,
+                    "limit": limit
+                }
+            },
+            {"$project": {"embedding": 0}},
+            {"$addFields": {"score": {"$meta": "vectorSearchScore"}}},
+        ])
+        return [dict(hit, venue=shard.label, shard=shard.id) for hit in hits]
+
+    def get(self, shard_id: str, document_id: str) -> Optional[dict]:
+        """
+        Fetch one paper by the shard and document id of a search hit.
+
+        Parameters
+        ----------
+        shard_id : str
+            The shard the paper was found in.
+        document_id : str
+            The hex ObjectId of the paper document.
+
+        Returns
+        -------
+        Optional[dict]
+            The paper without its embedding, or None if the shard or paper is unknown.
+        """
+        from bson import ObjectId
+
+        shard = self.shards.get(shard_id)
+        if shard is None or not ObjectId.is_valid(document_id):
+            return None
+        collection = self.mongo_client[shard.database][shard.collection]
+        paper = collection.find_one({"_id": ObjectId(document_id)}, {"embedding": 0})
+        return dict(paper, venue=shard.label, shard=shard.id) if paper else None
+
+    def document_ids(self, shard_id: str, titles: Iterable[str]) -> dict[str, str]:
+        """
+        Look up the document ids of papers by title, e.g. for papers found by another index.
+
+        Parameters
+        ----------
+        shard_id : str
+            The shard the papers belong to.
+        titles : Iterable[str]
+            The paper titles.
+
+        Returns
+        -------
+        dict[str, str]
+            The hex ObjectId of every title found in the shard.
+        """
+        shard = self.shards.get(shard_id)
+        titles = list(titles)
+        if shard is None or not titles:
+            return {}
+        collection = self.mongo_client[shard.database][shard.collection]
+        return {paper["title"]: str(paper["_id"]) for paper in collection.find({"title": {"$in": titles}}, {"title": 1})}
+
+    async def search(
+        self,
+        query_vector: list[float],
+        shard_ids: Optional[Iterable[str]] = None,
+        limit: int = 15,
+    ) -> list[dict]:
+        """
+        Search the selected shards concurrently and return the best hits overall.
+
+        A failing shard is logged and skipped so that one unavailable venue does not fail
+        the whole query.
+
+        Parameters
+        ----------
+        query_vector : list[float]
+            The query embedding.
+        shard_ids : Optional[Iterable[str]]
+            The shards to search; defaults to `default_shards`.
+        limit : int
+            The number of merged hits to return.
+
+        Returns
+        -------
+        list[dict]
+            Paper documents sorted by descending vector score, tagged with their venue.
+        """
+        shards = self.resolve(shard_ids)
+        if not shards:
+            return []
+
+        per_shard = self.per_shard_limit(limit, len(shards))
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._search_shard, shard, query_vector, per_shard) for shard in shards),
+            return_exceptions=True,
+        )
+
+        hits = []
+        for shard, result in zip(shards, results):
+            if isinstance(result, BaseException):
+                print(f"Error searching shard {shard.id}: {result}")
+                continue
+            hits.append(result)
+
+        return heapq.nlargest(limit, chain.from_iterable(hits), key=lambda hit: hit.get("score", 0.0))
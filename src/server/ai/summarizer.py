@@ -0,0 +1,233 @@
+""" Map-reduce summarization of repository digests that do not fit in a single prompt. """
+
+import asyncio
+import hashlib
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import tiktoken
+
+# Digests up to this many tokens are analyzed in a single Gemini call
+SINGLE_PASS_TOKEN_LIMIT = 100_000
+# Target size of each chunk summarized in the map phase
+CHUNK_TOKEN_LIMIT = 30_000
+# Chunks end at content-defined file boundaries, on average after this many tokens
+CHUNK_TARGET_TOKENS = CHUNK_TOKEN_LIMIT // 2
+# A chunk never ends at a boundary before it has this many tokens
+CHUNK_MIN_TOKENS = CHUNK_TOKEN_LIMIT // 8
+# Maximum number of chunk summaries generated at the same time
+SUMMARY_CONCURRENCY = 8
+# Upper bound on map phases when summaries are themselves too large to reduce
+MAX_MAP_ROUNDS = 3
+
+_FILE_HEADER = re.compile(r"^={10,}\n(?:File|FILE): (.+)\n={10,}\n", re.MULTILINE)
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> "tiktoken.Encoding":
+    import tiktoken
+
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the `cl100k_base` encoding.
+
+    Parameters
+    ----------
+    text : str
+        The text to measure.
+
+    Returns
+    -------
+    int
+        The number of tokens.
+    """
+    return len(_encoding().encode(text, disallowed_special=()))
+
+
+@dataclass
+class TokenUsage:
+    """Token accounting for one summarization run."""
+
+    input_tokens: int = 0
+    chunk_tokens: list[int] = field(default_factory=list)
+    summary_tokens: int = 0
+    rounds: int = 0
+
+    @property
+    def chunks(self) -> int:
+        """Number of chunks summarized in the map phases."""
+        return len(self.chunk_tokens)
+
+
+def split_digest(content: str) -> list[tuple[str, str]]:
+    """
+    Split a digest into its files.
+
+    Parameters
+    ----------
+    content : str
+        The digest, with each file preceded by a `File: <path>` banner.
+
+    Returns
+    -------
+    list[tuple[str, str]]
+        `(path, text)` pairs, where the text includes the banner. Content before the
+        first banner, or a digest without banners, is returned under an empty path.
+    """
+    matches = list(_FILE_HEADER.finditer(content))
+    if not matches:
+        return [("", content)] if content else []
+
+    files = [("", content[:matches[0].start()])] if matches[0].start() else []
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(content)
+        files.append((match.group(1).strip(), content[match.start():end]))
+    return files
+
+
+def _split_large_file(path: str, text: str, max_tokens: int) -> list[tuple[str, int]]:
+    """Split one oversized file on line boundaries into labelled parts."""
+    parts, lines, tokens = [], [], 0
+    for line in text.splitlines(keepends=True):
+        line_tokens = count_tokens(line)
+        if lines and tokens + line_tokens > max_tokens:
+            parts.append(("".join(lines), tokens))
+            lines, tokens = [], 0
+        lines.append(line)
+        tokens += line_tokens
+    if lines:
+        parts.append(("".join(lines), tokens))
+
+    return [
+        (f"File: {path} (part {idx} of {len(parts)})\n{part}" if idx > 1 else part, part_tokens)
+        for idx, (part, part_tokens) in enumerate(parts, 1)
+    ]
+
+
+def _is_boundary(path: str, tokens: int, target_tokens: int) -> bool:
+    """
+    Whether a chunk ends after this file, decided by the file alone.
+
+    A hash of the path is compared with the share of the target chunk size the file
+    takes, so chunks end on average every `target_tokens` tokens whatever the file sizes.
+    """
+    draw = int.from_bytes(hashlib.blake2b(path.encode("utf-8"), digest_size=4).digest(), "big") / 2**32
+    return draw < tokens / target_tokens
+
+
+def chunk_digest(
+    content: str,
+    max_tokens: int = CHUNK_TOKEN_LIMIT,
+    target_tokens: int = CHUNK_TARGET_TOKENS,
+    min_tokens: int = CHUNK_MIN_TOKENS,
+) -> list[tuple[str, int]]:
+    """
+    Group the files of a digest into chunks of at most `max_tokens` tokens.
+
+    Chunks end after files chosen by `_is_boundary`, i.e. by their path and size, not by
+    how full the chunk is. Adding or editing a file therefore only changes the chunk it
+    is in, and the boundaries of later chunks, and so their cache keys, stay the same.
+    Whole files are kept together whenever they fit, so each chunk summary sees complete
+    files; only files larger than a chunk are split, on line boundaries.
+
+    Parameters
+    ----------
+    content : str
+        The repository digest.
+    max_tokens : int
+        The token budget per chunk.
+    target_tokens : int
+        The average chunk size.
+    min_tokens : int
+        The size below which a chunk does not end at a boundary file.
+
+    Returns
+    -------
+    list[tuple[str, int]]
+        `(chunk, token_count)` pairs in digest order.
+    """
+    chunks: list[tuple[str, int]] = []
+    current: list[str] = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append(("".join(current), current_tokens))
+            current, current_tokens = [], 0
+
+    for path, text in split_digest(content):
+        tokens = count_tokens(text)
+        if tokens > max_tokens:
+            flush()
+            chunks.extend(_split_large_file(path, text, max_tokens))
+            continue
+        if current_tokens + tokens > max_tokens:
+            flush()
+        current.append(text)
+        current_tokens += tokens
+        if current_tokens >= min_tokens and _is_boundary(path, tokens, target_tokens):
+            flush()
+    flush()
+    return chunks
+
+
+async def _map_summaries(gemini_client, chunks: list[tuple[str, int]], usage: TokenUsage) -> list[str]:
+    """Summarize chunks concurrently, at most `SUMMARY_CONCURRENCY` at a time."""
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def summarize(chunk: str) -> str:
+        async with semaphore:
+            return await asyncio.to_thread(gemini_client.summarize_chunk, chunk)
+
+    usage.rounds += 1
+    usage.chunk_tokens.extend(tokens for _, tokens in chunks)
+    summaries = await asyncio.gather(*(summarize(chunk) for chunk, _ in chunks))
+    return [summary for summary in summaries if summary]
+
+
+async def summarize_repository(gemini_client, tree: str, content: str) -> tuple[dict, TokenUsage]:
+    """
+    Produce the repository analysis, splitting large digests into a map-reduce run.
+
+    Small digests go to `analyze_repository` unchanged. Larger ones are chunked per file,
+    the chunks are summarized concurrently and the summaries are reduced into the final
+    analysis, repeating the map phase while the summaries are still too large. Chunk
+    summaries go through the generation cache, whose key includes the chunk text, so
+    re-analyzing after a small commit only regenerates the chunks that changed.
+
+    Parameters
+    ----------
+    gemini_client : GeminiClient
+        The client providing `analyze_repository` and `summarize_chunk`.
+    tree : str
+        String representation of the repository file structure
+    content : str
+        Content of the repository files
+
+    Returns
+    -------
+    tuple[dict, TokenUsage]
+        The `AnalyzeRepositoryResponse` fields and the token accounting of the run.
+    """
+    usage = TokenUsage(input_tokens=await asyncio.to_thread(count_tokens, content))
+    if usage.input_tokens <= SINGLE_PASS_TOKEN_LIMIT:
+        return await asyncio.to_thread(gemini_client.analyze_repository, tree, content), usage
+
+    text = content
+    while True:
+        chunks = await asyncio.to_thread(chunk_digest, text)
+        summaries = await _map_summaries(gemini_client, chunks, usage)
+        text = "\n\n".join(summaries)
+        usage.summary_tokens = await asyncio.to_thread(count_tokens, text)
+        if usage.summary_tokens <= SINGLE_PASS_TOKEN_LIMIT or len(chunks) <= 1 or usage.rounds >= MAX_MAP_ROUNDS:
+            break
+
+    result = await asyncio.to_thread(gemini_client.analyze_repository, tree, text)
+    return result, usage
@@ -0,0 +1,104 @@
+""" The precomputed topic map of the paper catalog, as served by `/papers/map`. """
+
+import json
+import threading
+from pathlib import Path
+from typing import Optional
+
+from server.ai.gemini_client import TOPIC_MAP_FILE
+from server.compression import PrecompressedBody
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+class TopicMap:
+    """
+    Serve the file written by `build_topic_map` without recomputing anything.
+
+    The overview (clusters and paper positions) is compressed once per version of the
+    file; the drill-down of a cluster is compressed when it is first requested. Every
+    worker reloads the file when the offline job rewrites it.
+
+    Parameters
+    ----------
+    path : Path
+        The topic map file.
+    """
+
+    def __init__(self, path: Path = TOPIC_MAP_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self._overview: Optional[PrecompressedBody] = None
+        self._clusters: dict[int, dict] = {}
+        self._papers: dict[int, list[dict]] = {}
+        self._cluster_bodies: dict[int, PrecompressedBody] = {}
+
+    def _reload(self) -> None:
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._mtime, self._overview = None, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            papers = {int(cluster): members for cluster, members in data.pop("papers").items()}
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            print(f"Error loading the topic map: {e}")
+            return
+
+        self._overview = PrecompressedBody.build(
+            json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), JSON_MEDIA_TYPE
+        )
+        self._clusters = {cluster["id"]: cluster for cluster in data.get("clusters", [])}
+        self._papers = papers
+        self._cluster_bodies = {}
+        self._mtime = mtime
+
+    def overview(self) -> Optional[PrecompressedBody]:
+        """
+        The clusters with their labels and the 2D position of every paper.
+
+        Returns
+        -------
+        Optional[PrecompressedBody]
+            The overview, or None if the topic map has not been built.
+        """
+        with self._lock:
+            self._reload()
+            return self._overview
+
+    def cluster(self, cluster_id: int) -> Optional[PrecompressedBody]:
+        """
+        One cluster with its papers, closest to the center of the topic first.
+
+        Parameters
+        ----------
+        cluster_id : int
+            The `id` of the cluster in the overview.
+
+        Returns
+        -------
+        Optional[PrecompressedBody]
+            The drill-down, or None if the map or the cluster does not exist.
+        """
+        with self._lock:
+            self._reload()
+            if self._overview is None or cluster_id not in self._clusters:
+                return None
+            body = self._cluster_bodies.get(cluster_id)
+            if body is None:
+                content = {"cluster": self._clusters[cluster_id], "papers": self._papers.get(cluster_id, [])}
+                # Built on request, so the fast compression levels are used
+                body = PrecompressedBody.build(
+                    json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+                    JSON_MEDIA_TYPE,
+                    best=False,
+                )
+                self._cluster_bodies[cluster_id] = body
+            return body
+
+
+topic_map = TopicMap()
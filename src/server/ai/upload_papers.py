@@ -1,21 +1,55 @@
+import argparse
 import os
 import json
+from itertools import chain
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
 from pymongo import MongoClient
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from server.ai.binary_catalog import BinaryCatalog
+from server.ai.embedders import TfidfSvdEmbedder, create_embedder, paper_text
+from server.ai.gemini_client import (
+    CVPR_PAPERS_CACHE_DIR,
+    CVPR_PAPERS_CACHE_FILE,
+    CVPR_PAPERS_CATALOG_FILE,
+    CVPR_PAPERS_JSONL_FILE,
+    LOCAL_CATALOG_SHARD,
+    TFIDF_MODEL_FILE,
+)
+from server.ai.paper_catalog import iter_catalog
+from server.server_config import CATALOG_SHARDS, EMBEDDING_BACKEND, EMBEDDING_DIMENSIONS
+
 # Load environment variables
 load_dotenv()
 
 # Constants
 CVPR_PAPERS_URL = "https://storage.googleapis.com/tecla/cvpr2025_papers.json"
-CVPR_PAPERS_CACHE_DIR = Path("src/data/cache")
-CVPR_PAPERS_CACHE_FILE = CVPR_PAPERS_CACHE_DIR / "cvpr2025_papers.json"
 
 class PaperUploader:
-    def __init__(self):
+    """
+    Embed a paper catalog and store it in the collection of one catalog shard.
+
+    Parameters
+    ----------
+    shard_id : str
+        The `CATALOG_SHARDS` id of the collection to fill. Its collection needs the
+        `embeddings` Atlas vector index before the server can search it.
+    catalog_file : Optional[Path]
+        A JSON or JSONL catalog in the format of the CVPR 2025 scraper. Required for
+        every shard but the CVPR 2025 one, which defaults to the local catalog.
+    """
+
+    def __init__(self, shard_id: str = LOCAL_CATALOG_SHARD, catalog_file: Optional[Path] = None):
+        shard = next((shard for shard in CATALOG_SHARDS if shard["id"] == shard_id), None)
+        if shard is None:
+            raise ValueError(f"Unknown catalog shard: {shard_id}")
+        if catalog_file is None and shard_id != LOCAL_CATALOG_SHARD:
+            raise ValueError(f"A catalog file is required for the {shard_id} shard")
+        self.shard_id = shard_id
+        self.catalog_file = catalog_file
+
         # Initialize Gemini client
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
@@ -27,30 +61,56 @@ class PaperUploader:
         if not mongodb_uri:
             raise ValueError("MONGODB_URI environment variable is not set")
         self.mongo_client = MongoClient(mongodb_uri)
-        self.db = self.mongo_client.cvpr_papers
-        self.papers_collection = self.db.papers
+        self.db = self.mongo_client[shard["database"]]
+        self.papers_collection = self.db[shard["collection"]]
+        # Papers are upserted and looked up by title, e.g. for hits of the passage index
+        self.papers_collection.create_index("title")
+
+        # Papers must be embedded with the same backend the server embeds queries with
+        self.embedder = create_embedder(EMBEDDING_BACKEND, EMBEDDING_DIMENSIONS, TFIDF_MODEL_FILE, self._embed_batch)
+
+    @staticmethod
+    def _embed_batch(texts: List[str]) -> List[List[float]]:
+        """Embed texts with Gemini."""
+        response = genai.embed_content(model="models/embedding-001", content=texts)
+        return (response or {}).get("embedding") or []
+
+    def _prepare_embedder(self, refit: bool) -> None:
+        """Fit the TF-IDF embedder on the catalog and save it for the server, if it is used."""
+        if not isinstance(self.embedder, TfidfSvdEmbedder) or (self.embedder.fitted and not refit):
+            return
+        # The model is fitted on the CVPR 2025 catalog; refitting it on another venue would
+        # make the vectors already stored for CVPR 2025 incomparable with new queries
+        if self.embedder.fitted and self.shard_id != LOCAL_CATALOG_SHARD:
+            return
+        print("Fitting the TF-IDF embedder on the catalog...")
+        self.embedder = TfidfSvdEmbedder(EMBEDDING_DIMENSIONS)
+        self.embedder.fit(paper_text(title, paper) for title, paper in self._iter_papers())
+        self.embedder.save(TFIDF_MODEL_FILE)
 
     def _create_embedding(self, text: str) -> List[float]:
-        """Create embedding for text using Gemini."""
+        """Create embedding for text with the configured embedding backend."""
         try:
-            response = genai.embed_content(
-                model="models/embedding-001",
-                content=text
-            )
-            # Extract embedding from response
-            if isinstance(response, dict) and 'embedding' in response:
-                return response['embedding']
-            return []
+            embedding = self.embedder.embed_documents([text])[0]
+            # Atlas cannot compare zero vectors by cosine, e.g. of texts without known terms
+            return embedding.tolist() if embedding.any() else []
         except Exception as e:
             print(f"Error creating embedding: {e}")
             return []
 
-    def _get_papers_data(self) -> Dict:
+    def _get_papers_data(self) -> Mapping:
         """Get CVPR papers data from cache or download."""
         try:
             # Create cache directory if it doesn't exist
             CVPR_PAPERS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+            # Prefer the memory-mapped catalog when it is at least as new as the JSON cache
+            if CVPR_PAPERS_CATALOG_FILE.exists() and (
+                not CVPR_PAPERS_CACHE_FILE.exists()
+                or CVPR_PAPERS_CATALOG_FILE.stat().st_mtime >= CVPR_PAPERS_CACHE_FILE.stat().st_mtime
+            ):
+                return BinaryCatalog(CVPR_PAPERS_CATALOG_FILE)
+
             # Try to read from cache first
             if CVPR_PAPERS_CACHE_FILE.exists():
                 with open(CVPR_PAPERS_CACHE_FILE, 'r') as f:
@@ -71,39 +131,60 @@ class PaperUploader:
             print(f"Error getting papers data: {e}")
             return {}
 
+    def _iter_papers(self) -> Iterator[Tuple[str, Dict]]:
+        """Yield (title, paper) pairs, streaming from the JSONL catalog when available."""
+        if self.catalog_file is not None:
+            yield from iter_catalog(self.catalog_file)
+            return
+        if CVPR_PAPERS_JSONL_FILE.exists():
+            yield from iter_catalog(CVPR_PAPERS_JSONL_FILE)
+            return
+        yield from self._get_papers_data().items()
+
+    def _peek_papers(self) -> Optional[Iterator[Tuple[str, Dict]]]:
+        """Return the paper iterator, or None if the catalog is empty."""
+        papers = self._iter_papers()
+        first = next(papers, None)
+        if first is None:
+            return None
+        return chain([first], papers)
+
     def update_papers(self):
         """Update existing papers in MongoDB Atlas with new data."""
         try:
             # Get papers data
-            papers_data = self._get_papers_data()
-            if not papers_data:
+            papers_data = self._peek_papers()
+            if papers_data is None:
                 print("No papers data available")
                 return
+            # Existing documents stay comparable as long as the fitted model is kept
+            self._prepare_embedder(refit=False)
 
             # Process and update papers
-            total_papers = len(papers_data)
+            total_papers = 0
             updated_count = 0
-            for idx, (title, paper) in enumerate(papers_data.items(), 1):
-                print(f"Processing paper {idx}/{total_papers}: {title}")
+            for idx, (title, paper) in enumerate(papers_data, 1):
+                total_papers = idx
+                print(f"Processing paper {idx}: {title}")
 
                 # Create text for embedding (title + abstract)
-                text_for_embedding = f"{title} {paper['abstract']}"
+                text_for_embedding = paper_text(title, paper)
                 
                 # Generate embedding
                 embedding = self._create_embedding(text_for_embedding)
                 
                 if embedding:
-                    # Prepare document for MongoDB
+                    # Prepare document for MongoDB; other venues may lack fields such as posters
                     paper_doc = {
-                        "title": paper["title"],
-                        "authors": paper["authors"],
-                        "pdf": paper["pdf"],
-                        "supp": paper["supp"],
-                        "arxiv": paper["arxiv"],
-                        "bibtex": paper["bibtex"],
-                        "abstract": paper["abstract"],
-                        "poster_session": paper["poster_session"],
-                        "poster_location": paper["poster_location"],
+                        "title": paper.get("title", title),
+                        "authors": paper.get("authors"),
+                        "pdf": paper.get("pdf"),
+                        "supp": paper.get("supp"),
+                        "arxiv": paper.get("arxiv"),
+                        "bibtex": paper.get("bibtex"),
+                        "abstract": paper.get("abstract"),
+                        "poster_session": paper.get("poster_session"),
+                        "poster_location": paper.get("poster_location"),
                         "embedding": embedding
                     }
                     
@@ -132,22 +213,26 @@ class PaperUploader:
         """Process and upload papers to MongoDB Atlas."""
         try:
             # Get papers data
-            papers_data = self._get_papers_data()
-            if not papers_data:
+            papers_data = self._peek_papers()
+            if papers_data is None:
                 print("No papers data available")
                 return
 
+            # Every paper is re-embedded, so the model can follow the current catalog
+            self._prepare_embedder(refit=True)
+
             # Clear existing papers
             self.papers_collection.delete_many({})
             print("Cleared existing papers from database")
 
             # Process and store papers
-            total_papers = len(papers_data)
-            for idx, (title, paper) in enumerate(papers_data.items(), 1):
-                print(f"Processing paper {idx}/{total_papers}: {title}")
+            total_papers = 0
+            for idx, (title, paper) in enumerate(papers_data, 1):
+                total_papers = idx
+                print(f"Processing paper {idx}: {title}")
 
                 # Create text for embedding (title + abstract)
-                text_for_embedding = f"{title} {paper['abstract']}"
+                text_for_embedding = paper_text(title, paper)
                 
                 # Generate embedding
                 embedding = self._create_embedding(text_for_embedding)
@@ -155,15 +240,15 @@ class PaperUploader:
                 if embedding:
                     # Prepare document for MongoDB
                     paper_doc = {
-                        "title": paper["title"],
-                        "authors": paper["authors"],
-                        "pdf": paper["pdf"],
-                        "supp": paper["supp"],
-                        "arxiv": paper["arxiv"],
-                        "bibtex": paper["bibtex"],
-                        "abstract": paper["abstract"],
-                        "poster_session": paper["poster_session"],
-                        "poster_location": paper["poster_location"],
+                        "title": paper.get("title", title),
+                        "authors": paper.get("authors"),
+                        "pdf": paper.get("pdf"),
+                        "supp": paper.get("supp"),
+                        "arxiv": paper.get("arxiv"),
+                        "bibtex": paper.get("bibtex"),
+                        "abstract": paper.get("abstract"),
+                        "poster_session": paper.get("poster_session"),
+                        "poster_location": paper.get("poster_location"),
                         "embedding": embedding
                     }
                     
@@ -182,9 +267,21 @@ class PaperUploader:
 
 def main():
     """Main function to run the upload process."""
-    print("Starting CVPR papers upload process...")
-    uploader = PaperUploader()
-    uploader.update_papers() # or upload_papers()
+    parser = argparse.ArgumentParser(description="Embed a paper catalog and store it in a catalog shard.")
+    parser.add_argument("--shard", default=LOCAL_CATALOG_SHARD, choices=[shard["id"] for shard in CATALOG_SHARDS],
+                        help="the shard whose collection is filled")
+    parser.add_argument("--catalog", type=Path, default=None,
+                        help="JSON or JSONL catalog of the shard; defaults to the local CVPR 2025 catalog")
+    parser.add_argument("--replace", action="store_true",
+                        help="clear the collection first instead of updating papers in place")
+    args = parser.parse_args()
+
+    print(f"Starting {args.shard} papers upload process...")
+    uploader = PaperUploader(args.shard, args.catalog)
+    if args.replace:
+        uploader.upload_papers()
+    else:
+        uploader.update_papers()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
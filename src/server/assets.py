@@ -0,0 +1,107 @@
+""" Content-hashed URLs for the files in `static/`, served with immutable caching. """
+
+import hashlib
+import mimetypes
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from server.compression import PrecompressedBody
+
+STATIC_DIR = Path(__file__).parent.parent / "static"
+ASSETS_URL_PREFIX = "/assets/"
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+mimetypes.add_type("application/manifest+json", ".webmanifest")
+mimetypes.add_type("application/javascript", ".js")
+
+
+def _hashed_name(path: str, content: bytes) -> str:
+    """`js/chat.js` becomes `js/chat.<hash>.js`."""
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    stem, dot, suffix = path.rpartition(".")
+    return f"{stem}.{digest}.{suffix}" if dot and "/" not in suffix else f"{path}.{digest}"
+
+
+@lru_cache(maxsize=1)
+def asset_manifest() -> dict[str, str]:
+    """
+    Map each file under `static/` to its content-hashed name.
+
+    Returns
+    -------
+    dict[str, str]
+        Hashed names keyed by path relative to `static/`, e.g.
+        `{"js/chat.js": "js/chat.1a2b3c4d5e6f.js"}`.
+    """
+    manifest = {}
+    for file in sorted(STATIC_DIR.rglob("*")):
+        if file.is_file():
+            path = file.relative_to(STATIC_DIR).as_posix()
+            manifest[path] = _hashed_name(path, file.read_bytes())
+    return manifest
+
+
+@lru_cache(maxsize=1)
+def _hashed_paths() -> dict[str, str]:
+    return {hashed: path for path, hashed in asset_manifest().items()}
+
+
+def asset_url(path: str) -> str:
+    """
+    URL of a static file that changes whenever its content changes.
+
+    Registered as the `asset` Jinja global, e.g. `{{ asset('js/chat.js') }}`.
+
+    Parameters
+    ----------
+    path : str
+        The path relative to `static/`.
+
+    Returns
+    -------
+    str
+        The `/assets/` URL of the hashed name, or the plain `/static/` URL for files added
+        after the manifest was built.
+    """
+    hashed = asset_manifest().get(path)
+    return f"{ASSETS_URL_PREFIX}{hashed}" if hashed else f"/static/{path}"
+
+
+_bodies: dict[str, PrecompressedBody] = {}
+_bodies_lock = threading.Lock()
+
+
+def load_asset(hashed: str) -> Optional[PrecompressedBody]:
+    """
+    Load and precompress a static file by its hashed name, once per process.
+
+    Parameters
+    ----------
+    hashed : str
+        The hashed name from the manifest.
+
+    Returns
+    -------
+    Optional[PrecompressedBody]
+        The file with its compressed variants, or None if the name is unknown.
+    """
+    if hashed in _bodies:
+        return _bodies[hashed]
+
+    path = _hashed_paths().get(hashed)
+    if path is None:
+        return None
+
+    with _bodies_lock:
+        if hashed not in _bodies:
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            _bodies[hashed] = PrecompressedBody.build((STATIC_DIR / path).read_bytes(), media_type)
+    return _bodies[hashed]
+
+
+def preload_assets() -> None:
+    """Precompress every static file, so that no request pays for it."""
+    for hashed in asset_manifest().values():
+        load_asset(hashed)
@@ -0,0 +1,100 @@
+""" Precompressed response bodies with ETag and content-encoding negotiation. """
+
+import gzip
+import hashlib
+from dataclasses import dataclass, field
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+# Media types worth compressing; images such as PNG are already compressed
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/manifest+json", "image/svg+xml")
+# Bodies smaller than this are sent as they are
+MIN_COMPRESS_SIZE = 1024
+
+
+def accepted_encodings(request: Request) -> set[str]:
+    """Content codings the client accepts, ignoring those with `q=0`."""
+    accepted = set()
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+@dataclass(frozen=True)
+class PrecompressedBody:
+    """A response body together with its ETag and compressed variants."""
+
+    body: bytes
+    media_type: str
+    etag: str
+    variants: dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, body: bytes, media_type: str, best: bool = True) -> "PrecompressedBody":
+        """
+        Compute the ETag and the compressed variants of a body.
+
+        Parameters
+        ----------
+        body : bytes
+            The uncompressed body.
+        media_type : str
+            The media type of the body.
+        best : bool
+            Use the strongest compression levels, for bodies built once at startup. Bodies
+            built per request use fast gzip only.
+
+        Returns
+        -------
+        PrecompressedBody
+            The body with its variants; variants that are not smaller are dropped.
+        """
+        variants = {}
+        if len(body) >= MIN_COMPRESS_SIZE and media_type.startswith(COMPRESSIBLE_TYPES):
+            if best and brotli is not None:
+                variants["br"] = brotli.compress(body, quality=11)
+            variants["gzip"] = gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+            variants = {coding: data for coding, data in variants.items() if len(data) < len(body)}
+
+        etag = f'"{hashlib.sha256(body).hexdigest()[:20]}"'
+        return cls(body, media_type, etag, variants)
+
+    def response(self, request: Request, cache_control: str = "no-cache") -> Response:
+        """
+        Serve the best variant the client accepts, or 304 if its copy is current.
+
+        Parameters
+        ----------
+        request : Request
+            The incoming request.
+        cache_control : str
+            The `Cache-Control` header value.
+
+        Returns
+        -------
+        Response
+            The response.
+        """
+        accepted = accepted_encodings(request)
+        coding = next((coding for coding in ("br", "gzip") if coding in accepted and coding in self.variants), None)
+
+        # Each encoding is a different representation and gets its own validator
+        etag = f'{self.etag[:-1]}-{coding}"' if coding else self.etag
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        if coding:
+            headers["Content-Encoding"] = coding
+            return Response(self.variants[coding], media_type=self.media_type, headers=headers)
+        return Response(self.body, media_type=self.media_type, headers=headers)
@@ -0,0 +1,132 @@
+""" Disk cache of the repository overview graphs, keyed by tree and bounded in size. """
+
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from server.compression import PrecompressedBody
+from server.repo_tree import GRAPH_FORMAT
+from server.server_config import DIAGRAM_CACHE_MAX_BYTES, DIAGRAM_MAX_CHILDREN, DIAGRAM_MAX_NODES
+
+DIAGRAMS_DIR = Path(__file__).parent.parent / "diagrams"
+JSON_MEDIA_TYPE = "application/json"
+
+
+class DiagramCache:
+    """
+    Overview graphs of repositories, one gzip-compressed JSON file per repository tree.
+
+    A graph is keyed by a hash of the tree and of the settings it was drawn with, so a
+    repository whose files changed gets a new graph while unchanged ones are reused, and
+    the content behind a key never changes. A hit touches the file, so its modification
+    time is its last use (as for the repository folders in `repo_cleanup`). After every
+    write the least recently used files are deleted while the directory is above
+    `max_bytes`. Files are replaced atomically, so concurrent workers never serve a
+    partial graph.
+
+    Parameters
+    ----------
+    directory : Path
+        Where the graphs are stored.
+    max_bytes : int
+        Disk cap of the cache.
+    """
+
+    SUFFIX = ".json.gz"
+
+    def __init__(self, directory: Path = DIAGRAMS_DIR, max_bytes: int = DIAGRAM_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(tree: str) -> str:
+        """The cache key of a repository tree, also the id of its graph."""
+        settings = f"{GRAPH_FORMAT}:{DIAGRAM_MAX_NODES}:{DIAGRAM_MAX_CHILDREN}"
+        return hashlib.sha256(f"{settings}\0{tree}".encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    def contains(self, key: str) -> bool:
+        """Whether a graph is cached, marking it as recently used."""
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def body(self, key: str) -> Optional[PrecompressedBody]:
+        """
+        Load a graph as a response body, marking it as recently used.
+
+        The file is already gzip-compressed, so serving it costs no compression.
+
+        Parameters
+        ----------
+        key : str
+            The id of the graph.
+
+        Returns
+        -------
+        Optional[PrecompressedBody]
+            The graph as JSON with its gzip variant, or None if it is not cached.
+        """
+        path = self._path(key)
+        try:
+            compressed = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return PrecompressedBody(gzip.decompress(compressed), JSON_MEDIA_TYPE, f'"{key}"', {"gzip": compressed})
+
+    def put(self, key: str, graph: dict) -> None:
+        """
+        Store a graph and evict the least recently used ones above the disk cap.
+
+        Parameters
+        ----------
+        key : str
+            The key of the tree.
+        graph : dict
+            The graph, see `repo_tree.overview_graph`.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        content = json.dumps(graph, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(gzip.compress(content, compresslevel=9, mtime=0))
+        tmp_path.replace(path)
+        self._evict(keep=path.name)
+
+    def _evict(self, keep: str) -> None:
+        # Every file counts, so HTML diagrams left by older versions are evicted first
+        entries, total = [], 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(".tmp") or not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.name))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                (self.directory / name).unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+diagram_cache = DiagramCache()
@@ -0,0 +1,158 @@
+""" Index of digest files under TMP_BASE_PATH and their precompressed copies. """
+
+import gzip
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from config import TMP_BASE_PATH
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+_DIGEST_ID = re.compile(r"[\w.-]+")
+
+# Precompressed copies are stored next to the digest, e.g. `owner-repo.txt.gz`
+ENCODING_SUFFIXES: dict[str, str] = {"zstd": ".zst", "gzip": ".gz"}
+
+
+class DigestIndex:
+    """
+    Map digest ids to digest files without scanning directories on every request.
+
+    The first lookup of a digest looks inside its own directory once; later lookups only
+    check that the remembered file still exists. Producers can `register` files directly
+    and the cleanup task calls `forget` when a digest directory is removed.
+
+    Parameters
+    ----------
+    base_path : Path
+        The directory holding one sub-directory per digest.
+    max_entries : int
+        The number of digests remembered, least recently used first out.
+    """
+
+    def __init__(self, base_path: Path = TMP_BASE_PATH, max_entries: int = 10_000):
+        self.base_path = base_path
+        self.max_entries = max_entries
+        self._paths: OrderedDict[str, Path] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_valid_id(digest_id: str) -> bool:
+        """Whether a digest id is safe to use as a directory name."""
+        return bool(_DIGEST_ID.fullmatch(digest_id)) and digest_id not in (".", "..")
+
+    def register(self, digest_id: str, path: Path) -> None:
+        """
+        Remember the digest file of a digest id.
+
+        Parameters
+        ----------
+        digest_id : str
+            The digest id.
+        path : Path
+            The `.txt` digest file.
+        """
+        with self._lock:
+            self._paths[digest_id] = path
+            self._paths.move_to_end(digest_id)
+            while len(self._paths) > self.max_entries:
+                self._paths.popitem(last=False)
+
+    def forget(self, digest_id: str) -> None:
+        """Drop a digest id, e.g. after its directory was deleted."""
+        with self._lock:
+            self._paths.pop(digest_id, None)
+
+    def resolve(self, digest_id: str) -> Optional[Path]:
+        """
+        Find the digest file of a digest id.
+
+        Parameters
+        ----------
+        digest_id : str
+            The digest id.
+
+        Returns
+        -------
+        Optional[Path]
+            The `.txt` digest file, or None if the digest does not exist.
+        """
+        if not self.is_valid_id(digest_id):
+            return None
+
+        with self._lock:
+            path = self._paths.get(digest_id)
+        if path is not None and path.is_file():
+            return path
+
+        directory = self.base_path / digest_id
+        if not directory.is_dir():
+            self.forget(digest_id)
+            return None
+
+        path = next(iter(sorted(directory.glob("*.txt"))), None)
+        if path is None:
+            self.forget(digest_id)
+            return None
+
+        self.register(digest_id, path)
+        return path
+
+
+def precompressed_path(path: Path, encoding: str) -> Path:
+    """Path of the precompressed copy of a digest for a content encoding."""
+    return path.with_name(path.name + ENCODING_SUFFIXES[encoding])
+
+
+_compressing: set[Path] = set()
+_compressing_lock = threading.Lock()
+
+
+def precompress(path: Path) -> None:
+    """
+    Write gzip (and, if available, zstd) copies of a digest next to it.
+
+    Copies are written to a temporary name per process and renamed into place, so
+    readers never see a partial file, even when several workers compress the same
+    digest. Concurrent calls within one process do the work only once.
+
+    Parameters
+    ----------
+    path : Path
+        The `.txt` digest file.
+    """
+    with _compressing_lock:
+        if path in _compressing:
+            return
+        _compressing.add(path)
+
+    try:
+        for encoding in ENCODING_SUFFIXES:
+            target = precompressed_path(path, encoding)
+            if target.exists() or (encoding == "zstd" and zstandard is None):
+                continue
+
+            tmp_target = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+            with open(path, "rb") as src, open(tmp_target, "wb") as raw:
+                if encoding == "gzip":
+                    with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                else:
+                    zstandard.ZstdCompressor(level=10).copy_stream(src, raw)
+            tmp_target.replace(target)
+    except OSError as e:
+        print(f"Error precompressing {path}: {e}")
+    finally:
+        with _compressing_lock:
+            _compressing.discard(path)
+
+
+digest_index = DigestIndex()
@@ -1,18 +1,22 @@
 """ Main module for the FastAPI application. """
 
+import asyncio
 import os
 from pathlib import Path
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from slowapi.errors import RateLimitExceeded
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 
-from server.routers import download, dynamic, index
-from server.server_config import templates
+from server.assets import ASSET_CACHE_CONTROL, load_asset
+from server.metrics import render_metrics
+from server.prerender import api_page
+from server.routers import chat, diagrams, download, dynamic, index, papers
 from server.server_utils import lifespan, limiter, rate_limit_exception_handler
+from server.warmup import readiness
 
 # Load environment variables from .env file
 load_dotenv()
@@ -29,13 +33,6 @@ static_dir = Path(__file__).parent.parent / "static"
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 
-# Define the path to the diagrams directory
-diagrams_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'diagrams')
-
-# Mount the static files directory
-app.mount("/diagrams", StaticFiles(directory=diagrams_dir), name="diagrams")
-
-
 # Fetch allowed hosts from the environment or use the default values
 allowed_hosts = os.getenv("ALLOWED_HOSTS")
 if allowed_hosts:
@@ -70,6 +67,40 @@ async def health_check() -> dict[str, str]:
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check() -> JSONResponse:
+    """
+    Readiness endpoint, to be used as the startup probe.
+
+    Unlike `/health`, which only tells that the process is alive, this endpoint answers
+    503 until the startup warmup has loaded the catalog, connected to MongoDB and filled
+    the search caches, so that traffic is only admitted at steady-state latency.
+
+    Returns
+    -------
+    JSONResponse
+        The warmup state and the outcome of each warmup step, with status 200 once the
+        instance is ready and 503 before.
+    """
+    return JSONResponse(content=readiness.report(), status_code=200 if readiness.ready else 503)
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """
+    Metrics of this worker process in the Prometheus text format.
+
+    Each worker keeps its own metrics, so with several workers every scrape reflects
+    the worker that answered it.
+
+    Returns
+    -------
+    PlainTextResponse
+        The batch size and queueing delay histograms of query embeddings.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.head("/")
 async def head_root() -> HTMLResponse:
     """
@@ -89,9 +120,9 @@ async def head_root() -> HTMLResponse:
 
 @app.get("/api/", response_class=HTMLResponse)
 @app.get("/api", response_class=HTMLResponse)
-async def api_docs(request: Request) -> HTMLResponse:
+async def api_docs(request: Request) -> Response:
     """
-    Render the API documentation page.
+    Serve the pre-rendered API documentation page.
 
     Parameters
     ----------
@@ -100,10 +131,40 @@ async def api_docs(request: Request) -> HTMLResponse:
 
     Returns
     -------
-    HTMLResponse
-        A rendered HTML page displaying API documentation.
+    Response
+        The API documentation page, or 304 if the client's copy is current.
+    """
+    return api_page().response(request)
+
+
+@app.get("/assets/{hashed_path:path}")
+async def assets(request: Request, hashed_path: str) -> Response:
+    """
+    Serve a static file by its content-hashed name, see `server.assets.asset_url`.
+
+    The name changes whenever the content does, so responses can be cached forever.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming HTTP request.
+    hashed_path : str
+        The hashed path relative to `static/`.
+
+    Returns
+    -------
+    Response
+        The precompressed file with immutable cache headers.
+
+    Raises
+    ------
+    HTTPException
+        If the name is not in the asset manifest.
     """
-    return templates.TemplateResponse("api.jinja", {"request": request})
+    asset = await asyncio.to_thread(load_asset, hashed_path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return asset.response(request, cache_control=ASSET_CACHE_CONTROL)
 
 
 @app.get("/robots.txt")
@@ -121,5 +182,8 @@ async def robots() -> FileResponse:
 
 # Include routers for modular endpoints
 app.include_router(index)
+app.include_router(chat)
 app.include_router(download)
+app.include_router(papers)
+app.include_router(diagrams)
 app.include_router(dynamic)
@@ -0,0 +1,62 @@
+""" Process-local metrics exposed at `/metrics` in the Prometheus text format. """
+
+import bisect
+import threading
+from typing import Iterable
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed bucket bounds, as Prometheus expects.
+
+    Parameters
+    ----------
+    name : str
+        Metric name.
+    description : str
+        Help text.
+    buckets : Iterable[float]
+        Upper bounds of the buckets, in increasing order; `+Inf` is implied.
+    """
+
+    def __init__(self, name: str, description: str, buckets: Iterable[float]):
+        self.name = name
+        self.description = description
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    def render(self) -> str:
+        """The histogram in the Prometheus text exposition format."""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets + [float("inf")], counts):
+            cumulative += count
+            label = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f'{self.name}_bucket{{le="{label}"}} {cumulative}')
+        lines += [f"{self.name}_sum {total:g}", f"{self.name}_count {cumulative}"]
+        return "\n".join(lines)
+
+
+_registry: dict[str, Histogram] = {}
+
+
+def histogram(name: str, description: str, buckets: Iterable[float]) -> Histogram:
+    """Get or create a registered histogram."""
+    if name not in _registry:
+        _registry[name] = Histogram(name, description, buckets)
+    return _registry[name]
+
+
+def render_metrics() -> str:
+    """All registered metrics of this process, in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in _registry.values()) + "\n"
@@ -0,0 +1,87 @@
+""" Pages rendered once per process instead of on every request. """
+
+import html
+from dataclasses import dataclass
+from functools import lru_cache
+from urllib.parse import quote
+
+from server.assets import preload_assets
+from server.compression import PrecompressedBody
+from server.server_config import CATALOG_SHARDS, DEFAULT_SHARDS, EXAMPLE_REPOS, SITE_URL, templates
+
+HTML_MEDIA_TYPE = "text/html; charset=utf-8"
+
+HOME_CONTEXT = {
+    "examples": EXAMPLE_REPOS,
+    "shards": CATALOG_SHARDS,
+    "default_shards": DEFAULT_SHARDS,
+    "default_file_size": 243,
+}
+
+# Placeholders rendered into the repository page and replaced per path
+_URL_MARKER = "forky-prerender-url-marker"
+_PATH_MARKER = "forky-prerender-path-marker"
+
+
+@dataclass(frozen=True)
+class _PageRequest:
+    """The part of `Request` the templates use, pointing at the canonical URL."""
+
+    url: str
+
+
+def _render(template: str, path: str, **context) -> str:
+    return templates.get_template(template).render(request=_PageRequest(f"{SITE_URL}{path}"), **context)
+
+
+@lru_cache(maxsize=1)
+def home_page() -> PrecompressedBody:
+    """The home page, rendered and compressed once."""
+    return PrecompressedBody.build(_render("index.jinja", "/", **HOME_CONTEXT).encode("utf-8"), HTML_MEDIA_TYPE)
+
+
+@lru_cache(maxsize=1)
+def api_page() -> PrecompressedBody:
+    """The API documentation page, rendered and compressed once."""
+    return PrecompressedBody.build(_render("api.jinja", "/api").encode("utf-8"), HTML_MEDIA_TYPE)
+
+
+@lru_cache(maxsize=1)
+def _repository_template() -> str:
+    return templates.get_template("git.jinja").render(
+        request=_PageRequest(_URL_MARKER),
+        repo_url=_PATH_MARKER,
+        loading=True,
+        default_file_size=243,
+    )
+
+
+@lru_cache(maxsize=1024)
+def repository_page(full_path: str) -> PrecompressedBody:
+    """
+    The page of a repository path such as `/owner/repo`.
+
+    The template is rendered once with placeholders; each path only substitutes its own
+    URL, and the most requested paths are kept ready to serve.
+
+    Parameters
+    ----------
+    full_path : str
+        The requested path without the leading slash.
+
+    Returns
+    -------
+    PrecompressedBody
+        The page with a gzip variant.
+    """
+    url = f"{SITE_URL}/{quote(full_path, safe='/:@!$&()*+,;=-._~')}"
+    page = _repository_template().replace(_URL_MARKER, html.escape(url)).replace(_PATH_MARKER, html.escape(full_path))
+    return PrecompressedBody.build(page.encode("utf-8"), HTML_MEDIA_TYPE, best=False)
+
+
+def prerender() -> None:
+    """Render the invariant pages and compress the static assets, e.g. at startup."""
+    home_page()
+    api_page()
+    _repository_template()
+    preload_assets()
@@ -0,0 +1,317 @@
+""" Anonymized log of paper searches and precomputed results for the most frequent ones. """
+
+import asyncio
+import fcntl
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from config import CACHE_BASE_PATH
+from server.ai.content_provider import get_gemini_client
+from server.ai.gemini_client import catalog_version
+from server.server_config import (
+    CATALOG_SHARDS,
+    DEFAULT_SHARDS,
+    QUERY_AGGREGATE_INTERVAL,
+    QUERY_LOG_BACKUPS,
+    QUERY_LOG_MAX_BYTES,
+    QUERY_LOG_WINDOW,
+    TOP_QUERIES,
+)
+
+QUERY_LOG_DIR = CACHE_BASE_PATH / "query_log"
+QUERY_LOG_FILE = QUERY_LOG_DIR / "queries.jsonl"
+PRECOMPUTED_FILE = QUERY_LOG_DIR / "precomputed.json"
+
+# Buffered queries are written at least this often, in seconds
+FLUSH_INTERVAL = 2.0
+MAX_BUFFERED = 256
+MAX_QUERY_CHARS = 200
+# How often workers check for a new catalog or new precomputed results, in seconds
+CHECK_INTERVAL = 60.0
+PRECOMPUTE_CONCURRENCY = 2
+
+_SHARD_IDS = {shard["id"] for shard in CATALOG_SHARDS}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query and collapse its whitespace, so equivalent searches are counted together."""
+    return " ".join(query.lower().split())[:MAX_QUERY_CHARS]
+
+
+def normalize_venues(venues: Optional[list[str]]) -> tuple[str, ...]:
+    """Sorted known shard ids of a search, with the defaults for an empty selection."""
+    selected = sorted({venue for venue in venues or [] if venue in _SHARD_IDS})
+    return tuple(selected or sorted(DEFAULT_SHARDS))
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock shared by all worker processes."""
+    with open(path.with_suffix(path.suffix + ".lock"), "a", encoding="utf-8") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class QueryLog:
+    """
+    Append-only JSONL log of searches with buffered writes and size-based rotation.
+
+    Records hold the normalized query, the selected venues and a timestamp rounded to
+    the minute; nothing identifies the client. `record` only appends to an in-memory
+    buffer, which `run` writes from a thread every `FLUSH_INTERVAL` seconds. Writes
+    and rotation take a file lock, so all workers can share the log.
+
+    Parameters
+    ----------
+    path : Path
+        The current log file; rotated files get the suffixes `.1`, `.2`, ...
+    max_bytes : int
+        Size above which the log is rotated.
+    backups : int
+        Number of rotated files kept.
+    """
+
+    def __init__(self, path: Path = QUERY_LOG_FILE, max_bytes: int = QUERY_LOG_MAX_BYTES, backups: int = QUERY_LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._buffer: list[str] = []
+        self._flushed = asyncio.Event()
+
+    def record(self, query: str, venues: Optional[list[str]] = None) -> None:
+        """
+        Buffer one search.
+
+        Parameters
+        ----------
+        query : str
+            The search query.
+        venues : Optional[list[str]]
+            The requested shard ids.
+        """
+        query = normalize_query(query)
+        if not query:
+            return
+        minute = int(time.time()) // 60 * 60
+        self._buffer.append(json.dumps({"t": minute, "q": query, "v": list(normalize_venues(venues))}) + "\n")
+        if len(self._buffer) >= MAX_BUFFERED:
+            self._flushed.set()
+
+    async def run(self) -> None:
+        """Flush the buffer periodically until cancelled."""
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._flushed.wait(), timeout=FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._flushed.clear()
+                await self.flush()
+        finally:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write the buffered records."""
+        if not self._buffer:
+            return
+        lines, self._buffer = "".join(self._buffer), []
+        try:
+            await asyncio.to_thread(self._write, lines)
+        except OSError as e:
+            print(f"Error writing query log: {e}")
+
+    def _write(self, lines: str) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with _locked(self.path):
+            try:
+                size = self.path.stat().st_size
+            except FileNotFoundError:
+                size = 0
+            if size and size + len(lines) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as log:
+                log.write(lines)
+
+    def _rotate(self) -> None:
+        for index in range(self.backups, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index - 1}") if index > 1 else self.path
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index}"))
+
+    def iter_records(self) -> Iterator[dict]:
+        """Yield the logged searches, oldest file first."""
+        files = [self.path.with_name(f"{self.path.name}.{index}") for index in range(self.backups, 0, -1)]
+        for file in files + [self.path]:
+            try:
+                with open(file, encoding="utf-8") as log:
+                    for line in log:
+                        try:
+                            yield json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+            except FileNotFoundError:
+                continue
+
+    def top_queries(self, limit: int = TOP_QUERIES, window: float = QUERY_LOG_WINDOW) -> list[tuple[str, tuple[str, ...], int]]:
+        """
+        Count the searches of the last `window` seconds.
+
+        Returns
+        -------
+        list[tuple[str, tuple[str, ...], int]]
+            `(query, venues, count)` for the `limit` most frequent searches.
+        """
+        since = time.time() - window
+        counts = Counter(
+            (record["q"], tuple(record["v"]))
+            for record in self.iter_records()
+            if record.get("t", 0) >= since and record.get("q")
+        )
+        return [(query, venues, count) for (query, venues), count in counts.most_common(limit)]
+
+
+class PrecomputedResults:
+    """
+    Ranked results of the most frequent searches, shared by all workers.
+
+    The worker holding the aggregation lock rebuilds the file from the query log every
+    `QUERY_AGGREGATE_INTERVAL` seconds and as soon as the catalog changes. Every worker
+    reloads the file when it changes. Results computed against an older catalog stop being
+    served as soon as the change is noticed, within `CHECK_INTERVAL` seconds.
+
+    Parameters
+    ----------
+    path : Path
+        The JSON file holding the results.
+    """
+
+    def __init__(self, path: Path = PRECOMPUTED_FILE):
+        self.path = path
+        self.version: Optional[str] = None
+        self._entries: dict[tuple[str, tuple[str, ...]], list[dict]] = {}
+        self._queries: list[str] = []
+        self._mtime: Optional[int] = None
+        self._current_version: Optional[str] = None
+        self._last_refresh = 0.0
+        self._leader_lock = None
+
+    def lookup(self, query: str, venues: Optional[list[str]] = None) -> Optional[list[dict]]:
+        """
+        Precomputed results of a search, if it is one of the most frequent.
+
+        Parameters
+        ----------
+        query : str
+            The search query.
+        venues : Optional[list[str]]
+            The requested shard ids.
+
+        Returns
+        -------
+        Optional[list[dict]]
+            The ranked papers, or None if the search has to be run.
+        """
+        if self.version is None or self.version != self._current_version:
+            return None
+        return self._entries.get((normalize_query(query), normalize_venues(venues)))
+
+    def queries(self) -> list[str]:
+        """The precomputed queries, most frequent first."""
+        return list(self._queries)
+
+    def reload(self) -> None:
+        """Load the results file if another worker rewrote it."""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading precomputed search results: {e}")
+            return
+        self._mtime = mtime
+        self._apply(data)
+
+    def _apply(self, data: dict) -> None:
+        self.version = data.get("version")
+        self._entries = {(entry["query"], tuple(entry["venues"])): entry["papers"] for entry in data.get("entries", [])}
+        self._queries = [entry["query"] for entry in data.get("entries", [])]
+
+    def _is_leader(self) -> bool:
+        """Whether this worker holds the aggregation lock, taking it if it is free."""
+        if self._leader_lock is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock = open(self.path.with_suffix(".lock"), "a", encoding="utf-8")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return False
+        self._leader_lock = lock
+        return True
+
+    async def refresh(self, query_log: QueryLog, version: str) -> None:
+        """
+        Recompute the results of the most frequent searches and publish them.
+
+        Parameters
+        ----------
+        query_log : QueryLog
+            The log to aggregate.
+        version : str
+            The current catalog version.
+        """
+        top = await asyncio.to_thread(query_log.top_queries)
+        gemini_client = get_gemini_client()
+        semaphore = asyncio.Semaphore(PRECOMPUTE_CONCURRENCY)
+
+        async def compute(query: str, venues: tuple[str, ...], count: int) -> Optional[dict]:
+            async with semaphore:
+                result = await gemini_client.search_cvpr_papers(query, list(venues), use_cache=False)
+            # Unranked fallback results are not worth serving for the whole aggregation interval
+            if not result.papers or result.degraded:
+                return None
+            return {"query": query, "venues": list(venues), "count": count, "papers": result.papers}
+
+        entries = [entry for entry in await asyncio.gather(*(compute(*item) for item in top)) if entry]
+        data = {"version": version, "generated_at": time.time(), "entries": entries}
+        await asyncio.to_thread(self._save, data)
+        self._apply(data)
+        print(f"Precomputed results for {len(entries)} of the top {len(top)} searches")
+
+    def _save(self, data: dict) -> None:
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self._mtime = self.path.stat().st_mtime_ns
+
+    async def run(self, query_log: QueryLog) -> None:
+        """Keep the results current until cancelled."""
+        while True:
+            try:
+                self._current_version = await asyncio.to_thread(catalog_version)
+                await asyncio.to_thread(self.reload)
+
+                due = time.time() - self._last_refresh >= QUERY_AGGREGATE_INTERVAL
+                if (due or self.version != self._current_version) and self._is_leader():
+                    self._last_refresh = time.time()
+                    await self.refresh(query_log, self._current_version)
+            except Exception as e:
+                print(f"Error precomputing search results: {e}")
+            await asyncio.sleep(CHECK_INTERVAL)
+
+
+query_log = QueryLog()
+precomputed_results = PrecomputedResults()
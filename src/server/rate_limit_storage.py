@@ -0,0 +1,107 @@
+""" SQLite storage for the rate limiter, shared by all worker processes on a host. """
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from limits.storage import Storage
+
+# Expired counters are purged once every this many increments
+PURGE_EVERY = 1_000
+
+
+class SQLiteStorage(Storage):
+    """
+    Fixed-window rate-limit counters stored in a SQLite database.
+
+    The in-memory storage of `limits` keeps separate counters in every uvicorn worker,
+    so with N workers a client gets N times its limit. Counters kept in one WAL-mode
+    SQLite file are shared by all workers of the instance without an external service.
+    Registered for URIs of the form `sqlite:///absolute/path/to/file.sqlite3`.
+
+    Parameters
+    ----------
+    uri : str
+        The storage URI.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        path = Path(urlparse(uri).path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._increments = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS counters (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+
+    @property
+    def base_exceptions(self) -> type[Exception]:
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        """Increment a counter, starting a new window if the current one has expired."""
+        now = time.time()
+        with self._lock:
+            (value,) = self._conn.execute(
+                """
+                INSERT INTO counters VALUES (:key, :amount, :expires_at)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = CASE WHEN expires_at <= :now THEN :amount ELSE value + :amount END,
+                    expires_at = CASE WHEN expires_at <= :now OR :elastic THEN :expires_at ELSE expires_at END
+                RETURNING value
+                """,
+                {"key": key, "amount": amount, "expires_at": now + expiry, "now": now, "elastic": elastic_expiry},
+            ).fetchone()
+
+            self._increments += 1
+            if self._increments % PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+        return value
+
+    def get(self, key: str) -> int:
+        """Current value of a counter, 0 if it does not exist or has expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM counters WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        """Time at which the current window of a counter ends."""
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        """Whether the database can be queried."""
+        try:
+            with self._lock:
+                self._conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        """Remove all counters and return how many there were."""
+        with self._lock:
+            return self._conn.execute("DELETE FROM counters").rowcount
+
+    def clear(self, key: str) -> None:
+        """Remove one counter."""
+        with self._lock:
+            self._conn.execute("DELETE FROM counters WHERE key = ?", (key,))
@@ -0,0 +1,339 @@
+""" Expiry scheduler that removes cached repository folders under TMP_BASE_PATH. """
+
+import asyncio
+import fcntl
+import heapq
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from config import CACHE_BASE_PATH, TMP_BASE_PATH
+from server.digest_index import digest_index
+from server.server_config import DELETE_REPO_AFTER, REPO_DISK_QUOTA, REPO_SCAN_INTERVAL
+
+HISTORY_FILE = Path("history.txt")
+# Held by the one worker that runs the scheduler
+LEADER_LOCK_FILE = CACHE_BASE_PATH / "repo_cleanup.lock"
+# One empty file per repository folder changed since it was measured, see `mark_changed`
+CHANGED_DIR = CACHE_BASE_PATH / "repo_cleanup_changed"
+# Number of folders deleted at the same time
+DELETE_WORKERS = 4
+
+
+def _folder_size(folder: Path) -> int:
+    """Total size of the files below a folder, in bytes."""
+    total = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name), follow_symlinks=False).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _measure(folder: Path) -> tuple[int, bool]:
+    """
+    Size of a repository folder and whether it is complete.
+
+    A folder is complete once its `.txt` digest exists, which is written after the clone.
+    The digest is looked for before the folder is walked, so the size of a complete
+    folder includes the whole clone.
+    """
+    try:
+        complete = any(folder.glob("*.txt"))
+    except OSError:
+        complete = False
+    return _folder_size(folder), complete
+
+
+def mark_changed(folder: Path) -> None:
+    """
+    Record that files were added to a complete repository folder, e.g. compressed copies
+    of its digest, so the scheduler measures it again. Safe to call from any worker.
+
+    Parameters
+    ----------
+    folder : Path
+        The repository folder under `TMP_BASE_PATH`.
+    """
+    try:
+        CHANGED_DIR.mkdir(parents=True, exist_ok=True)
+        (CHANGED_DIR / folder.name).touch()
+    except OSError as e:
+        print(f"Error marking {folder} as changed: {e}")
+
+
+def _last_access(stat: os.stat_result) -> float:
+    """
+    Last time a folder was used.
+
+    Downloads touch the digest folder, which updates its modification time. `st_atime`
+    is not used: it depends on mount options and is bumped by the scheduler's own scans.
+    """
+    return stat.st_mtime
+
+
+def _delete_folder(folder: Path) -> Optional[str]:
+    """
+    Delete a repository folder and return its repository for the history.
+
+    The repository is read from the first `.txt` file in the folder, assuming the
+    filename format "owner-repository.txt".
+    """
+    repo_url = None
+    try:
+        txt_files = sorted(folder.glob("*.txt"))
+        if txt_files and "-" in (filename := txt_files[0].stem):
+            owner, repo = filename.split("-", 1)
+            repo_url = f"{owner}/{repo}"
+    except OSError as e:
+        print(f"Error logging repository URL for {folder}: {e}")
+
+    try:
+        shutil.rmtree(folder)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error deleting {folder}: {e}")
+    return repo_url
+
+
+class ExpiryScheduler:
+    """
+    Delete repository folders once they expire or the cache exceeds its disk quota.
+
+    Folders are kept in a min-heap ordered by expiry time, `DELETE_REPO_AFTER` after the
+    `st_ctime` seen when the folder was discovered, so the scheduler sleeps until the next
+    folder is due instead of scanning every folder periodically. The expiry time is not
+    read again: downloads touch a folder and compressed copies are written into it, which
+    both update its `st_ctime`, and must not postpone its expiry. New folders are discovered by listing `TMP_BASE_PATH` only
+    when its modification time changes; producers can also call `notify` directly.
+    Deletions run in a thread pool and the repositories they remove are appended to
+    `history.txt` in one write per batch. On top of expiry, the least recently accessed
+    folders are evicted while the total size is above `disk_quota`.
+
+    Folder sizes are measured again before every quota check when they may have grown.
+    Folders without a digest yet are still being cloned and are measured on every pass.
+    Complete folders are measured again only after a producer calls `mark_changed`, so
+    idle folders cost nothing between quota checks.
+
+    With several workers, only the one holding an exclusive lock on `LEADER_LOCK_FILE`
+    runs the scheduler; the others wait to take over should that worker exit.
+
+    Parameters
+    ----------
+    base_path : Path
+        The directory holding one folder per repository.
+    ttl : float
+        Seconds after which a folder expires.
+    disk_quota : int
+        Maximum total size of the folders in bytes.
+    scan_interval : float
+        Seconds between checks of `base_path` for new folders.
+    """
+
+    def __init__(
+        self,
+        base_path: Path = TMP_BASE_PATH,
+        ttl: float = DELETE_REPO_AFTER,
+        disk_quota: int = REPO_DISK_QUOTA,
+        scan_interval: float = REPO_SCAN_INTERVAL,
+    ):
+        self.base_path = base_path
+        self.ttl = ttl
+        self.disk_quota = disk_quota
+        self.scan_interval = scan_interval
+        self._heap: list[tuple[float, str]] = []
+        self._sizes: dict[str, int] = {}
+        self._total_size = 0
+        self._incomplete: set[str] = set()  # Folders whose clone has not finished
+        self._base_mtime: Optional[int] = None
+        self._history: list[str] = []
+        self._leader_lock = None
+        self._wakeup = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=DELETE_WORKERS, thread_name_prefix="repo-cleanup")
+
+    def notify(self) -> None:
+        """Wake the scheduler so a newly created folder is picked up right away."""
+        if self._leader_lock is None:
+            return  # Another worker runs the scheduler
+        self._base_mtime = None
+        self._wakeup.set()
+
+    def _is_leader(self) -> bool:
+        """Whether this worker holds the scheduler lock, taking it if it is free."""
+        if self._leader_lock is not None:
+            return True
+        LEADER_LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+        lock = open(LEADER_LOCK_FILE, "a", encoding="utf-8")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return False
+        self._leader_lock = lock
+        return True
+
+    async def run(self) -> None:
+        """Run the scheduler until cancelled, in the worker that holds the scheduler lock."""
+        while not self._is_leader():
+            await asyncio.sleep(self.scan_interval)
+        try:
+            while True:
+                try:
+                    await self._discover()
+                    await self._expire_due()
+                    await self._enforce_quota()
+                    await self._flush_history()
+                except Exception as e:
+                    print(f"Error in repository cleanup: {e}")
+
+                delay = self.scan_interval
+                if self._heap:
+                    delay = min(delay, max(self._heap[0][0] - time.time(), 0))
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self._flush_history()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _discover(self) -> None:
+        """Start tracking folders that appeared since the last listing."""
+        try:
+            mtime = self.base_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._base_mtime:
+            return
+        self._base_mtime = mtime
+
+        known = set(self._sizes)
+        present, new_folders = await self._in_thread(self._list_new_folders, known)
+        for name, ctime, size, complete in new_folders:
+            self._sizes[name] = size
+            self._total_size += size
+            if not complete:
+                self._incomplete.add(name)
+            heapq.heappush(self._heap, (ctime + self.ttl, name))
+
+        # Forget folders removed by someone else
+        for name in known - present:
+            self._untrack(name)
+
+    def _list_new_folders(self, known: set[str]) -> tuple[set[str], list[tuple[str, float, int, bool]]]:
+        present, new_folders = set(), []
+        with os.scandir(self.base_path) as entries:
+            for entry in entries:
+                present.add(entry.name)
+                if entry.name in known or not entry.is_dir(follow_symlinks=False):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                new_folders.append((entry.name, stat.st_ctime, *_measure(Path(entry.path))))
+        return present, new_folders
+
+    async def _expire_due(self) -> None:
+        """Delete every folder whose expiry time has passed."""
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, name = heapq.heappop(self._heap)
+            if name in self._sizes:
+                due.append(name)
+        await self._delete(due)
+
+    async def _enforce_quota(self) -> None:
+        """Evict the least recently accessed folders while over the disk quota."""
+        await self._remeasure()
+        if self._total_size <= self.disk_quota:
+            return
+
+        names = list(self._sizes)
+        access_times = await self._in_thread(self._access_times, names)
+        victims, excess = [], self._total_size - self.disk_quota
+        for name in sorted(access_times, key=access_times.get):
+            if excess <= 0:
+                break
+            victims.append(name)
+            excess -= self._sizes[name]
+        await self._delete(victims)
+
+    async def _remeasure(self) -> None:
+        """Update the sizes of folders still being cloned and of those marked as changed."""
+        measured = await self._in_thread(self._measure_changed, set(self._incomplete))
+        for name, (size, complete) in measured.items():
+            if name not in self._sizes:
+                continue  # Deleted while it was measured, or not tracked yet
+            self._total_size += size - self._sizes[name]
+            self._sizes[name] = size
+            if complete:
+                self._incomplete.discard(name)
+
+    def _measure_changed(self, incomplete: set[str]) -> dict[str, tuple[int, bool]]:
+        names = set(incomplete)
+        try:
+            with os.scandir(CHANGED_DIR) as entries:
+                for entry in entries:
+                    # Removed before measuring, so a change made meanwhile is seen next time
+                    os.unlink(entry.path)
+                    names.add(entry.name)
+        except FileNotFoundError:
+            pass
+        sizes = {}
+        for name in names:
+            folder = self.base_path / name
+            if folder.is_dir():
+                sizes[name] = _measure(folder)
+        return sizes
+
+    def _access_times(self, names: list[str]) -> dict[str, float]:
+        access_times = {}
+        for name in names:
+            try:
+                access_times[name] = _last_access((self.base_path / name).stat())
+            except FileNotFoundError:
+                access_times[name] = 0.0
+        return access_times
+
+    async def _delete(self, names: list[str]) -> None:
+        if not names:
+            return
+        for name in names:
+            digest_index.forget(name)
+        repo_urls = await asyncio.gather(*(self._in_thread(_delete_folder, self.base_path / name) for name in names))
+        for name in names:
+            self._untrack(name)
+        self._history.extend(url for url in repo_urls if url)
+
+    def _untrack(self, name: str) -> None:
+        # The heap entry is skipped lazily when it is popped
+        self._total_size -= self._sizes.pop(name, 0)
+        self._incomplete.discard(name)
+        digest_index.forget(name)
+
+    async def _flush_history(self) -> None:
+        """Append the repositories deleted since the last flush to the history file."""
+        if not self._history:
+            return
+        lines, self._history = "".join(f"{url}\n" for url in self._history), []
+        try:
+            await asyncio.to_thread(self._append_history, lines)
+        except Exception as e:
+            print(f"Error writing {HISTORY_FILE}: {e}")
+
+    @staticmethod
+    def _append_history(lines: str) -> None:
+        with open(HISTORY_FILE, mode="a", encoding="utf-8") as history:
+            history.write(lines)
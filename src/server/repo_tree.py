@@ -0,0 +1,172 @@
+""" Single-pass parsing of repository trees and their reduction to a diagram-sized graph. """
+
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+from server.server_config import DIAGRAM_MAX_CHILDREN, DIAGRAM_MAX_NODES
+
+# Version of the graph JSON read by static/js/graph.js; part of the diagram cache key
+GRAPH_FORMAT = 1
+
+_ENTRY = re.compile(r"[├└]── ")
+# Width of one level of indentation, "│   " or "    "
+_INDENT = 4
+
+
+@dataclass
+class TreeNode:
+    """A file or directory of a repository tree."""
+
+    name: str
+    is_dir: bool
+    children: list["TreeNode"] = field(default_factory=list)
+    files: int = 0  # Number of files at or below this node
+
+
+def parse_tree(tree: str) -> Optional[TreeNode]:
+    """
+    Parse the directory structure of a digest in a single pass.
+
+    The depth of an entry is the column of its `├──` or `└──` connector. The directories
+    on the path to the current entry are kept on a stack, so the parent of every entry
+    is known without looking back at earlier lines.
+
+    Parameters
+    ----------
+    tree : str
+        The directory structure, as written by gitingest.
+
+    Returns
+    -------
+    Optional[TreeNode]
+        The repository directory, or None if the tree has no entries. Several top-level
+        entries are grouped under an unnamed root.
+    """
+    root = TreeNode("", is_dir=True)
+    stack = [root]
+    nodes = []
+    for line in tree.splitlines():
+        entry = _ENTRY.search(line)
+        if entry is None:
+            continue
+        name = line[entry.end():].rstrip()
+        node = TreeNode(name.rstrip("/"), is_dir=name.endswith("/"))
+        # stack[depth] is the parent of an entry at `depth`; deeper directories are finished
+        del stack[entry.start() // _INDENT + 1:]
+        stack[-1].children.append(node)
+        if node.is_dir:
+            stack.append(node)
+        nodes.append(node)
+
+    if not nodes:
+        return None
+    # Children follow their parent, so walking backwards counts them first
+    for node in reversed(nodes):
+        node.files = sum(child.files for child in node.children) if node.is_dir else 1
+    root.files = sum(child.files for child in root.children)
+    if len(root.children) == 1 and root.children[0].is_dir:
+        return root.children[0]
+    return root
+
+
+def collapse_tree(
+    root: TreeNode,
+    max_nodes: int = DIAGRAM_MAX_NODES,
+    max_children: int = DIAGRAM_MAX_CHILDREN,
+) -> list[dict]:
+    """
+    Reduce a repository tree to at most `max_nodes` nodes for its diagram.
+
+    Directories are expanded breadth-first, so the top levels are always shown. A
+    directory with more than `max_children` entries keeps its largest ones, and the rest
+    become one aggregate node. Directories that no longer fit the budget are shown
+    collapsed, labelled with the number of files below them.
+
+    Parameters
+    ----------
+    root : TreeNode
+        The parsed tree.
+    max_nodes : int
+        Node budget of the diagram.
+    max_children : int
+        Entries shown per directory, including its aggregate node.
+
+    Returns
+    -------
+    list[dict]
+        The nodes in breadth-first order, each with its `id` (the index in the list),
+        `label`, `kind` ("dir", "file" or "more" for an aggregate), `level`, `parent` id
+        and number of `files`.
+    """
+    nodes = [_graph_node(root, 0, 0, None)]
+    queue = deque([(root, 0)])
+    while queue:
+        directory, node_id = queue.popleft()
+        children, hidden = directory.children, []
+        if len(children) > max_children:
+            # Largest first; the sort is stable, so equal entries keep their tree order
+            ranked = sorted(range(len(children)), key=lambda index: -children[index].files)
+            shown = set(ranked[:max_children - 1])
+            hidden = [child for index, child in enumerate(children) if index not in shown]
+            children = [child for index, child in enumerate(children) if index in shown]
+        if len(nodes) + len(children) + bool(hidden) > max_nodes:
+            nodes[node_id]["label"] = f"{directory.name}/ ({directory.files} files)"
+            continue
+
+        level = nodes[node_id]["level"] + 1
+        for child in children:
+            nodes.append(_graph_node(child, len(nodes), level, node_id))
+            if child.is_dir and child.children:
+                queue.append((child, len(nodes) - 1))
+        if hidden:
+            files = sum(child.files for child in hidden)
+            nodes.append({
+                "id": len(nodes),
+                "label": f"{len(hidden)} more ({files} files)",
+                "kind": "more",
+                "level": level,
+                "parent": node_id,
+                "files": files,
+            })
+    return nodes
+
+
+def _graph_node(node: TreeNode, node_id: int, level: int, parent: Optional[int]) -> dict:
+    return {
+        "id": node_id,
+        "label": f"{node.name}/" if node.is_dir else node.name,
+        "kind": "dir" if node.is_dir else "file",
+        "level": level,
+        "parent": parent,
+        "files": node.files,
+    }
+
+
+def overview_graph(tree: str) -> Optional[dict]:
+    """
+    The overview diagram of a repository as a compact graph.
+
+    Parameters
+    ----------
+    tree : str
+        The directory structure, as written by gitingest.
+
+    Returns
+    -------
+    Optional[dict]
+        The graph, or None if the tree has no entries. `nodes` are `[label, kind, level,
+        files]` rows (see `collapse_tree`) indexed by their position, `edges` are
+        `[parent, child]` pairs of node indices and `levels` is the depth of the diagram.
+    """
+    root = parse_tree(tree)
+    if root is None:
+        return None
+    nodes = collapse_tree(root)
+    return {
+        "version": GRAPH_FORMAT,
+        "levels": nodes[-1]["level"] + 1,
+        "nodes": [[node["label"], node["kind"], node["level"], node["files"]] for node in nodes],
+        "edges": [[node["parent"], node["id"]] for node in nodes if node["parent"] is not None],
+    }
@@ -1,7 +1,10 @@
 """ This module contains the routers for the FastAPI application. """
 
+from server.routers.chat import router as chat
+from server.routers.diagrams import router as diagrams
 from server.routers.download import router as download
 from server.routers.dynamic import router as dynamic
 from server.routers.index import router as index
+from server.routers.papers import router as papers
 
-__all__ = ["download", "dynamic", "index"]
+__all__ = ["chat", "diagrams", "download", "dynamic", "index", "papers"]
@@ -0,0 +1,154 @@
+""" This module defines the FastAPI router for chatting about an analyzed repository. """
+
+import asyncio
+import json
+from pathlib import Path
+from typing import AsyncIterator, Union
+
+from fastapi import APIRouter, Form, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from server.ai.chat_sessions import ChatContext, ChatSession, ChatSessionStore, SharedChatSessionStore
+
+from server.ai.content_provider import get_gemini_client
+from server.digest_index import digest_index
+from server.server_utils import limiter
+
+router = APIRouter()
+
+
+@router.post("/chat/session", response_class=JSONResponse)
+@limiter.limit("10/minute")
+async def create_chat_session(
+    request: Request,
+    digest_id: str = Form(...),
+    repo_summary: str = Form(""),
+) -> JSONResponse:
+    """
+    Start a chat session about a repository whose digest the server holds.
+
+    The context is read from the digest file served by `/download/{digest_id}`, so large
+    digests are never uploaded by the client.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request object
+    digest_id : str
+        The id of the digest
+    repo_summary : str
+        The repository summary
+
+    Returns
+    -------
+    JSONResponse
+        A JSON response with the `session_id` to send with every chat message, or a 404
+        with `code` set to "digest_expired" if the digest was removed
+    """
+    gemini_client = get_gemini_client()
+    path = digest_index.resolve(digest_id)
+    try:
+        if path is None:
+            raise FileNotFoundError(digest_id)
+        content = await asyncio.to_thread(_read_digest, path, gemini_client.chat_sessions.max_bytes)
+        session = await asyncio.to_thread(gemini_client.chat_sessions.create, content, repo_summary)
+    except FileNotFoundError:
+        return JSONResponse(
+            content={"error": "The repository digest expired, please analyze it again", "code": "digest_expired"},
+            status_code=404,
+        )
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=413)
+
+    return JSONResponse(content={"session_id": session.session_id, "digest_id": session.digest_id})
+
+
+def _read_digest(path: Path, max_bytes: int) -> str:
+    """Read a digest file, refusing files larger than the chat context cap."""
+    if path.stat().st_size > max_bytes:
+        raise ValueError("Repository context is too large for a chat session")
+    return path.read_text(encoding="utf-8", errors="replace")
+
+
+def _record_turn(
+    chat_sessions: Union[ChatSessionStore, SharedChatSessionStore], session: ChatSession, message: str, answer: str
+) -> None:
+    """Add a question and its answer to a session; the store may block on SQLite."""
+    chat_sessions.append(session, "user", message)
+    chat_sessions.append(session, "model", answer)
+
+
+def _sse(data: dict, event: str = "") -> str:
+    """Format one server-sent event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+async def _stream_answer(session: ChatSession, context: ChatContext, message: str) -> AsyncIterator[str]:
+    """Relay answer chunks as server-sent events and record the turn once it completes."""
+    gemini_client = get_gemini_client()
+    parts = []
+    try:
+        async for text in gemini_client.chat_stream(context, list(session.history), message):
+            parts.append(text)
+            yield _sse({"delta": text})
+    except Exception as e:
+        yield _sse({"error": str(e)}, event="error")
+        return
+
+    await asyncio.to_thread(_record_turn, gemini_client.chat_sessions, session, message, "".join(parts))
+    yield _sse({"format": "markdown"}, event="done")
+
+
+@router.post("/chat")
+@limiter.limit("30/minute")
+async def chat(
+    request: Request,
+    message: str = Form(...),
+    session_id: str = Form(""),
+):
+    """
+    Answer a chat message within an existing session.
+
+    Clients that accept `text/event-stream` receive the answer as server-sent events:
+    one `data: {"delta": ...}` event per generated chunk, then a `done` event (or an
+    `error` event). Other clients receive the complete answer as JSON.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request object
+    message : str
+        The user message
+    session_id : str
+        The session id returned by `/chat/session`
+
+    Returns
+    -------
+    StreamingResponse | JSONResponse
+        The streamed or complete Markdown answer, or a 404 with `code` set to
+        "session_expired" if the client has to start a new session
+    """
+    gemini_client = get_gemini_client()
+    found = await asyncio.to_thread(gemini_client.chat_sessions.get, session_id)
+    if found is None:
+        return JSONResponse(
+            content={"error": "Chat session expired", "code": "session_expired"},
+            status_code=404,
+        )
+    session, context = found
+
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _stream_answer(session, context, message),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    try:
+        response = await asyncio.to_thread(gemini_client.chat, context, list(session.history), message)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+    await asyncio.to_thread(_record_turn, gemini_client.chat_sessions, session, message, response)
+    return JSONResponse(content={"response": response, "format": "markdown"})
@@ -0,0 +1,42 @@
+""" This module defines the FastAPI router for the repository overview graphs. """
+
+import asyncio
+import re
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, Response
+
+from server.diagram_cache import diagram_cache
+
+router = APIRouter()
+
+# A graph id is a hash of the repository tree, so the graph behind it never changes
+DIAGRAM_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_DIAGRAM_ID = re.compile(r"[0-9a-f]{32}")
+
+
+@router.get("/diagrams/{diagram_id}")
+async def diagram(request: Request, diagram_id: str) -> Response:
+    """
+    Serve the overview graph of a repository, drawn in the browser by `static/js/graph.js`.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request object, used for content negotiation and conditional requests.
+    diagram_id : str
+        The id returned by the diagram stage of the analysis
+
+    Returns
+    -------
+    Response
+        The graph as JSON, 304 if the client's copy is current, or 404 if it is unknown or
+        was evicted from the cache
+    """
+    if not _DIAGRAM_ID.fullmatch(diagram_id):
+        return JSONResponse(content={"error": "Diagram not found"}, status_code=404)
+    body = await asyncio.to_thread(diagram_cache.body, diagram_id)
+    if body is None:
+        return JSONResponse(content={"error": "Diagram not found"}, status_code=404)
+    return body.response(request, DIAGRAM_CACHE_CONTROL)
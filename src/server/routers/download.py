@@ -1,61 +1,199 @@
 """ This module contains the FastAPI router for downloading a digest file. """
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Iterator, Optional
 
-from config import TMP_BASE_PATH
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from server.compression import accepted_encodings
+from server.digest_index import digest_index, precompress, precompressed_path, zstandard
+from server.repo_cleanup import mark_changed
 
 router = APIRouter()
 
+# Size of the blocks read from disk and sent to the client
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# Digests smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def _etag(path: Path) -> str:
+    stat = path.stat()
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into inclusive offsets.
+
+    Parameters
+    ----------
+    header : str
+        The `Range` header value.
+    size : int
+        The size of the representation.
+
+    Returns
+    -------
+    Optional[tuple[int, int]]
+        The first and last byte, or None if the header holds several ranges or cannot be
+        parsed, in which case the whole file is sent.
+
+    Raises
+    ------
+    HTTPException
+        With status 416 if the range lies outside the file.
+    """
+    match = _RANGE.fullmatch(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+
+    start, end = match.groups()
+    if start == "":
+        first, last = max(size - int(end), 0), size - 1
+    else:
+        first, last = int(start), min(int(end), size - 1) if end else size - 1
+
+    if first >= size or first > last:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return first, last
+
+
+def _read_file(path: Path, first: int, last: int) -> Iterator[bytes]:
+    """Yield the bytes `first..last` of a file in fixed-size blocks."""
+    remaining = last - first + 1
+    with path.open("rb") as f:
+        f.seek(first)
+        while remaining > 0:
+            block = f.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def _compress_file(path: Path, encoding: str) -> Iterator[bytes]:
+    """Yield a file compressed on the fly with gzip or zstd."""
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+
+    for block in _read_file(path, 0, path.stat().st_size - 1):
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
 
 @router.get("/download/{digest_id}")
-async def download_ingest(digest_id: str) -> Response:
+async def download_ingest(digest_id: str, request: Request, background_tasks: BackgroundTasks) -> Response:
     """
-    Download a .txt file associated with a given digest ID.
+    Download the `.txt` file associated with a given digest ID.
 
-    This function searches for a `.txt` file in a directory corresponding to the provided
-    digest ID. If a file is found, it is read and returned as a downloadable attachment.
-    If no `.txt` file is found, an error is raised.
+    The file is located through the digest index and streamed from disk in fixed-size
+    blocks, so memory use does not depend on the digest size. Responses carry an ETag
+    (`If-None-Match` yields 304) and support a single byte `Range`. When the client
+    accepts zstd or gzip, a precompressed copy is served if one exists next to the
+    digest; otherwise the digest is compressed on the fly and a precompressed copy is
+    written in the background for the next download.
 
     Parameters
     ----------
     digest_id : str
-        The unique identifier for the digest. It is used to find the corresponding directory
-        and locate the .txt file within that directory.
+        The unique identifier for the digest.
+    request : Request
+        The incoming request, used for the conditional, range and encoding headers.
+    background_tasks : BackgroundTasks
+        Used to precompress the digest after the response is sent.
 
     Returns
     -------
     Response
-        A FastAPI Response object containing the content of the found `.txt` file. The file is
-        sent with the appropriate media type (`text/plain`) and the correct `Content-Disposition`
-        header to prompt a file download.
+        A streamed `text/plain` attachment, a 206 partial response or a 304.
 
     Raises
     ------
     HTTPException
-        If the digest directory is not found or if no `.txt` file exists in the directory.
+        404 if the digest does not exist, 416 if the requested range is not satisfiable.
     """
-    directory = TMP_BASE_PATH / digest_id
+    path = digest_index.resolve(digest_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Digest not found")
 
     try:
-        if not directory.exists():
-            raise FileNotFoundError("Directory not found")
-
-        txt_files = [f for f in directory.iterdir() if f.suffix == ".txt"]
-        if not txt_files:
-            raise FileNotFoundError("No .txt file found")
-
+        etag = _etag(path)
     except FileNotFoundError as exc:
+        digest_index.forget(digest_id)
         raise HTTPException(status_code=404, detail="Digest not found") from exc
 
-    # Find the first .txt file in the directory
-    first_file = txt_files[0]
+    # Mark the digest directory as recently used for the disk quota; its expiry is unaffected
+    os.utime(path.parent)
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{path.name}"',
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+
+    accepted = accepted_encodings(request)
+    range_header = request.headers.get("range")
+    body, encoding, live = path, None, False
+    for candidate in ("zstd", "gzip"):
+        if candidate not in accepted:
+            continue
+        sidecar = precompressed_path(path, candidate)
+        if sidecar.is_file():
+            body, encoding = sidecar, candidate
+            break
+
+    if encoding is None and not range_header and path.stat().st_size >= MIN_COMPRESS_SIZE:
+        # Compressed on the fly; ranges would not be stable, so they are only offered on copies
+        if "zstd" in accepted and zstandard is not None:
+            encoding, live = "zstd", True
+        elif "gzip" in accepted:
+            encoding, live = "gzip", True
+
+    if encoding:
+        # Each representation gets its own validator; live output is only weakly equal to the copy
+        etag = f'{"W/" if live else ""}{etag[:-1]}-{encoding}"'
+        headers["Content-Encoding"] = encoding
+    headers["ETag"] = etag
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag.removeprefix("W/") in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    ):
+        return Response(status_code=304, headers=headers)
+
+    if live:
+        headers["Accept-Ranges"] = "none"
+        background_tasks.add_task(precompress, path)
+        # The compressed copies count towards the disk quota of the repository folders
+        background_tasks.add_task(mark_changed, path.parent)
+        return StreamingResponse(_compress_file(path, encoding), media_type="text/plain; charset=utf-8", headers=headers)
 
-    with first_file.open(encoding="utf-8") as f:
-        content = f.read()
+    size = body.stat().st_size
+    if range_header and request.headers.get("if-range", etag) == etag:
+        byte_range = _parse_range(range_header, size)
+        if byte_range:
+            first, last = byte_range
+            headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+            headers["Content-Length"] = str(last - first + 1)
+            return StreamingResponse(
+                _read_file(body, first, last),
+                status_code=206,
+                media_type="text/plain; charset=utf-8",
+                headers=headers,
+            )
 
-    return Response(
-        content=content,
-        media_type="text/plain",
-        headers={"Content-Disposition": f"attachment; filename={first_file.name}"},
-    )
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(_read_file(body, 0, size - 1), media_type="text/plain; charset=utf-8", headers=headers)
@@ -1,40 +1,32 @@
 """ This module defines the dynamic router for handling dynamic path requests. """
 
-from fastapi import APIRouter, Form, Request
-from fastapi.responses import HTMLResponse, JSONResponse
-from server.server_config import templates
-from server.server_utils import limiter
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+
+from server.prerender import repository_page
 
 router = APIRouter()
 
 
 @router.get("/{full_path:path}")
-async def catch_all(request: Request, full_path: str) -> HTMLResponse:
+async def catch_all(request: Request, full_path: str) -> Response:
     """
-    Render a page with a Git URL based on the provided path.
+    Serve the page of a Git URL based on the provided path.
 
-    This endpoint catches all GET requests with a dynamic path, constructs a Git URL
-    using the `full_path` parameter, and renders the `git.jinja` template with that URL.
+    This endpoint catches all GET requests with a dynamic path. `git.jinja` is rendered
+    once with placeholders and each path only substitutes its own URL, so requests do
+    not go through Jinja; the most requested paths are kept precompressed.
 
     Parameters
     ----------
     request : Request
-        The incoming request object, which provides context for rendering the response.
+        The incoming request object, used for content negotiation and conditional requests.
     full_path : str
         The full path extracted from the URL, which is used to build the Git URL.
 
     Returns
     -------
-    HTMLResponse
-        An HTML response containing the rendered template, with the Git URL
-        and other default parameters such as loading state and file size.
+    Response
+        The repository page in loading state, or 304 if the client's copy is current.
     """
-    return templates.TemplateResponse(
-        "git.jinja",
-        {
-            "request": request,
-            "repo_url": full_path,
-            "loading": True,
-            "default_file_size": 243,
-        },
-    )
+    return repository_page(full_path).response(request)
@@ -9,8 +9,9 @@ from dotenv import load_dotenv
 from fastapi import APIRouter, Body, Cookie, Form, Request, Response
 from fastapi.responses import HTMLResponse, JSONResponse
 
-from server.ai.content_provider import gemini_client
-from server.server_config import EXAMPLE_REPOS, templates
+from server.ai.content_provider import get_gemini_client
+from server.prerender import home_page
+from server.query_log import precomputed_results, query_log
 from server.server_utils import limiter
 
 router = APIRouter()
@@ -20,44 +21,37 @@ load_dotenv()
 
 
 @router.get("/", response_class=HTMLResponse)
-async def home(request: Request) -> HTMLResponse:
+async def home(request: Request) -> Response:
     """
-    Render the home page with example repositories and default parameters.
+    Serve the home page with example repositories and default parameters.
 
-    This endpoint serves the home page of the application, rendering the `index.jinja` template
-    and providing it with a list of example repositories and default file size values.
+    The page does not depend on the request, so it is rendered from `index.jinja` once
+    per process and served precompressed with an ETag.
 
     Parameters
     ----------
     request : Request
-        The incoming request object, which provides context for rendering the response.
+        The incoming request object, used for content negotiation and conditional requests.
 
     Returns
     -------
-    HTMLResponse
-        An HTML response containing the rendered home page template, with example repositories
-        and other default parameters such as file size.
+    Response
+        The pre-rendered home page, or 304 if the client's copy is current.
     """
-    return templates.TemplateResponse(
-        "index.jinja",
-        {
-            "request": request,
-            "examples": EXAMPLE_REPOS,
-            "default_file_size": 243,
-        },
-    )
+    return home_page().response(request)
 
 @router.post("/search_cvpr_papers", response_class=JSONResponse)
 @limiter.limit("10/minute")
 async def search_cvpr_papers(
     request: Request,
     query: str = Form(...),
+    venues: str = Form(""),
 ) -> JSONResponse:
     """
-    Search CVPR 2025 papers based on the provided query.
+    Search conference papers based on the provided query.
 
-    This endpoint searches through the CVPR 2025 papers list and returns the top 5 most relevant papers
-    that match the query.
+    This endpoint searches through the selected conference catalogs (CVPR 2025 by default)
+    and returns the top 5 most relevant papers that match the query.
 
     Parameters
     ----------
@@ -65,20 +59,27 @@ async def search_cvpr_papers(
         The incoming request object
     query : str
         The search query to find relevant papers
+    venues : str
+        Comma-separated catalog shard ids to search, e.g. "cvpr2025,iccv2023"
 
     Returns
     -------
     JSONResponse
-        A JSON response with the top 5 most relevant papers
+        A JSON response with the top 5 most relevant papers, and `degraded` set if they
+        could not be ranked in time and are in vector-search order without match reasons
     """
     try:
         # Get paper recommendations from Gemini
-        papers = await gemini_client.search_cvpr_papers(query)
+        shard_ids = [venue.strip() for venue in venues.split(",") if venue.strip()]
+        query_log.record(query, shard_ids)
 
-        if not papers:
-            return JSONResponse(content={"papers": []})
+        # The most frequent searches are answered from precomputed results
+        papers = precomputed_results.lookup(query, shard_ids)
+        if papers is not None:
+            return JSONResponse(content={"papers": papers, "degraded": False})
 
-        return JSONResponse(content={"papers": papers})
+        result = await get_gemini_client().search_cvpr_papers(query, shard_ids)
+        return JSONResponse(content={"papers": result.papers, "degraded": result.degraded})
 
     except Exception as e:
         return JSONResponse(
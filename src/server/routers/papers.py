@@ -0,0 +1,119 @@
+""" This module defines the FastAPI router for details of paper search results and the topic map. """
+
+import asyncio
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, Response
+
+from server.ai.content_provider import get_gemini_client
+from server.ai.topic_map import topic_map
+from server.query_log import normalize_query
+from server.server_utils import limiter
+
+router = APIRouter()
+
+# Match reasons depend only on the query and the paper, so browsers may keep them; the
+# endpoint is a GET with both in the URL, as browsers do not cache POST responses
+MATCH_REASON_CACHE_CONTROL = "private, max-age=3600"
+# The topic map only changes when the offline job is rerun; clients revalidate with the ETag
+TOPIC_MAP_CACHE_CONTROL = "public, max-age=3600"
+
+
+@router.get("/papers/match_reason", response_class=JSONResponse)
+@limiter.limit("30/minute")
+async def match_reason(request: Request, query: str, paper_id: str) -> JSONResponse:
+    """
+    Explain why a search result matches the query.
+
+    Searches only return ranked papers; the explanation is generated when a result is
+    expanded, and cached for every user asking the same query about the same paper. The
+    browser also keeps it for `MATCH_REASON_CACHE_CONTROL`, so reopening a result is free.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request object
+    query : str
+        The search query
+    paper_id : str
+        The `paper_id` of the search result, "<shard>:<document id>"
+
+    Returns
+    -------
+    JSONResponse
+        A JSON response with the `match_reason`, or a 404 if the paper is unknown
+    """
+    query = normalize_query(query)
+    shard_id, _, document_id = paper_id.partition(":")
+    if not query:
+        return JSONResponse(content={"error": "Empty query"}, status_code=400)
+
+    gemini_client = get_gemini_client()
+    try:
+        paper = await asyncio.to_thread(gemini_client.paper_index.get, shard_id, document_id)
+    except Exception as e:
+        print(f"Error fetching paper {paper_id}: {e}")
+        return JSONResponse(content={"error": "Paper lookup failed"}, status_code=503)
+    if paper is None:
+        return JSONResponse(content={"error": "Paper not found"}, status_code=404)
+
+    try:
+        reason = await asyncio.to_thread(gemini_client.explain_match, query, paper)
+    except Exception as e:
+        print(f"Error explaining match of {paper_id}: {e}")
+        return JSONResponse(content={"error": "The explanation is temporarily unavailable"}, status_code=503)
+    if not reason:
+        return JSONResponse(content={"error": "The explanation is temporarily unavailable"}, status_code=503)
+
+    return JSONResponse(
+        content={"paper_id": paper_id, "match_reason": reason},
+        headers={"Cache-Control": MATCH_REASON_CACHE_CONTROL},
+    )
+
+
+@router.get("/papers/map")
+async def paper_map(request: Request) -> Response:
+    """
+    Serve the topic clusters of the catalog and the 2D position of every paper.
+
+    The map is computed offline by `server.ai.build_topic_map`, so requests cost neither
+    a vector search nor an LLM call.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request object, used for content negotiation and conditional requests.
+
+    Returns
+    -------
+    Response
+        The map as JSON, 304 if the client's copy is current, or 404 if it has not been built
+    """
+    body = await asyncio.to_thread(topic_map.overview)
+    if body is None:
+        return JSONResponse(content={"error": "The topic map has not been built"}, status_code=404)
+    return body.response(request, TOPIC_MAP_CACHE_CONTROL)
+
+
+@router.get("/papers/map/clusters/{cluster_id}")
+async def paper_map_cluster(request: Request, cluster_id: int) -> Response:
+    """
+    Serve one topic cluster with its papers, closest to the center of the topic first.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request object, used for content negotiation and conditional requests.
+    cluster_id : int
+        The `id` of the cluster in the topic map
+
+    Returns
+    -------
+    Response
+        The cluster and its papers as JSON, 304 if the client's copy is current, or 404 if
+        the cluster does not exist
+    """
+    body = await asyncio.to_thread(topic_map.cluster, cluster_id)
+    if body is None:
+        return JSONResponse(content={"error": "Topic not found"}, status_code=404)
+    return body.response(request, TOPIC_MAP_CACHE_CONTROL)
@@ -1,9 +1,70 @@
 """ Configuration for the server. """
 
+import os
+
 from fastapi.templating import Jinja2Templates
 
+from config import CACHE_BASE_PATH
+from server.assets import asset_url
+
+# Canonical address used in pre-rendered pages, e.g. for og:url
+SITE_URL: str = os.getenv("SITE_URL", "https://forky.com").rstrip("/")
+
 MAX_DISPLAY_SIZE: int = 300_000
 DELETE_REPO_AFTER: int = 60 * 60  # In seconds
+REPO_DISK_QUOTA: int = 10 * 1024**3  # Least recently used repositories are deleted above this
+REPO_SCAN_INTERVAL: float = 10.0  # In seconds, how often TMP_BASE_PATH is checked for new folders
+ANALYSIS_DEADLINE: float = 45.0  # In seconds, partial results are returned after this
+SEARCH_DEADLINE: float = 8.0  # In seconds, paper searches return unranked results after this
+RERANK_HEDGE_QUANTILE: float = 0.95  # A second ranking request is sent once the first is slower than this
+RERANK_HEDGE_DEFAULT: float = 3.0  # In seconds, hedge delay until enough latencies are known
+BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive Gemini failures before ranking is skipped
+BREAKER_RESET_TIMEOUT: float = 30.0  # In seconds before Gemini is tried again
+EMBEDDING_BATCH_WINDOW: float = 0.01  # In seconds, concurrent query embeddings are batched within this
+EMBEDDING_BATCH_MAX_SIZE: int = 32  # A batch is sent at once when it reaches this many queries
+# Embeds papers and queries: "gemini" (embedding-001), or "hashing" / "tfidf" on the local CPU
+EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "gemini")
+EMBEDDING_DIMENSIONS: int = 768  # Of the local backends, matching the Atlas vector index of embedding-001
+# Searches the paper vectors: "atlas" (MongoDB Atlas vector search) or "local" (in-process NumPy index)
+PAPER_INDEX_BACKEND: str = os.getenv("PAPER_INDEX_BACKEND", "atlas")
+PASSAGE_SEARCH_LIMIT: int = 10  # Papers found through their full text added to the search candidates
+DIAGRAM_MAX_NODES: int = 300  # Deeper directories of larger repositories are collapsed
+DIAGRAM_MAX_CHILDREN: int = 25  # Entries shown per directory; the rest become one aggregate node
+DIAGRAM_CACHE_MAX_BYTES: int = 256 * 1024**2  # Least recently used diagrams are deleted above this
+
+WARMUP_TIMEOUT: float = 60.0  # In seconds, the instance reports ready after this even if warmup is incomplete
+WARMUP_CONCURRENCY: int = 4
+QUERY_LOG_MAX_BYTES: int = 16 * 1024 * 1024  # The search query log is rotated above this size
+QUERY_LOG_BACKUPS: int = 4  # Rotated query log files kept
+QUERY_LOG_WINDOW: int = 7 * 24 * 60 * 60  # In seconds, queries older than this are not counted
+TOP_QUERIES: int = 50  # Most frequent searches answered from precomputed results
+QUERY_AGGREGATE_INTERVAL: int = 10 * 60  # In seconds
+
+# Searches replayed at startup, before the query log has data to fill the embedding and result caches
+WARMUP_QUERIES: list[str] = [
+    "3D gaussian splatting",
+    "diffusion models for image generation",
+    "vision language models",
+    "video understanding",
+    "object detection",
+    "depth estimation",
+    "neural radiance fields",
+    "autonomous driving",
+]
+
+# Number of uvicorn worker processes; state shared between workers lives under CACHE_BASE_PATH
+WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+RATE_LIMIT_STORAGE_URI: str = os.getenv(
+    "RATE_LIMIT_STORAGE_URI",
+    f"sqlite:///{CACHE_BASE_PATH / 'rate_limits.sqlite3'}" if WORKERS > 1 else "memory://",
+)
+# Disabled by the load tests, whose requests all come from one address
+RATE_LIMITS_ENABLED: bool = os.getenv("RATE_LIMITS_ENABLED", "true").lower() not in ("0", "false", "no")
+
+CHAT_SESSION_TTL: int = 2 * 60 * 60  # In seconds of inactivity
+CHAT_MAX_CONTEXT_BYTES: int = 256 * 1024 * 1024  # Memory cap for uploaded repository digests
+CHAT_MAX_SESSIONS: int = 10_000
+CHAT_HISTORY_TOKEN_BUDGET: int = 8_000
 
 
 EXAMPLE_REPOS: list[dict[str, str]] = [
@@ -14,4 +75,15 @@ EXAMPLE_REPOS: list[dict[str, str]] = [
     {"name": "VisionAgent", "url": " https://github.com/landing-ai/vision-agent"},
 ]
 
+# One vector-search shard per conference and year; "cvpr2025" is the original collection
+CATALOG_SHARDS: list[dict[str, str]] = [
+    {"id": "cvpr2025", "venue": "CVPR", "year": "2025", "database": "cvpr_papers", "collection": "papers"},
+    {"id": "cvpr2024", "venue": "CVPR", "year": "2024", "database": "cvpr_papers", "collection": "cvpr2024"},
+    {"id": "cvpr2023", "venue": "CVPR", "year": "2023", "database": "cvpr_papers", "collection": "cvpr2023"},
+    {"id": "iccv2023", "venue": "ICCV", "year": "2023", "database": "cvpr_papers", "collection": "iccv2023"},
+    {"id": "eccv2024", "venue": "ECCV", "year": "2024", "database": "cvpr_papers", "collection": "eccv2024"},
+]
+DEFAULT_SHARDS: list[str] = ["cvpr2025"]
+
 templates = Jinja2Templates(directory="server/templates")
+templates.env.globals["asset"] = asset_url
@@ -2,10 +2,7 @@
 
 import asyncio
 import math
-import shutil
-import time
 from contextlib import asynccontextmanager
-from pathlib import Path
 
 from fastapi import FastAPI, Request
 from fastapi.responses import Response
@@ -13,11 +10,15 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
-from config import TMP_BASE_PATH
-from server.server_config import DELETE_REPO_AFTER
+from server.ai.github_client import close_github_client
+from server.query_log import precomputed_results, query_log
+from server.rate_limit_storage import SQLiteStorage  # noqa: F401 (registers the sqlite:// scheme)
+from server.repo_cleanup import ExpiryScheduler
+from server.server_config import RATE_LIMIT_STORAGE_URI, RATE_LIMITS_ENABLED
+from server.warmup import warm_up
 
-# Initialize a rate limiter
-limiter = Limiter(key_func=get_remote_address)
+# Initialize a rate limiter, shared by all workers when RATE_LIMIT_STORAGE_URI is not in memory
+limiter = Limiter(key_func=get_remote_address, storage_uri=RATE_LIMIT_STORAGE_URI, enabled=RATE_LIMITS_ENABLED)
 
 
 async def rate_limit_exception_handler(request: Request, exc: Exception) -> Response:
@@ -63,82 +64,22 @@ async def lifespan(_: FastAPI):
     None
         Yields control back to the FastAPI application while the background task runs.
     """
-    task = asyncio.create_task(_remove_old_repositories())
+    # Warm up in the background so /health answers at once; /ready reports when done
+    warmup_task = asyncio.create_task(warm_up())
+    task = asyncio.create_task(ExpiryScheduler().run())
+    query_log_task = asyncio.create_task(query_log.run())
+    precompute_task = asyncio.create_task(precomputed_results.run(query_log))
 
     yield
-    # Cancel the background task on shutdown
-    task.cancel()
-    try:
-        await task
-    except asyncio.CancelledError:
-        pass
-
-
-async def _remove_old_repositories():
-    """
-    Periodically remove old repository folders.
-
-    Background task that runs periodically to clean up old repository directories.
-
-    This task:
-    - Scans the TMP_BASE_PATH directory every 60 seconds
-    - Removes directories older than DELETE_REPO_AFTER seconds
-    - Before deletion, logs repository URLs to history.txt if a matching .txt file exists
-    - Handles errors gracefully if deletion fails
-
-    The repository URL is extracted from the first .txt file in each directory,
-    assuming the filename format: "owner-repository.txt"
-    """
-    while True:
+    # Cancel the background tasks on shutdown
+    for background_task in (task, warmup_task, query_log_task, precompute_task):
+        background_task.cancel()
         try:
-            if not TMP_BASE_PATH.exists():
-                await asyncio.sleep(60)
-                continue
-
-            current_time = time.time()
-
-            for folder in TMP_BASE_PATH.iterdir():
-                # Skip if folder is not old enough
-                if current_time - folder.stat().st_ctime <= DELETE_REPO_AFTER:
-                    continue
+            await background_task
+        except asyncio.CancelledError:
+            pass
 
-                await _process_folder(folder)
-
-        except Exception as e:
-            print(f"Error in _remove_old_repositories: {e}")
-
-        await asyncio.sleep(60)
-
-
-async def _process_folder(folder: Path) -> None:
-    """
-    Process a single folder for deletion and logging.
-
-    Parameters
-    ----------
-    folder : Path
-        The path to the folder to be processed.
-    """
-    # Try to log repository URL before deletion
-    try:
-        txt_files = [f for f in folder.iterdir() if f.suffix == ".txt"]
-
-        # Extract owner and repository name from the filename
-        if txt_files and "-" in (filename := txt_files[0].stem):
-            owner, repo = filename.split("-", 1)
-            repo_url = f"{owner}/{repo}"
-
-            with open("history.txt", mode="a", encoding="utf-8") as history:
-                history.write(f"{repo_url}\n")
-
-    except Exception as e:
-        print(f"Error logging repository URL for {folder}: {e}")
-
-    # Delete the folder
-    try:
-        shutil.rmtree(folder)
-    except Exception as e:
-        print(f"Error deleting {folder}: {e}")
+    await close_github_client()
 
 
 def log_slider_to_size(position: int) -> int:
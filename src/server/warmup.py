@@ -0,0 +1,134 @@
+""" Startup warmup and the readiness state reported by `/ready`. """
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from server.ai.content_provider import get_gemini_client
+from server.ai.gemini_client import GeminiClient
+from server.prerender import prerender
+from server.query_log import precomputed_results
+from server.server_config import (
+    EMBEDDING_BACKEND,
+    PAPER_INDEX_BACKEND,
+    WARMUP_CONCURRENCY,
+    WARMUP_QUERIES,
+    WARMUP_TIMEOUT,
+)
+
+
+@dataclass
+class Readiness:
+    """Progress of the warmup; the instance only accepts traffic once `ready` is set."""
+
+    ready: bool = False
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    checks: dict[str, str] = field(default_factory=dict)
+
+    def report(self) -> dict:
+        """The readiness state as returned by `/ready`."""
+        end = self.finished_at or time.time()
+        return {
+            "status": "ready" if self.ready else "warming_up",
+            "warmup_seconds": round(end - self.started_at, 2),
+            "checks": dict(self.checks),
+        }
+
+
+readiness = Readiness()
+
+
+async def _warm_searches(gemini_client: GeminiClient, queries: list[str]) -> None:
+    """Run the given searches, filling the embedding and search result caches."""
+    semaphore = asyncio.Semaphore(WARMUP_CONCURRENCY)
+
+    async def search(query: str) -> bool:
+        async with semaphore:
+            return bool((await gemini_client.search_cvpr_papers(query)).papers)
+
+    results = await asyncio.gather(*(search(query) for query in queries))
+    if queries and not any(results):
+        raise RuntimeError("no warmup search returned results")
+
+
+async def _run_check(name: str, check: Callable[[], Awaitable[None]]) -> None:
+    readiness.checks[name] = "pending"
+    start = time.monotonic()
+    try:
+        await check()
+        readiness.checks[name] = f"ok ({time.monotonic() - start:.2f}s)"
+    except Exception as e:
+        print(f"Warmup step {name} failed: {e}")
+        readiness.checks[name] = f"error: {e}"
+
+
+def warmup_queries() -> list[str]:
+    """The most frequent recent searches, or the configured ones while the query log is empty."""
+    precomputed_results.reload()
+    return precomputed_results.queries()[:len(WARMUP_QUERIES)] or list(WARMUP_QUERIES)
+
+
+async def warm_up(timeout: float = WARMUP_TIMEOUT) -> None:
+    """
+    Bring the instance to steady-state latency, then mark it ready.
+
+    Pre-renders the pages, maps the paper catalog, creates the model clients, opens a
+    Mongo connection and replays frequent searches so their embeddings and results are
+    cached. Independent steps run concurrently. Failed steps are reported by `/ready` but
+    do not keep the instance out of rotation, and neither does a warmup that runs past
+    `timeout`: it keeps going in the background while traffic is admitted.
+
+    Parameters
+    ----------
+    timeout : float
+        Maximum time in seconds before the instance reports ready.
+    """
+    readiness.started_at = time.time()
+    steps = [_run_check("pages", lambda: asyncio.to_thread(prerender))]
+
+    try:
+        gemini_client = get_gemini_client()
+    except ValueError as e:
+        print(f"Warmup skipped the search path: {e}")
+        readiness.checks["gemini_client"] = f"error: {e}"
+    else:
+
+        def load_catalog() -> None:
+            if not gemini_client._get_cvpr_papers():
+                raise RuntimeError("paper catalog is empty")
+
+        def create_model_clients() -> None:
+            # Accessing the properties imports the SDKs and creates the clients
+            gemini_client.client
+            if EMBEDDING_BACKEND == "gemini":
+                gemini_client.embedder
+
+        def ping_mongo() -> None:
+            gemini_client.mongo_client.admin.command("ping")
+
+        def load_local_embedder() -> None:
+            # Fits the TF-IDF model on the catalog if no saved model exists yet
+            gemini_client.text_embedder
+
+        async def catalog_and_searches() -> None:
+            await _run_check("catalog", lambda: asyncio.to_thread(load_catalog))
+            if EMBEDDING_BACKEND != "gemini":
+                await _run_check("embedder", lambda: asyncio.to_thread(load_local_embedder))
+            if PAPER_INDEX_BACKEND == "atlas":
+                await _run_check("mongo", lambda: asyncio.to_thread(ping_mongo))
+            await _run_check("searches", lambda: _warm_searches(gemini_client, warmup_queries()))
+
+        steps += [_run_check("model_clients", lambda: asyncio.to_thread(create_model_clients)), catalog_and_searches()]
+
+    warmup = asyncio.gather(*steps)
+    try:
+        await asyncio.wait_for(asyncio.shield(warmup), timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"Warmup did not finish within {timeout:.0f}s, accepting traffic anyway")
+    finally:
+        readiness.ready = True
+        readiness.finished_at = time.time()
+
+    await warmup
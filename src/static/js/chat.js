@@ -3,19 +3,27 @@
  * Handles the chat UI interaction and communication with the backend
  */
 
-// Add a message to the chat UI
+// Milliseconds without any data from the server before a chat request is abandoned
+const CHAT_IDLE_TIMEOUT_MS = 30000;
+
+// Render message content as markdown or escaped text
+function formatChatContent(content, format) {
+    return format === 'markdown'
+        ? marked.parse(content) // Use marked.js to parse markdown
+        : `<p class="text-sm text-gray-900">${escapeHTML(content)}</p>`;
+}
+
+// Add a message to the chat UI and return its element so it can be updated
 function addMessageToChat(role, content, format = null) {
     const messagesContainer = document.getElementById('chat-messages');
-    if (!messagesContainer) return;
+    if (!messagesContainer) return null;
 
     const messageDiv = document.createElement('div');
     messageDiv.className = 'animate-fade-in';
     const timestamp = new Date().toLocaleTimeString();
 
     // Format the content if it's markdown
-    const formattedContent = format === 'markdown'
-        ? marked.parse(content) // Use marked.js to parse markdown
-        : `<p class="text-sm text-gray-900">${escapeHTML(content)}</p>`;
+    const formattedContent = formatChatContent(content, format);
 
     if (role === 'user') {
         messageDiv.innerHTML = `
@@ -28,7 +36,7 @@ function addMessageToChat(role, content, format = null) {
                         <span class="text-sm font-semibold text-gray-900">You</span>
                         <span class="text-sm text-gray-500">${timestamp}</span>
                     </div>
-                    <div class="flex flex-col leading-1.5 p-4 border-[2px] border-gray-900 bg-gray-100 rounded-s-xl rounded-ee-xl">
+                    <div data-message-body class="flex flex-col leading-1.5 p-4 border-[2px] border-gray-900 bg-gray-100 rounded-s-xl rounded-ee-xl">
                         ${formattedContent}
                     </div>
                 </div>
@@ -46,7 +54,7 @@ function addMessageToChat(role, content, format = null) {
                         <span class="text-sm text-gray-500">${timestamp}</span>
                     </div>
                     <div class="flex flex-col leading-1.5 p-4 border-[2px] border-gray-900 bg-[#4ECDC4]/10 rounded-e-xl rounded-es-xl overflow-hidden">
-                        <div class="prose prose-sm max-w-full overflow-x-auto">
+                        <div data-message-body class="prose prose-sm max-w-full overflow-x-auto">
                             ${formattedContent}
                         </div>
                     </div>
@@ -57,9 +65,106 @@ function addMessageToChat(role, content, format = null) {
 
     messagesContainer.appendChild(messageDiv);
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    return messageDiv;
+}
+
+// Replace the content of a message previously added with addMessageToChat
+function updateChatMessage(messageDiv, content, format = null) {
+    const body = messageDiv?.querySelector('[data-message-body]');
+    if (!body) return;
+
+    body.innerHTML = formatChatContent(content, format);
+
+    const messagesContainer = document.getElementById('chat-messages');
+    if (messagesContainer) messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
+// Read a server-sent event stream, calling onEvent(event, data) for each event
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const rawEvent of events) {
+            let event = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
 }
 
-// Send a message to the backend
+// Chat session id, issued by the server once it has loaded the repository digest
+let chatSessionId = null;
+
+// Start a session on the digest the server already holds and remember its id
+function ensureChatSession() {
+    if (chatSessionId) return Promise.resolve(chatSessionId);
+
+    const formData = new FormData();
+    const summary = document.querySelector('[data-summary]')?.textContent;
+    const digestId = document.querySelector('[data-digest-id]')?.dataset.digestId;
+
+    formData.append('digest_id', digestId || '');
+    if (summary) formData.append('repo_summary', summary);
+
+    return fetch('/chat/session', {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => {
+        if (!response.ok) {
+            const errorMessage = response.status === 429
+                ? 'Rate limit exceeded. Please try again in a moment.'
+                : response.status === 404
+                    ? 'The repository digest expired. Please analyze the repository again.'
+                    : 'Could not start the chat session';
+            throw new Error(errorMessage);
+        }
+        return response.json();
+    })
+    .then(data => {
+        if (data.error) throw new Error(data.error);
+        chatSessionId = data.session_id;
+        return chatSessionId;
+    });
+}
+
+// Post a message within the current session, starting a new session once if it expired
+function postChatMessage(message, signal, retry = true) {
+    return ensureChatSession().then(sessionId => {
+        const formData = new FormData();
+        formData.append('message', message);
+        formData.append('session_id', sessionId);
+
+        return fetch('/chat', {
+            method: 'POST',
+            headers: { 'Accept': 'text/event-stream' },
+            body: formData,
+            signal: signal
+        });
+    })
+    .then(response => {
+        if (response.status === 404 && retry) {
+            chatSessionId = null;
+            return postChatMessage(message, signal, false);
+        }
+        return response;
+    });
+}
+
+// Send a message to the backend and render the answer as it streams in
 function sendChatMessage() {
     const input = document.getElementById('chat-input');
     if (!input) return;
@@ -70,17 +175,6 @@ function sendChatMessage() {
     // Add user message to chat
     addMessageToChat('user', message);
 
-    // Create FormData
-    const formData = new FormData();
-    formData.append('message', message);
-
-    // Add repository context - using the direct summary and content from the analysis
-    const summary = document.querySelector('[data-summary]')?.textContent;
-    const content = document.querySelector('[data-content]')?.textContent;
-
-    if (summary) formData.append('repo_summary', summary);
-    if (content) formData.append('repo_content', content);
-
     // Show loading indicator
     const loadingIndicator = document.getElementById('chat-loading');
     if (loadingIndicator) loadingIndicator.classList.remove('hidden');
@@ -88,35 +182,58 @@ function sendChatMessage() {
     // Clear input
     input.value = '';
 
-    // Send to backend with timeout handling
+    // Abort only when the server goes quiet, not when a long answer is still streaming
     const controller = new AbortController();
-    const timeoutId = setTimeout(() => controller.abort(), 30000); // 30 second timeout
+    let idleTimer = null;
+    const resetIdleTimer = () => {
+        clearTimeout(idleTimer);
+        idleTimer = setTimeout(() => controller.abort(), CHAT_IDLE_TIMEOUT_MS);
+    };
+    resetIdleTimer();
 
-    fetch('/chat', {
-        method: 'POST',
-        body: formData,
-        signal: controller.signal
-    })
+    let answer = '';
+    let answerDiv = null;
+    let renderPending = false;
+    const render = () => {
+        renderPending = false;
+        updateChatMessage(answerDiv, answer, 'markdown');
+    };
+
+    postChatMessage(message, controller.signal)
     .then(response => {
-        clearTimeout(timeoutId);
+        resetIdleTimer();
         if (!response.ok) {
             const errorMessage = response.status === 429
                 ? 'Rate limit exceeded. Please try again in a moment.'
                 : 'Network response was not ok';
             throw new Error(errorMessage);
         }
-        return response.json();
+
+        return readEventStream(response, (event, data) => {
+            resetIdleTimer();
+            if (event === 'error') throw new Error(data.error);
+            if (event !== 'message') return;
+
+            if (!answerDiv) {
+                if (loadingIndicator) loadingIndicator.classList.add('hidden');
+                answerDiv = addMessageToChat('assistant', '', 'markdown');
+            }
+            answer += data.delta;
+            if (!renderPending) {
+                renderPending = true;
+                requestAnimationFrame(render);
+            }
+        });
     })
-    .then(data => {
-        if (data.error) throw new Error(data.error);
-        addMessageToChat('assistant', data.response, data.format);
+    .then(() => {
+        if (answerDiv) render();
     })
     .catch(error => {
         console.error('Error:', error);
         let errorMessage = 'Sorry, there was an error processing your request.';
 
         if (error.name === 'AbortError') {
-            errorMessage = 'The request took too long to process. Please try again or simplify your query.';
+            errorMessage = 'The server stopped responding. Please try again or simplify your query.';
         } else if (error.message) {
             errorMessage = `Error: ${error.message}`;
         }
@@ -124,6 +241,7 @@ function sendChatMessage() {
         addMessageToChat('assistant', errorMessage);
     })
     .finally(() => {
+        clearTimeout(idleTimer);
         // Hide loading indicator
         if (loadingIndicator) loadingIndicator.classList.add('hidden');
     });
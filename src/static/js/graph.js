@@ -0,0 +1,92 @@
+/**
+ * Forky Repository Graph
+ * Draws the overview graph served as JSON by /diagrams/{id} as an SVG tree
+ */
+
+const GRAPH_COLORS = { dir: '#4ECDC4', file: '#FF6B6B', more: '#C7CED6' };
+const GRAPH_COLUMN_WIDTH = 180;
+const GRAPH_ROW_HEIGHT = 22;
+const GRAPH_MARGIN = 12;
+const SVG_NS = 'http://www.w3.org/2000/svg';
+
+function svgElement(name, attributes) {
+    const element = document.createElementNS(SVG_NS, name);
+    for (const [key, value] of Object.entries(attributes)) element.setAttribute(key, value);
+    return element;
+}
+
+// Place every node in the column of its level; leaves take one row each and a directory
+// is centered on its children. Nodes arrive in breadth-first order, so walking them
+// backwards places the children of a node before the node itself.
+function layoutGraph(graph) {
+    const count = graph.nodes.length;
+    const children = Array.from({ length: count }, () => []);
+    for (const [parent, child] of graph.edges) children[parent].push(child);
+
+    const rows = new Array(count);
+    let nextRow = 0;
+    // Leaves are numbered in depth-first order so siblings stay together
+    const stack = [0];
+    while (stack.length) {
+        const node = stack.pop();
+        if (!children[node].length) rows[node] = nextRow++;
+        for (let i = children[node].length - 1; i >= 0; i--) stack.push(children[node][i]);
+    }
+    for (let node = count - 1; node >= 0; node--) {
+        const own = children[node];
+        if (own.length) rows[node] = (rows[own[0]] + rows[own[own.length - 1]]) / 2;
+    }
+    return { rows, height: Math.max(nextRow, 1) };
+}
+
+function drawGraph(container, graph) {
+    const { rows, height } = layoutGraph(graph);
+    const x = (node) => GRAPH_MARGIN + graph.nodes[node][2] * GRAPH_COLUMN_WIDTH;
+    const y = (node) => GRAPH_MARGIN + rows[node] * GRAPH_ROW_HEIGHT;
+    const svg = svgElement('svg', {
+        width: graph.levels * GRAPH_COLUMN_WIDTH + 2 * GRAPH_MARGIN,
+        height: (height - 1) * GRAPH_ROW_HEIGHT + 2 * GRAPH_MARGIN,
+        role: 'img',
+        'aria-label': 'Repository structure',
+    });
+
+    for (const [parent, child] of graph.edges) {
+        const middle = (x(parent) + x(child)) / 2;
+        svg.appendChild(svgElement('path', {
+            d: `M${x(parent)},${y(parent)} C${middle},${y(parent)} ${middle},${y(child)} ${x(child)},${y(child)}`,
+            fill: 'none',
+            stroke: '#D1D5DB',
+        }));
+    }
+    graph.nodes.forEach(([label, kind, , files], node) => {
+        const group = svgElement('g', { transform: `translate(${x(node)},${y(node)})` });
+        group.appendChild(svgElement('circle', { r: 5, fill: GRAPH_COLORS[kind] || GRAPH_COLORS.file, stroke: '#111827' }));
+        const text = svgElement('text', { x: 9, dy: '0.35em', 'font-size': 12, fill: '#111827' });
+        // textContent keeps file names from being parsed as markup
+        text.textContent = label;
+        const title = svgElement('title', {});
+        title.textContent = kind === 'file' ? label : `${label} (${files} files)`;
+        group.append(title, text);
+        svg.appendChild(group);
+    });
+
+    container.replaceChildren(svg);
+}
+
+// Fetch and draw the graph of a container with a data-repo-graph="/diagrams/{id}" attribute
+async function renderRepoGraph(container) {
+    const url = container.dataset.repoGraph;
+    if (!url) return;
+    try {
+        const response = await fetch(url);
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        drawGraph(container, await response.json());
+    } catch (error) {
+        console.error('Error loading repository graph:', error);
+        container.textContent = 'The repository structure is not available.';
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('[data-repo-graph]').forEach(renderRepoGraph);
+});